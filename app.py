@@ -1,83 +1,314 @@
+import os
+
 import streamlit as st
 import pandas as pd
-from openpyxl import load_workbook
 
+from factoring.api import API_PORT, serve_in_background
+from factoring.cache import SheetCache, cache_key, file_digest
+from factoring.consolidation import consolidate, ledger_sheets, parse_sheets
+from factoring.delta import append_extract
+from factoring.excel_io import WorkbookSession
+from factoring.memory import compact_frame, memory_report
+from factoring.profiling import page_profiler, profiling_panel
+from factoring.registry import dataset_key, shared_registry
+from factoring.store import open_store
+from factoring.streaming import aggregate_chunks
+from factoring.schema import BASE1_COLUMNS, BASE2_COLUMNS, HEADER_COLUMNS, SCHEMA_VERSION, normalize_ledger
+
+
+
+def progress_display():
+    """Barre de progression et texte d'état ; renvoie la fonction de mise à jour (lignes lues, total)."""
+    progress_bar = st.progress(0)
+    status_text = st.empty()
 
+    # Mise à jour de la progression en fonction du temps écoulé (et non toutes les N lignes)
+    def update_progress(rows_read, total_rows):
+        progress_bar.progress(min(rows_read / total_rows, 1.0) if total_rows else 1.0)
+        status_text.text(f"Lecture de la ligne {rows_read} / {total_rows}")
 
-def read_excel_with_progress(file, sheet_name, header_row=1):
+    return update_progress
+
+
+def read_excel_with_progress(workbook, sheet_name, header_row=1):
     # header_row correspond exactement au numéro de ligne Excel (1-based)
-    wb = load_workbook(filename=file, read_only=True, data_only=True)
-    ws = wb[sheet_name]
+    # Lecture en flux dans des colonnes typées, le DataFrame sort avec ses types définitifs
+    return workbook.read(sheet_name, header_row, progress=progress_display())
 
-    max_row = ws.max_row
 
-    # Récupérer l'entête à la ligne spécifiée (header_row)
-    header = [cell.value for cell in ws[header_row]]
+def hold(lease):
+    """La session ne garde qu'un bail vers le jeu de données partagé (et son DataFrame)."""
+    st.session_state.dataset = lease
+    st.session_state.df = lease.df
 
-    data = []
-    # Calculer le nombre total de lignes à lire (après l'entête)
-    total_rows_to_read = max_row - header_row
-    progress_bar = st.progress(0)
-    status_text = st.empty()
 
-    # Lire les données à partir de la ligne suivant l'entête
-    for i, row in enumerate(ws.iter_rows(min_row=header_row+1, max_row=max_row, values_only=True), start=1):
-        data.append(row)
+def load_sheet(workbook, digest, sheet_name, header_row, file_name):
+    """Feuille normalisée partagée entre sessions : mémoire du serveur, cache disque, sinon lue.
 
-        if i % 10 == 0 or i == total_rows_to_read:
-            progress = i / total_rows_to_read
-            progress_bar.progress(progress)
-            status_text.text(f"Lecture de la ligne {i} / {total_rows_to_read}")
+    Renvoie (bail, origine) avec origine 'memory', 'disk' ou 'source' (lecture Excel).
+    """
+    # Clé adressée par contenu : (empreinte du fichier, feuille, ligne d'entête)
+    key = cache_key(digest, sheet_name, header_row, version=SCHEMA_VERSION)
 
-    # Construire le DataFrame
-    df = pd.DataFrame(data, columns=header)
+    def parse():
+        with profiler.section("Chargement : lecture Excel"):
+            df = read_excel_with_progress(workbook, sheet_name, header_row=header_row)
+        # Normalisation unique (types définitifs) : le cache et les pages reçoivent le schéma canonique
+        with profiler.section("Chargement : normalisation"):
+            df = normalize_ledger(df)
+        return df, {'file_name': file_name, 'sheet': sheet_name, 'header_row': header_row}
 
-    # Nettoyer les colonnes
-    df.columns = [str(col).strip() if col is not None else f"Unnamed_{i}" 
-                  for i, col in enumerate(df.columns)]
+    return registry.get_or_load(key, parse, persist=True)
 
-    return df
+
+def load_workbooks(files, all_sheets=True):
+    """Consolide plusieurs classeurs : feuilles déjà connues relues de la mémoire ou du disque, les autres en parallèle.
+
+    Renvoie le bail du grand livre consolidé ; son `info` porte le nombre de doublons
+    retirés et le détail par feuille.
+    """
+    sources, keys, files_of = [], [], []
+    for file in files:
+        digest = file_digest(file)
+        workbook = WorkbookSession(file)
+        try:
+            sheets = ledger_sheets(workbook, all_sheets)
+        finally:
+            workbook.close()
+        for sheet_name, header_row in sheets:
+            keys.append(cache_key(digest, sheet_name, header_row, version=SCHEMA_VERSION))
+            sources.append({'Fichier': file.name, 'Feuille': sheet_name, 'Ligne entête': int(header_row)})
+            files_of.append(file)
+    if not keys:
+        raise ValueError("Aucune feuille au format reconnu dans les fichiers sélectionnés.")
+
+    def consolidate_sheets():
+        leases = [registry.get(key) for key in keys]
+        tasks, pending = [], []
+        for i, lease in enumerate(leases):
+            sources[i]['Depuis le cache'] = "oui" if lease is not None else "non"
+            if lease is None:
+                tasks.append((files_of[i].getvalue(), sources[i]['Feuille'], sources[i]['Ligne entête']))
+                pending.append(i)
+        profiler.lap("Consolidation : lecture des feuilles")
+        for i, df in zip(pending, parse_sheets(tasks)):
+            leases[i] = registry.put(keys[i], df, persist=True, file_name=sources[i]['Fichier'],
+                                     sheet=sources[i]['Feuille'], header_row=sources[i]['Ligne entête'])
+        for source, lease in zip(sources, leases):
+            source['Lignes'] = len(lease.df)
+        profiler.lap("Consolidation : fusion et dédoublonnage")
+        combined, duplicates = consolidate([lease.df for lease in leases])
+        profiler.finish()
+        return combined, {'file_name': f"Consolidation de {len(files)} classeur(s)", 'sheet': f"{len(keys)} feuille(s)",
+                          'duplicates': duplicates, 'sources': sources}
+
+    # Même ensemble de feuilles : le grand livre consolidé est lui aussi partagé entre sessions
+    return registry.get_or_load(dataset_key('consolidation', *keys), consolidate_sheets)[0]
 
 
 # Streamlit app
 st.title("Page d'accueil")
 
+# Mesure optionnelle du chargement (interrupteur dans la barre latérale)
+profiler = page_profiler("Accueil")
+
+sheet_cache = SheetCache()
+# Jeux de données partagés par toutes les sessions du serveur (une seule copie par contenu)
+registry = shared_registry()
+# Service JSON local sur les mêmes jeux de données, démarré une fois par processus si un port est configuré
+if os.environ.get("FACTORING_API_PORT"):
+    _, api_error = serve_in_background(registry)
+    # L'application reste utilisable sans le service ; l'échec est signalé une fois par session
+    if api_error is not None and not st.session_state.get("api_error_shown"):
+        st.session_state.api_error_shown = True
+        st.warning(f"Service JSON local non démarré (port {API_PORT}) : {api_error}")
+
 if "df" not in st.session_state:
     st.session_state.df = None
+if "store" not in st.session_state:
+    st.session_state.store = None
+if "aggregates" not in st.session_state:
+    st.session_state.aggregates = None
+
+# Un grand livre est disponible : en mémoire (df), dans une base SQLite locale (store) ou résumé en agrégats
+loaded = (st.session_state.df is not None or st.session_state.store is not None
+          or st.session_state.aggregates is not None)
 
 upload_file = st.file_uploader("Télécharger un fichier Excel", type=["xlsx"])
 
-if upload_file and st.session_state.df is None:
-    wb = load_workbook(upload_file, read_only=True, data_only=True)
-    sheet_names = wb.sheetnames
+# Consolidation : plusieurs classeurs (un par mois) ou plusieurs feuilles (une par agence) analysés ensemble
+if not loaded:
+    with st.expander("Consolider plusieurs classeurs"):
+        upload_files = st.file_uploader("Télécharger plusieurs fichiers Excel", type=["xlsx"],
+                                        accept_multiple_files=True, key="consolidation_files")
+        all_sheets = st.checkbox("Lire toutes les feuilles reconnues de chaque classeur", value=True)
+        if upload_files and st.button("Consolider les fichiers"):
+            try:
+                with st.spinner("Lecture des classeurs en parallèle..."):
+                    lease = load_workbooks(upload_files, all_sheets)
+                hold(lease)
+                st.session_state.memory_report = None
+                st.session_state.consolidation_report = (pd.DataFrame(lease.info['sources']),
+                                                         lease.info['duplicates'])
+                st.rerun()
+            except Exception as e:
+                st.error(f"Erreur lors de la consolidation des fichiers: {e}")
+
+if upload_file and not loaded:
+    # Un seul classeur ouvert par fichier téléversé, réutilisé d'un rerun à l'autre
+    workbook = st.session_state.get("workbook")
+    if workbook is None or st.session_state.get("workbook_file_id") != upload_file.file_id:
+        if workbook is not None:
+            workbook.close()
+        workbook = WorkbookSession(upload_file)
+        st.session_state.workbook = workbook
+        st.session_state.workbook_file_id = upload_file.file_id
+        st.session_state.workbook_digest = file_digest(upload_file)
 
-    selected_sheet = st.selectbox("Sélectionnez une feuille", sheet_names)
-    header_row = st.number_input("Numéro de la ligne d'entête (5 = ligne 5 d'Excel)", min_value=1, value=5, step=1)
+    selected_sheet = st.selectbox("Sélectionnez une feuille", workbook.sheetnames)
+
+    # Recherche de la ligne d'entête parmi les premières lignes de la feuille
+    detected_row = workbook.header_row(selected_sheet, HEADER_COLUMNS)
+    if detected_row is not None:
+        st.caption(f"Ligne d'entête détectée automatiquement : ligne {detected_row}")
+    else:
+        st.caption("Ligne d'entête non détectée, veuillez la saisir.")
+    header_row = st.number_input("Numéro de la ligne d'entête (5 = ligne 5 d'Excel)", min_value=1,
+                                 value=detected_row or 5, step=1, key=f"header_row_{selected_sheet}")
+    load_mode = st.radio(
+        "Mode de chargement :",
+        ["En mémoire", "Base locale (SQLite) pour un grand livre volumineux",
+         "Agrégats seulement (très gros fichiers, analyse générale)"],
+        key="load_mode")
 
     if st.button("Charger cette feuille"):
         try:
-            df = read_excel_with_progress(upload_file, selected_sheet, header_row=int(header_row))
-            st.session_state.df = df
-            st.success(f"Fichier chargé avec succès ({selected_sheet}) !")
+            if load_mode.startswith("Agrégats"):
+                # Lecture bloc par bloc : seuls les agrégats partiels fusionnés sont conservés
+                with profiler.section("Chargement : agrégats en flux"):
+                    st.session_state.aggregates = aggregate_chunks(
+                        workbook.iter_chunks(selected_sheet, int(header_row), progress=progress_display()))
+                st.success(f"Feuille agrégée ({selected_sheet}, "
+                           f"{len(st.session_state.aggregates):,} lignes lues) !".replace(",", " "))
+            elif load_mode.startswith("Base locale"):
+                # Base adressée par contenu comme le cache : une feuille déjà ingérée est rouverte directement
+                key = cache_key(st.session_state.workbook_digest, selected_sheet, int(header_row),
+                                version=SCHEMA_VERSION)
+                with profiler.section("Chargement : base locale"):
+                    st.session_state.store = open_store(
+                        key, workbook.iter_chunks(selected_sheet, int(header_row), progress=progress_display()))
+                st.success(f"Feuille stockée dans la base locale ({selected_sheet}, "
+                           f"{len(st.session_state.store):,} lignes) !".replace(",", " "))
+            else:
+                lease, origin = load_sheet(workbook, st.session_state.workbook_digest, selected_sheet,
+                                           int(header_row), upload_file.name)
+                hold(lease)
+                if origin == 'memory':
+                    st.success(f"Fichier déjà chargé sur le serveur, partagé avec cette session ({selected_sheet}) !")
+                elif origin == 'disk':
+                    st.success(f"Fichier chargé depuis le cache ({selected_sheet}) !")
+                else:
+                    st.success(f"Fichier chargé avec succès ({selected_sheet}) !")
+            st.session_state.memory_report = None
+            st.session_state.consolidation_report = None
+            # Le classeur n'est plus nécessaire une fois la feuille chargée
+            workbook.close()
+            st.session_state.workbook = None
         except Exception as e:
             st.error(f"Erreur lors du chargement du fichier: {e}")
 
 if st.session_state.df is not None:
     st.markdown("---")
+
+    # Mode compact optionnel : textes peu variés en catégories, identifiants réduits, colonnes vides supprimées
+    if st.session_state.get("memory_report") is None:
+        if st.button("Activer le mode compact (mémoire réduite)"):
+            # Version compacte partagée elle aussi : calculée une fois pour toutes les sessions
+            base = st.session_state.dataset
+            with profiler.section("Mode compact"):
+                lease, _ = registry.get_or_load(dataset_key(base.key, 'compact'),
+                                                lambda: (compact_frame(base.df)[0], dict(base.info)))
+            st.session_state.memory_report = memory_report(base.df, lease.df)
+            hold(lease)
+            st.rerun()
+    else:
+        report = st.session_state.memory_report
+        before_mb = report['Mémoire avant (Mo)'].sum()
+        after_mb = report['Mémoire après (Mo)'].sum()
+        with st.expander(f"Mode compact actif : {before_mb:,.1f} Mo → {after_mb:,.1f} Mo".replace(",", " ")):
+            st.dataframe(report.round(2), use_container_width=True, hide_index=True)
+
+    if st.session_state.get("consolidation_report") is not None:
+        sources, duplicates = st.session_state.consolidation_report
+        with st.expander(f"Consolidation : {len(sources)} feuille(s), {len(st.session_state.df):,} lignes, "
+                         f"{duplicates:,} doublon(s) retiré(s)".replace(",", " ")):
+            st.dataframe(sources, use_container_width=True, hide_index=True)
+
+    # Mode ajout : n'intégrer que les lignes nouvelles d'un extrait mensuel qui recoupe le précédent
+    with st.expander("Ajouter un extrait mensuel (seules les nouvelles lignes sont intégrées)"):
+        extract_file = st.file_uploader("Extrait Excel", type=["xlsx"], key="extract_file")
+        if extract_file:
+            extract_workbook = st.session_state.get("extract_workbook")
+            if extract_workbook is None or st.session_state.get("extract_file_id") != extract_file.file_id:
+                if extract_workbook is not None:
+                    extract_workbook.close()
+                extract_workbook = WorkbookSession(extract_file)
+                st.session_state.extract_workbook = extract_workbook
+                st.session_state.extract_file_id = extract_file.file_id
+                st.session_state.extract_digest = file_digest(extract_file)
+
+            extract_sheet = st.selectbox("Feuille de l'extrait", extract_workbook.sheetnames, key="extract_sheet")
+            extract_header = st.number_input("Ligne d'entête de l'extrait", min_value=1,
+                                             value=extract_workbook.header_row(extract_sheet, HEADER_COLUMNS) or 5,
+                                             step=1, key=f"extract_header_{extract_sheet}")
+            if st.button("Intégrer l'extrait"):
+                try:
+                    extract, _ = load_sheet(extract_workbook, st.session_state.extract_digest, extract_sheet,
+                                            int(extract_header), extract_file.name)
+                    base = st.session_state.dataset
+
+                    def append():
+                        with profiler.section("Ajout d'extrait : fusion"):
+                            combined, delta = append_extract(base.df, extract.df)
+                        return combined, {**base.info, 'added': len(delta)}
+
+                    # Même base et même extrait : le résultat de l'ajout est partagé entre sessions
+                    lease, _ = registry.get_or_load(dataset_key(base.key, 'extract', extract.key), append)
+                    hold(lease)
+                    added = lease.info['added']
+                    st.session_state.extract_result = (
+                        f"{added:,} nouvelle(s) ligne(s) intégrée(s) sur {len(extract.df):,} "
+                        f"({len(extract.df) - added:,} déjà présente(s)).".replace(",", " ")
+                    )
+                except Exception as e:
+                    st.error(f"Erreur lors de l'intégration de l'extrait: {e}")
+        if st.session_state.get("extract_result"):
+            st.success(st.session_state.extract_result)
+
+if st.session_state.aggregates is not None:
+    # Sans les lignes, seules les vues agrégées de l'analyse générale sont disponibles
+    st.markdown("---")
+    st.info(f"**Mode agrégats :** {len(st.session_state.aggregates):,} lignes résumées, sans conservation "
+            f"des lignes. Seule l'analyse générale est disponible.".replace(",", " "))
+    st.session_state.base_type = "alternative"
+    if st.button("Ouvrir l'analyse générale"):
+        st.switch_page("pages/3_Analyse_Generale.py")
+
+elif st.session_state.df is not None or st.session_state.store is not None:
+    if st.session_state.store is not None:
+        st.markdown("---")
+        st.info(f"**Mode base locale :** {len(st.session_state.store):,} lignes conservées sur disque, "
+                f"les agrégats sont calculés en SQL.".replace(",", " "))
+
     st.subheader("Choisissez votre type d'analyse")
 
     # Détecter automatiquement le type de base de données
     df = st.session_state.df
+    columns = df.columns.tolist() if df is not None else st.session_state.store.columns
     
-    # Colonnes de la première base (originale)
-    base1_columns = ['TIRES', 'Debtor Number', 'EntryAmountSAC', 'RUB']
-    
-    # Colonnes de la deuxième base (alternative)
-    base2_columns = ['Entry Amount SAC', 'Rubrique', 'MVT', 'ledger item id']
-    
-    # Vérifier quelle base correspond
-    has_base1 = all(col in df.columns for col in base1_columns)
-    has_base2 = all(col in df.columns for col in base2_columns)
+    # Vérifier quelle base correspond (colonnes de référence dans factoring.schema)
+    has_base1 = all(col in columns for col in BASE1_COLUMNS)
+    has_base2 = all(col in columns for col in BASE2_COLUMNS)
     
     if has_base1 and not has_base2:
         st.info("**Base de données détectée :** Format original avec colonnes TIRES, RUB, etc.")
@@ -149,11 +380,61 @@ if st.session_state.df is not None:
     else:
         st.error("**Format de base de données non reconnu.**")
         st.write("**Colonnes détectées dans votre fichier :**")
-        st.write(", ".join(df.columns.tolist()))
+        st.write(", ".join(columns))
         st.write("")
         st.write("**Formats supportés :**")
         st.write("- **Format 1 :** TIRES, Debtor Number, EntryAmountSAC, RUB, etc.")
         st.write("- **Format 2 :** Entry Amount SAC, Rubrique, MVT, ledger item id, etc.")
 
 else:
-    st.info("Veuillez charger un fichier pour continuer.")
\ No newline at end of file
+    st.info("Veuillez charger un fichier pour continuer.")
+
+
+# --- Cache local des feuilles déjà parsées ---
+st.markdown("---")
+with st.expander("Cache local des fichiers"):
+    entries = sheet_cache.entries()
+    if entries:
+        cache_table = pd.DataFrame([{
+            'Fichier': m.get('file_name', ''),
+            'Feuille': m.get('sheet', ''),
+            'Ligne entête': m.get('header_row'),
+            'Lignes': m['rows'],
+            'Taille (Mo)': round(m['size_bytes'] / 1024 / 1024, 2),
+            'Dernier accès': pd.to_datetime(m['last_access'], unit='s').strftime('%d/%m/%Y %H:%M'),
+            'Clé': m['key'],
+        } for m in entries])
+        st.write(f"**{len(entries)} entrée(s)**, {sheet_cache.total_bytes() / 1024 / 1024:,.1f} Mo "
+                 f"sur {sheet_cache.max_bytes / 1024 / 1024:,.0f} Mo".replace(",", " "))
+        st.dataframe(cache_table, use_container_width=True, hide_index=True)
+
+        labels = {m['key']: f"{m.get('file_name', '')} ({m.get('sheet', '')})" for m in entries}
+        to_purge = st.multiselect("Entrées à supprimer", list(labels), format_func=labels.get)
+        col1, col2 = st.columns(2)
+        if col1.button("Supprimer la sélection", disabled=not to_purge):
+            sheet_cache.purge(to_purge)
+            st.rerun()
+        if col2.button("Vider tout le cache"):
+            sheet_cache.purge()
+            st.rerun()
+    else:
+        st.write("Le cache est vide.")
+
+with st.expander("Jeux de données partagés (mémoire du serveur)"):
+    shared = registry.entries()
+    if shared:
+        st.write(f"**{len(shared)} jeu(x) en mémoire**, {registry.total_bytes() / 1024 / 1024:,.1f} Mo "
+                 f"sur {registry.max_bytes / 1024 / 1024:,.0f} Mo. Au-delà, les jeux qu'aucune session "
+                 f"n'utilise sont écrits dans le cache local puis libérés.".replace(",", " "))
+        st.dataframe(pd.DataFrame([{
+            'Fichier': m.get('file_name', ''),
+            'Feuille': m.get('sheet', ''),
+            'Lignes': m['rows'],
+            'Mémoire (Mo)': round(m['size_bytes'] / 1024 / 1024, 2),
+            'Sessions': m['sessions'],
+            'Clé': m['key'],
+        } for m in shared]), use_container_width=True, hide_index=True)
+    else:
+        st.write("Aucun jeu de données en mémoire.")
+
+profiling_panel(profiler)
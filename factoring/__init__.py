@@ -0,0 +1 @@
+"""Briques de calcul partagées par l'application Streamlit (lecture, préparation, agrégats)."""
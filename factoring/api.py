@@ -0,0 +1,218 @@
+"""Service HTTP local : les agrégats des pages 1 et 2 en JSON pour les autres outils internes.
+
+Exemple : python -m factoring.api --port 8765
+          curl http://127.0.0.1:8765/datasets/<clé>/clients/<numéro>
+
+Lancé à côté de l'application (variable FACTORING_API_PORT), il sert les jeux de
+données partagés du serveur Streamlit ; lancé seul, ceux du cache disque.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from factoring.batch import warm_up
+from factoring.registry import shared_registry
+from factoring.reports import client_report, debtor_report
+
+
+API_HOST = os.environ.get("FACTORING_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("FACTORING_API_PORT", 8765))
+
+# Réponses JSON gardées en mémoire (un jeu de données chargé ne change pas sous sa clé)
+RESPONSE_CACHE_SIZE = 4096
+
+# Analyses exposées : fonction de rapport des pages 1 et 2
+API_ANALYSES = {'clients': client_report, 'debtors': debtor_report}
+
+# Colonne identifiant l'entité de chaque analyse (absente de certains formats de grand livre)
+API_KEY_COLUMNS = {'clients': 'Client Number', 'debtors': 'Debtor Number'}
+
+# Lignes brutes exclues : le service renvoie les agrégats, pas les mouvements
+API_SKIPPED_TABLES = ['Mouvements']
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalyticsService:
+    """Agrégats JSON par adhérent ou par tiré, calculés sur les jeux du registre partagé.
+
+    Les index et agrégats du jeu (voir warm_up) sont construits à la première
+    requête qui le vise puis partagés par toutes les suivantes ; chaque réponse
+    est ensuite mémorisée (LRU), la clé d'un jeu désignant un contenu immuable.
+    """
+
+    def __init__(self, registry=None, cache_size=RESPONSE_CACHE_SIZE):
+        self.registry = registry if registry is not None else shared_registry()
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()
+        self._warm = set()
+        self._warming = {}
+
+    def datasets(self):
+        """Jeux disponibles : en mémoire du serveur, puis seulement dans le cache disque."""
+        in_memory = self.registry.entries()
+        known = {entry['key'] for entry in in_memory}
+        listed = [{'key': entry['key'], 'file_name': entry.get('file_name', ''), 'sheet': entry.get('sheet', ''),
+                   'rows': entry['rows'], 'in_memory': True} for entry in in_memory]
+        listed += [{'key': meta['key'], 'file_name': meta.get('file_name', ''), 'sheet': meta.get('sheet', ''),
+                    'rows': meta['rows'], 'in_memory': False}
+                   for meta in self.registry.spill.entries() if meta['key'] not in known]
+        return listed
+
+    def _lease(self, key):
+        if key == 'latest':
+            entries = self.registry.entries()
+            if not entries:
+                raise ApiError(HTTPStatus.NOT_FOUND, "Aucun jeu de données en mémoire.")
+            key = entries[0]['key']
+        lease = self.registry.get(key)
+        if lease is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Jeu de données inconnu : {key}")
+        return lease
+
+    def _warm_up(self, lease):
+        """Index et agrégats du jeu, construits une seule fois même sous requêtes concurrentes."""
+        # Un jeu évincé puis relu du disque est un nouveau DataFrame, à indexer à nouveau
+        built = (lease.key, id(lease.df))
+        if built in self._warm:
+            return
+        with self._lock:
+            building = self._warming.setdefault(lease.key, threading.Lock())
+        with building:
+            if built not in self._warm:
+                warm_up(lease.df, API_ANALYSES)
+                self._warm.add(built)
+
+    def report(self, dataset, analysis, entity):
+        """Corps JSON (octets) des tableaux de `entity` pour l'analyse `analysis`."""
+        if analysis not in API_ANALYSES:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Analyse inconnue : {analysis}")
+        lease = self._lease(dataset)
+        if API_KEY_COLUMNS[analysis] not in lease.df.columns:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Analyse indisponible pour ce format : {analysis}")
+        cache_key = (lease.key, analysis, entity.strip())
+        with self._lock:
+            body = self._responses.get(cache_key)
+            if body is not None:
+                self._responses.move_to_end(cache_key)
+                return body
+
+        self._warm_up(lease)
+        tables = API_ANALYSES[analysis](lease.df, entity)
+        if tables is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f"Identifiant inconnu : {entity}")
+        # to_json sérialise d'un bloc (dates ISO, NaN -> null) ; les tableaux sont assemblés sans re-décodage
+        parts = [json.dumps(name, ensure_ascii=False) + ': '
+                 + table.to_json(orient='records', date_format='iso', force_ascii=False)
+                 for name, table in tables.items() if name not in API_SKIPPED_TABLES]
+        body = (f'{{"dataset": "{lease.key}", "analysis": "{analysis}", '
+                f'"entity": {json.dumps(entity.strip(), ensure_ascii=False)}, '
+                f'"tables": {{{", ".join(parts)}}}}}').encode('utf-8')
+
+        with self._lock:
+            self._responses[cache_key] = body
+            while len(self._responses) > self.cache_size:
+                self._responses.popitem(last=False)
+        return body
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    """Routes : /datasets, /datasets/<clé|latest>/clients/<numéro>, /datasets/<clé|latest>/debtors/<numéro>."""
+
+    service = None
+
+    def do_GET(self):
+        start = time.perf_counter()
+        parts = [unquote(part) for part in urlsplit(self.path).path.strip('/').split('/')]
+        try:
+            if parts == ['datasets']:
+                body = json.dumps(self.service.datasets(), ensure_ascii=False).encode('utf-8')
+            elif len(parts) == 4 and parts[0] == 'datasets':
+                body = self.service.report(parts[1], parts[2], parts[3])
+            else:
+                raise ApiError(HTTPStatus.NOT_FOUND, f"Route inconnue : {self.path}")
+            status = HTTPStatus.OK
+        except ApiError as e:
+            status, body = e.status, json.dumps({'error': str(e)}, ensure_ascii=False).encode('utf-8')
+        except Exception as e:
+            # Erreur inattendue : réponse JSON plutôt qu'une connexion fermée sans statut
+            status = HTTPStatus.INTERNAL_SERVER_ERROR
+            body = json.dumps({'error': f"{type(e).__name__} : {e}"}, ensure_ascii=False).encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        # Durée de traitement côté serveur, pour suivre le temps de réponse
+        self.send_header('Server-Timing', f'app;dur={(time.perf_counter() - start) * 1000:.2f}')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Pas de journal par requête sur la sortie d'erreur du serveur Streamlit
+        pass
+
+
+def make_server(service, host=API_HOST, port=API_PORT):
+    """Serveur HTTP multi-thread (un thread par requête) lié à `service`."""
+    handler = type('BoundApiHandler', (ApiHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+_server = None
+_server_error = None
+_server_lock = threading.Lock()
+
+
+def serve_in_background(registry=None, host=API_HOST, port=API_PORT):
+    """Démarre une seule fois par processus le service sur le registre partagé, dans un thread.
+
+    Renvoie `(serveur, None)`, ou `(None, erreur)` si le port n'a pas pu être ouvert :
+    l'échec est mémorisé et le démarrage n'est pas retenté à chaque rerun.
+    """
+    global _server, _server_error
+    with _server_lock:
+        if _server is None and _server_error is None:
+            try:
+                _server = make_server(AnalyticsService(registry), host, port)
+            except OSError as e:
+                # Port déjà pris (autre instance de l'application par exemple)
+                _server_error = e
+            else:
+                threading.Thread(target=_server.serve_forever, name="factoring-api", daemon=True).start()
+        return _server, _server_error
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m factoring.api",
+                                     description="Agrégats par adhérent et par tiré en JSON sur HTTP local.")
+    parser.add_argument("--host", default=API_HOST, help="adresse d'écoute (locale par défaut)")
+    parser.add_argument("--port", type=int, default=API_PORT, help="port d'écoute")
+    args = parser.parse_args(argv)
+
+    server = make_server(AnalyticsService(), args.host, args.port)
+    print(f"Service d'analyse sur http://{args.host}:{args.port}/datasets")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
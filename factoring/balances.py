@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from factoring.indexes import frame_memo, key_index
+
+
+OPENING_LABEL = "Solde Ouverture"
+
+
+def label_contains(s, pattern, case=True):
+    """Masque booléen `s.str.contains(pattern)` ; évalué une seule fois par catégorie si possible."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        hits = s.cat.categories.astype(str).str.contains(pattern, case=case, regex=False)
+        # Code -1 (valeur manquante) -> dernier élément ajouté, False
+        return np.append(np.asarray(hits, dtype=bool), False)[s.cat.codes.to_numpy()]
+    return s.astype(str).str.contains(pattern, case=case, regex=False, na=False).to_numpy()
+
+
+def opening_mask(df, transaction_col='Transaction'):
+    """Lignes de solde d'ouverture (libellé "Solde Ouverture" dans la colonne transaction)."""
+    if transaction_col is None or transaction_col not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return label_contains(df[transaction_col], OPENING_LABEL)
+
+
+class BalanceCube:
+    """Cube (entité x mois) des DR, CR, solde progressif et volume cumulé.
+
+    `balance` reprend la colonne SoldeMois des pages (solde d'ouverture + cumul de
+    DR - CR), `volume` la colonne SoldeCumulatif (solde d'ouverture + cumul de DR + CR).
+    Les mois couvrent la période réelle des données, communs à toutes les entités.
+    """
+
+    def __init__(self, index, months, dr, cr, opening):
+        self.index = index
+        self.months = months
+        self.dr = dr
+        self.cr = cr
+        self.opening = opening
+        self.balance = opening[:, None] + np.cumsum(dr - cr, axis=1)
+        self.volume = opening[:, None] + np.cumsum(dr + cr, axis=1)
+
+    def opening_balance(self, key):
+        code = self.index.code(key)
+        return 0.0 if code is None else float(self.opening[code])
+
+    def entity_table(self, key):
+        """Tableau mensuel d'une entité : YearMonth, SoldeInitial, DR, CR, SoldeMois, SoldeCumulatif."""
+        code = self.index.code(key)
+        n = len(self.months)
+        if code is None:
+            dr = cr = balance = volume = np.zeros(n)
+        else:
+            dr, cr = self.dr[code], self.cr[code]
+            balance, volume = self.balance[code], self.volume[code]
+        # Solde initial = solde du mois précédent (0 pour le premier mois)
+        initial = np.concatenate(([0.0], balance[:-1])) if n else np.zeros(0)
+        return pd.DataFrame({
+            'YearMonth': self.months,
+            'SoldeInitial': initial,
+            'DR': dr,
+            'CR': cr,
+            'SoldeMois': balance,
+            'SoldeCumulatif': volume,
+        })
+
+    def to_frame(self):
+        """Cube complet au format long (une ligne par entité et par mois)."""
+        n_entities, n_months = self.dr.shape
+        return pd.DataFrame({
+            'Key': np.repeat(np.asarray(self.index.keys, dtype=object), n_months),
+            'YearMonth': np.tile(self.months, n_entities),
+            'DR': self.dr.ravel(),
+            'CR': self.cr.ravel(),
+            'SoldeMois': self.balance.ravel(),
+            'SoldeCumulatif': self.volume.ravel(),
+        })
+
+
+def build_balance_cube(df, entity_col, dr_col, cr_col, date_col='EntryDate', transaction_col='Transaction'):
+    """Construit le BalanceCube de toutes les entités de `entity_col` en une passe vectorisée."""
+    index = key_index(df, entity_col)
+    codes = index.codes
+    n_entities = len(index)
+
+    dr = df[dr_col].to_numpy(dtype=np.float64)
+    cr = df[cr_col].to_numpy(dtype=np.float64)
+    so = opening_mask(df, transaction_col)
+
+    # Numéro de mois depuis 1970 (NaT exclu via le masque)
+    month = df[date_col].to_numpy(dtype='datetime64[M]')
+    valid = (codes >= 0) & ~so & ~np.isnat(month)
+    month_no = month.astype(np.int64)
+
+    if valid.any():
+        first, last = int(month_no[valid].min()), int(month_no[valid].max())
+        months = pd.DatetimeIndex(np.arange(first, last + 1).astype('datetime64[M]').astype('datetime64[ns]'))
+    else:
+        first, months = 0, pd.DatetimeIndex([])
+    n_months = len(months)
+
+    # Sommes par (entité, mois) : un seul bincount sur l'indice aplati
+    cell = codes[valid] * n_months + (month_no[valid] - first)
+    size = n_entities * n_months
+    cube_dr = np.bincount(cell, weights=dr[valid], minlength=size).reshape(n_entities, n_months)
+    cube_cr = np.bincount(cell, weights=cr[valid], minlength=size).reshape(n_entities, n_months)
+
+    so_rows = so & (codes >= 0)
+    opening = np.bincount(codes[so_rows], weights=dr[so_rows], minlength=n_entities)
+    return BalanceCube(index, months, cube_dr, cube_cr, opening)
+
+
+def balance_cube(df, entity_col, dr_col, cr_col, date_col='EntryDate', transaction_col='Transaction'):
+    """BalanceCube mémorisé pour ce DataFrame (construit une seule fois par jeu de données)."""
+    key = ('balance_cube', entity_col, dr_col, cr_col, date_col, transaction_col)
+    return frame_memo(df, key, lambda: build_balance_cube(df, entity_col, dr_col, cr_col, date_col, transaction_col))
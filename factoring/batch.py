@@ -0,0 +1,294 @@
+import io
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_all_start_methods, get_context
+from pathlib import Path
+
+import pandas as pd
+
+from factoring.balances import balance_cube
+from factoring.concentration import debtor_concentration
+from factoring.consolidation import MAX_WORKERS
+from factoring.exposure import exposure_graph
+from factoring.indexes import key_index
+from factoring.reports import client_report, debtor_report, general_report, monthly_balance_table
+
+
+# Nombre d'entités traitées par tâche : assez pour amortir l'envoi au processus, assez peu pour équilibrer
+BATCH_SIZE = 25
+
+# Analyses par entité : colonne clé, fonction de rapport, sous-dossier de sortie et libellé
+ENTITY_ANALYSES = {
+    'clients': ('Client Number', client_report, 'adherents', 'Adhérent'),
+    'debtors': ('Debtor Number', debtor_report, 'tires', 'Tiré'),
+}
+
+FORMATS = ['xlsx', 'csv', 'pdf']
+
+# Tableaux absents des PDF : lignes brutes, des milliers de lignes pour un gros adhérent
+PDF_SKIPPED_TABLES = ['Mouvements']
+
+# Lignes de tableau par page PDF (A4 paysage)
+PDF_ROWS_PER_PAGE = 30
+
+
+def entity_ids(df, analysis):
+    """Identifiants (clés normalisées) de toutes les entités de l'analyse `analysis`."""
+    return list(key_index(df, ENTITY_ANALYSES[analysis][0]).keys)
+
+
+def safe_name(key):
+    """Nom de fichier sûr pour un identifiant ou un nom de table."""
+    return re.sub(r'[^\w.-]+', '_', str(key)).strip('_') or '_'
+
+
+def write_tables(tables, path, fmt='xlsx'):
+    """Écrit les tableaux `tables` : un classeur à un onglet par tableau, ou un CSV par tableau."""
+    written = []
+    if fmt == 'xlsx':
+        path = path.with_name(f"{path.name}.xlsx")
+        with pd.ExcelWriter(path) as writer:
+            for name, table in tables.items():
+                # Onglets Excel : 31 caractères au plus
+                table.to_excel(writer, sheet_name=name[:31], index=False)
+        written.append(path)
+    else:
+        for name, table in tables.items():
+            table_path = path.with_name(f"{path.name}_{safe_name(name)}.csv")
+            # Séparateur et encodage lisibles par Excel en français
+            table.to_csv(table_path, sep=';', index=False, encoding='utf-8-sig')
+            written.append(table_path)
+    return written
+
+
+def write_figures(figures, path):
+    """Enregistre les graphiques en PNG."""
+    written = []
+    for name, fig in figures.items():
+        fig_path = path.with_name(f"{path.name}_{safe_name(name)}.png")
+        fig.savefig(fig_path, dpi=100)
+        written.append(fig_path)
+    return written
+
+
+def _pdf_cells(table):
+    """Textes des cellules d'un tableau PDF : montants « 10 000 », pourcentages à deux décimales."""
+    cells = pd.DataFrame(index=table.index)
+    for col in table.columns:
+        values = table[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values) \
+                and not str(col).endswith('Number'):
+            pattern = "{:.2f}" if str(col).startswith('%') else "{:,.0f}"
+            cells[col] = values.map(lambda v: '' if pd.isna(v) else pattern.format(v).replace(",", " "))
+        else:
+            cells[col] = values.astype(object).where(values.notna(), '').astype(str)
+    return cells
+
+
+def _table_pages(title, table):
+    """Pages PDF (figures matplotlib) d'un tableau, découpé par PDF_ROWS_PER_PAGE lignes.
+
+    Chaque page est un seul bloc de texte à chasse fixe : une cellule matplotlib
+    (ax.table) par valeur coûte plusieurs secondes sur les gros tableaux.
+    """
+    from matplotlib.figure import Figure
+
+    cells = _pdf_cells(table)
+    pages = []
+    for start in range(0, max(len(cells), 1), PDF_ROWS_PER_PAGE):
+        chunk = cells.iloc[start:start + PDF_ROWS_PER_PAGE]
+        fig = Figure(figsize=(11.69, 8.27))
+        suffix = f" ({start // PDF_ROWS_PER_PAGE + 1})" if len(cells) > PDF_ROWS_PER_PAGE else ""
+        fig.text(0.05, 0.95, title + suffix, fontsize=12, weight='bold', va='top')
+        fig.text(0.05, 0.90, chunk.to_string(index=False), family='monospace', fontsize=8, va='top')
+        pages.append(fig)
+    return pages
+
+
+def write_pdf(tables, figures, path, title=""):
+    """Écrit un rapport PDF : tableaux (hors PDF_SKIPPED_TABLES) puis graphiques."""
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    path = path.with_name(f"{path.name}.pdf")
+    with PdfPages(path) as pdf:
+        for name, table in tables.items():
+            if name in PDF_SKIPPED_TABLES:
+                continue
+            for page in _table_pages(f"{title} - {name}" if title else name, table):
+                pdf.savefig(page)
+        for fig in figures.values():
+            pdf.savefig(fig)
+    return [path]
+
+
+def write_report(tables, path, fmt='xlsx', figures=None, title=""):
+    """Écrit un rapport : classeur ou CSV (et graphiques en PNG), ou PDF complet."""
+    if fmt == 'pdf':
+        return write_pdf(tables, figures or {}, path, title)
+    written = write_tables(tables, path, fmt)
+    if figures:
+        written += write_figures(figures, path)
+    return written
+
+
+def entity_figures(df, analysis, key, tables):
+    """Graphiques des pages 1 (adhérent) et 2 (tiré) pour une entité."""
+    from factoring.charts import balance_evolution_figure, monthly_movements_figure, rub_figure, tires_figure
+
+    figures = {}
+    if analysis == 'clients' and 'Mensuel' in tables:
+        monthly = monthly_balance_table(df, 'Client Number', key)
+        if monthly['YearMonth'].notna().any():
+            figures['mouvements_mensuels'] = monthly_movements_figure(monthly)
+            figures['evolution_solde'] = balance_evolution_figure(monthly)
+    if 'Tirés' in tables and not tables['Tirés'].empty:
+        figures['tires'] = tires_figure(tables['Tirés'])
+    if 'RUB' in tables and not tables['RUB'].empty:
+        figures['rub'] = rub_figure(tables['RUB'])
+    return figures
+
+
+def general_figures(tables):
+    """Graphiques de l'analyse générale (page 3)."""
+    from factoring.charts import monthly_totals_figure, rubrique_figure, top_clients_figure, transaction_figure
+
+    figures = {}
+    if not tables['Rubriques'].empty:
+        figures['rubriques'] = rubrique_figure(tables['Rubriques'])
+    if 'Transactions' in tables and not tables['Transactions'].empty:
+        figures['transactions'] = transaction_figure(tables['Transactions'])
+    if 'Mensuel' in tables and not tables['Mensuel'].empty:
+        figures['mensuel'] = monthly_totals_figure(tables['Mensuel'])
+    if not tables['Top adhérents'].empty:
+        figures['top_adherents'] = top_clients_figure(tables['Top adhérents'])
+    return figures
+
+
+def warm_up(df, analyses):
+    """Construit index et agrégats partagés avant le lancement des processus.
+
+    Avec le démarrage par 'fork', les processus héritent de ces structures (et du
+    grand livre) sans copie ni recalcul.
+    """
+    if 'clients' in analyses and 'Client Number' in df.columns:
+        key_index(df, 'Client Number')
+        if 'EntryAmount' in df.columns:
+            balance_cube(df, 'Client Number', 'EntryAmount', 'EntryAmountSAC')
+        if 'TIRES' in df.columns and 'Debtor Number' in df.columns:
+            debtor_concentration(df)
+    if 'debtors' in analyses and 'Debtor Number' in df.columns:
+        key_index(df, 'Debtor Number')
+        if 'EntryAmount' in df.columns:
+            balance_cube(df, 'Debtor Number', 'EntryAmount', 'EntryAmountSAC')
+        if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
+            exposure_graph(df)
+
+
+# Grand livre et options du processus de travail, fixés une fois par processus (voir _init_worker)
+_worker = {}
+
+
+def _init_worker(df, out_dir, fmt, charts):
+    """Initialise un processus de travail : le grand livre est reçu une seule fois, pas à chaque tâche."""
+    if charts or fmt == 'pdf':
+        import matplotlib
+        matplotlib.use('Agg')
+    _worker.update(df=df, out_dir=Path(out_dir), fmt=fmt, charts=charts)
+
+
+def run_entities(analysis, keys):
+    """Écrit les rapports d'un lot d'entités ; renvoie une liste de (clé, secondes, nombre de fichiers)."""
+    df, fmt, charts = _worker['df'], _worker['fmt'], _worker['charts']
+    _, report, folder, label = ENTITY_ANALYSES[analysis]
+    results = []
+    for key in keys:
+        start = time.perf_counter()
+        tables = report(df, key)
+        written = []
+        if tables is not None:
+            # Le PDF contient toujours les graphiques
+            figures = entity_figures(df, analysis, key, tables) if charts or fmt == 'pdf' else None
+            written = write_report(tables, _worker['out_dir'] / folder / safe_name(key), fmt, figures,
+                                   title=f"{label} {key}")
+        results.append((key, time.perf_counter() - start, len(written)))
+    return results
+
+
+def _batches(keys, size):
+    return [keys[i:i + size] for i in range(0, len(keys), size)]
+
+
+def _pool_context(start_method=None):
+    # 'fork' : les processus partagent la mémoire du grand livre (copie à l'écriture) ; sinon 'spawn'
+    if start_method is None:
+        start_method = 'fork' if 'fork' in get_all_start_methods() else 'spawn'
+    return get_context(start_method)
+
+
+def run_batch(df, analysis, keys, out_dir, fmt='xlsx', charts=False, workers=MAX_WORKERS,
+              batch_size=BATCH_SIZE, progress=None, start_method=None):
+    """Rapports de l'analyse `analysis` ('clients' ou 'debtors') pour `keys`, répartis sur `workers` processus.
+
+    Les entités sont groupées en lots de `batch_size` ; `progress(faits, total)` est
+    appelé à chaque lot terminé. Le grand livre est transmis une fois par processus
+    (hérité avec 'fork', sérialisé une fois avec 'spawn', à préférer depuis le
+    serveur Streamlit), jamais par tâche. Renvoie la liste des (clé, secondes,
+    nombre de fichiers), les clés inconnues ayant 0 fichier.
+    """
+    out_dir = Path(out_dir)
+    (out_dir / ENTITY_ANALYSES[analysis][2]).mkdir(parents=True, exist_ok=True)
+    keys = list(keys)
+    warm_up(df, [analysis])
+    batches = _batches(keys, batch_size)
+    results = []
+
+    workers = min(workers, len(batches))
+    if workers <= 1:
+        _init_worker(df, out_dir, fmt, charts)
+        for batch in batches:
+            results += run_entities(analysis, batch)
+            if progress:
+                progress(len(results), len(keys))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(start_method), initializer=_init_worker,
+                             initargs=(df, str(out_dir), fmt, charts)) as pool:
+        futures = [pool.submit(run_entities, analysis, batch) for batch in batches]
+        for future in as_completed(futures):
+            results += future.result()
+            if progress:
+                progress(len(results), len(keys))
+    return results
+
+
+def run_general(df, totals, out_dir, fmt='xlsx', charts=False):
+    """Écrit les tableaux (et graphiques) de l'analyse générale ; renvoie les fichiers écrits."""
+    figures = None
+    if charts or fmt == 'pdf':
+        import matplotlib
+        matplotlib.use('Agg')
+    tables = general_report(df, totals)
+    if charts or fmt == 'pdf':
+        figures = general_figures(tables)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return write_report(tables, out_dir / 'analyse_generale', fmt, figures, title="Analyse générale")
+
+
+def timing_table(results):
+    """Durée de chaque rapport (secondes), du plus lent au plus rapide, identifiants inconnus exclus."""
+    timings = pd.DataFrame(results, columns=['Identifiant', 'Secondes', 'Fichiers'])
+    return timings[timings['Fichiers'] > 0].sort_values('Secondes', ascending=False).reset_index(drop=True)
+
+
+def zip_reports(out_dir):
+    """Archive zip (octets) de tous les fichiers du dossier de rapports."""
+    out_dir = Path(out_dir)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for path in sorted(out_dir.rglob('*')):
+            if path.is_file():
+                archive.write(path, path.relative_to(out_dir))
+    return buffer.getvalue()
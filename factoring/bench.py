@@ -0,0 +1,183 @@
+"""Banc d'essai des traitements du grand livre sur des données synthétiques.
+
+Chronomètre la lecture Excel, la normalisation, les recherches par identifiant et
+les agrégats de chaque page, puis enregistre les mesures en JSON pour comparer
+deux versions du code.
+
+Exemple : python -m factoring.bench --rows 10000 100000 --out bench.json
+          python -m factoring.bench --rows 100000 --compare bench.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from factoring.balances import build_balance_cube
+from factoring.concentration import build_debtor_concentration
+from factoring.excel_io import WorkbookSession
+from factoring.exposure import build_exposure_graph
+from factoring.indexes import KeyIndex, key_index
+from factoring.reports import client_report, debtor_report, general_report
+from factoring.schema import HEADER_COLUMNS, normalize_ledger
+from factoring.search import build_search_index, search_index
+from factoring.synthetic import synthetic_ledger, write_ledger_workbook
+from factoring.totals import build_ledger_totals, ledger_totals
+
+
+# Au-delà, l'écriture du classeur de test est trop longue : la lecture Excel n'est pas mesurée
+INGEST_MAX_ROWS = 200_000
+
+# Entités tirées au hasard pour les mesures par adhérent ou par tiré
+SAMPLE_ENTITIES = 20
+
+# Écart relatif au-delà duquel une comparaison est signalée
+COMPARE_TOLERANCE = 0.10
+
+
+def timed(fn, repeat=3):
+    """Durées (secondes) de `repeat` appels de `fn` et résultat du dernier appel."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def _sample(keys, n, seed=0):
+    keys = np.asarray(keys, dtype=object)
+    return list(np.random.default_rng(seed).choice(keys, size=min(n, len(keys)), replace=False))
+
+
+def run_suite(rows, base_type, repeat=3, seed=0, ingest_max_rows=INGEST_MAX_ROWS):
+    """Mesures d'un grand livre synthétique : liste de dictionnaires (étape, secondes...)."""
+    results = []
+
+    def record(stage, times, per=1):
+        # `per` : nombre d'opérations par appel, pour les durées unitaires (recherches, rapports)
+        results.append({'rows': rows, 'base': base_type, 'stage': stage, 'repeat': len(times),
+                        'best': min(times) / per, 'median': statistics.median(times) / per})
+
+    times, raw = timed(lambda: synthetic_ledger(rows, base_type, seed=seed), repeat=1)
+    record('generate', times)
+
+    if rows <= ingest_max_rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = write_ledger_workbook(raw, Path(tmp) / 'ledger.xlsx')
+
+            def ingest():
+                workbook = WorkbookSession(path)
+                try:
+                    sheet = workbook.sheetnames[0]
+                    return workbook.read(sheet, workbook.header_row(sheet, HEADER_COLUMNS))
+                finally:
+                    workbook.close()
+
+            record('ingest', timed(ingest, repeat=1)[0])
+
+    times, df = timed(lambda: normalize_ledger(raw.copy()), repeat)
+    record('normalize', times)
+
+    # Recherches : index construit, puis lookups unitaires
+    record('key_index', timed(lambda: KeyIndex(df['Client Number']), repeat)[0])
+    clients = _sample(key_index(df, 'Client Number').keys, SAMPLE_ENTITIES, seed)
+    record('lookup_client', timed(lambda: [key_index(df, 'Client Number').take(df, key) for key in clients],
+                                  repeat)[0], per=len(clients))
+    record('search_index', timed(lambda: build_search_index(df, 'Client Number', 'Legal Client Name'), repeat)[0])
+    index = search_index(df, 'Client Number', 'Legal Client Name')
+    record('search_suggest', timed(lambda: [index.suggest(q) for q in ("adherent 000", "1000", "sarl 12")],
+                                   repeat)[0], per=3)
+    record('ledger_totals', timed(lambda: build_ledger_totals(df), repeat)[0])
+
+    if base_type == 'original':
+        # Page 1 : cube mensuel, concentration des tirés, puis rapport complet par adhérent
+        record('page1_balance_cube', timed(lambda: build_balance_cube(df, 'Client Number', 'EntryAmount',
+                                                                      'EntryAmountSAC'), repeat)[0])
+        record('page1_concentration', timed(lambda: build_debtor_concentration(df), repeat)[0])
+        client_report(df, clients[0])
+        record('page1_report', timed(lambda: [client_report(df, key) for key in clients], repeat)[0],
+               per=len(clients))
+
+        # Page 2 : cube mensuel des tirés, graphe d'exposition, rapport par tiré
+        record('page2_balance_cube', timed(lambda: build_balance_cube(df, 'Debtor Number', 'EntryAmount',
+                                                                      'EntryAmountSAC'), repeat)[0])
+        record('page2_exposure', timed(lambda: build_exposure_graph(df), repeat)[0])
+        debtors = _sample(key_index(df, 'Debtor Number').keys, SAMPLE_ENTITIES, seed)
+        debtor_report(df, debtors[0])
+        record('page2_report', timed(lambda: [debtor_report(df, key) for key in debtors], repeat)[0],
+               per=len(debtors))
+    else:
+        # Page 3 : agrégats du portefeuille puis tableaux de l'analyse générale
+        totals = ledger_totals(df)
+        record('page3_report', timed(lambda: general_report(df, totals), repeat)[0])
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Contexte d'une campagne de mesures : versions, machine, révision du code."""
+    return {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'revision': _git_revision(),
+            'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'machine': platform.machine(), 'system': platform.system()}
+
+
+def compare(results, baseline, tolerance=COMPARE_TOLERANCE):
+    """Tableau des écarts (meilleure durée) entre deux campagnes, sur les mesures communes."""
+    key = ['rows', 'base', 'stage']
+    merged = pd.DataFrame(results)[key + ['best']].merge(
+        pd.DataFrame(baseline)[key + ['best']], on=key, suffixes=('', '_reference'))
+    merged['ratio'] = merged['best'] / merged['best_reference']
+    merged['verdict'] = np.select([merged['ratio'] > 1 + tolerance, merged['ratio'] < 1 - tolerance],
+                                  ['plus lent', 'plus rapide'], '')
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m factoring.bench",
+                                     description="Banc d'essai sur grands livres synthétiques.")
+    parser.add_argument("--rows", nargs="+", type=int, default=[10_000, 100_000], help="tailles à mesurer")
+    parser.add_argument("--bases", nargs="+", choices=['original', 'alternative'], default=['original', 'alternative'],
+                        help="formats de grand livre")
+    parser.add_argument("--repeat", type=int, default=3, help="répétitions de chaque mesure")
+    parser.add_argument("--seed", type=int, default=0, help="graine du générateur")
+    parser.add_argument("--ingest-max-rows", type=int, default=INGEST_MAX_ROWS,
+                        help="taille maximale pour mesurer la lecture Excel")
+    parser.add_argument("--out", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="fichier JSON d'une campagne de référence")
+    args = parser.parse_args(argv)
+
+    results = []
+    for rows in args.rows:
+        for base_type in args.bases:
+            print(f"{rows:,}".replace(",", " ") + f" lignes, format {base_type}...", file=sys.stderr)
+            results += run_suite(rows, base_type, args.repeat, args.seed, args.ingest_max_rows)
+
+    table = pd.DataFrame(results)
+    print(table.to_string(index=False, float_format=lambda s: f"{s * 1000:.2f} ms"))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({'environment': environment(), 'results': results}, f, ensure_ascii=False, indent=1)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)['results']
+        print(compare(results, baseline).to_string(index=False, float_format=lambda s: f"{s:.4g}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+
+# Répertoire et budget du cache, surchargeables par variables d'environnement
+CACHE_DIR = Path(os.environ.get(
+    "FACTORING_CACHE_DIR",
+    Path(__file__).resolve().parent.parent / ".cache" / "sheets",
+))
+CACHE_MAX_MB = float(os.environ.get("FACTORING_CACHE_MAX_MB", 1024))
+
+_HASH_BLOCK = 1 << 20
+
+# Champs de métadonnées tenus par le cache (les autres viennent de `info` lors de l'enregistrement)
+_META_FIELDS = {"key", "data_file", "format", "rows", "columns", "size_bytes", "created", "last_access", "hits"}
+
+
+def file_digest(file):
+    """Empreinte SHA-256 du contenu d'un fichier (chemin ou objet binaire type UploadedFile)."""
+    h = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+                h.update(block)
+        return h.hexdigest()
+
+    pos = file.tell()
+    file.seek(0)
+    for block in iter(lambda: file.read(_HASH_BLOCK), b""):
+        h.update(block)
+    file.seek(pos)
+    return h.hexdigest()
+
+
+def cache_key(digest, sheet_name, header_row, version=0):
+    """Clé d'une feuille parsée : (empreinte du fichier, feuille, ligne d'entête).
+
+    `version` permet d'invalider les entrées quand la préparation des données change.
+    """
+    raw = f"{digest}\x00{sheet_name}\x00{int(header_row)}\x00{version}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class SheetCache:
+    """Cache disque des feuilles parsées, adressé par contenu, avec éviction LRU.
+
+    Chaque entrée est un fichier Parquet (ou pickle si Arrow ne sait pas représenter
+    une colonne hétérogène) accompagné d'un fichier JSON de métadonnées. La date de
+    dernier accès sert à l'éviction quand la taille totale dépasse `max_mb`.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_mb=CACHE_MAX_MB):
+        self.directory = Path(directory)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+
+    def _meta_path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _read_meta(self, key):
+        try:
+            with open(self._meta_path(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        tmp = self._meta_path(key).with_suffix(".json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self._meta_path(key))
+
+    def load(self, key):
+        """DataFrame en cache pour `key`, ou None si absent ou illisible."""
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        data_path = self.directory / meta["data_file"]
+        try:
+            if meta["format"] == "parquet":
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+        except (OSError, ValueError, ImportError):
+            self.purge([key])
+            return None
+
+        meta["last_access"] = time.time()
+        meta["hits"] = meta.get("hits", 0) + 1
+        self._write_meta(key, meta)
+        return df
+
+    def info(self, key):
+        """Informations passées à `store` pour `key` (nom de fichier, feuille...), None si absente."""
+        meta = self._read_meta(key)
+        if meta is None:
+            return None
+        return {name: value for name, value in meta.items() if name not in _META_FIELDS}
+
+    def store(self, key, df, **info):
+        """Enregistre `df` sous `key` ; `info` (nom de fichier, feuille...) est conservé pour l'affichage."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        data_path = self.directory / f"{key}.parquet"
+        fmt = "parquet"
+        try:
+            df.to_parquet(data_path, index=False)
+        except (TypeError, ValueError, ImportError):
+            # Colonne à types mélangés (ex. dates et textes), ou pyarrow non installé : sérialisation sans perte
+            data_path.unlink(missing_ok=True)
+            data_path = self.directory / f"{key}.pkl"
+            fmt = "pickle"
+            df.to_pickle(data_path)
+
+        now = time.time()
+        self._write_meta(key, {
+            **info,
+            "key": key,
+            "data_file": data_path.name,
+            "format": fmt,
+            "rows": int(len(df)),
+            "columns": int(df.shape[1]),
+            "size_bytes": data_path.stat().st_size,
+            "created": now,
+            "last_access": now,
+            "hits": 0,
+        })
+        self.enforce_budget(keep=key)
+
+    def entries(self):
+        """Liste des entrées (dictionnaires de métadonnées), la plus récemment utilisée en premier."""
+        if not self.directory.exists():
+            return []
+        metas = []
+        for path in self.directory.glob("*.json"):
+            meta = self._read_meta(path.stem)
+            if meta is not None:
+                metas.append(meta)
+        return sorted(metas, key=lambda m: m["last_access"], reverse=True)
+
+    def total_bytes(self):
+        return sum(m["size_bytes"] for m in self.entries())
+
+    def purge(self, keys=None):
+        """Supprime les entrées `keys` (toutes si None). Retourne le nombre d'entrées supprimées."""
+        if keys is None:
+            keys = [m["key"] for m in self.entries()]
+        removed = 0
+        for key in keys:
+            meta = self._read_meta(key)
+            if meta is not None:
+                (self.directory / meta["data_file"]).unlink(missing_ok=True)
+                removed += 1
+            self._meta_path(key).unlink(missing_ok=True)
+        return removed
+
+    def enforce_budget(self, keep=None):
+        """Évince les entrées les moins récemment utilisées jusqu'à respecter le budget."""
+        entries = self.entries()
+        total = sum(m["size_bytes"] for m in entries)
+        for meta in reversed(entries):
+            if total <= self.max_bytes:
+                break
+            if meta["key"] == keep:
+                continue
+            self.purge([meta["key"]])
+            total -= meta["size_bytes"]
@@ -0,0 +1,505 @@
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib.ticker as mticker
+import numpy as np
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+
+# Images rendues gardées en mémoire (toutes sessions), surchargeable par variable d'environnement
+RENDER_CACHE_SIZE = int(os.environ.get("FACTORING_RENDER_CACHE_SIZE", 256))
+
+# Format des images affichées par les pages : 'png' ou 'svg'
+RENDER_FORMAT = os.environ.get("FACTORING_RENDER_FORMAT", "png")
+RENDER_DPI = 144
+
+# Barres par page des graphiques par tiré ou par adhérent, les suivantes regroupées en « Autres »
+CHART_TOP_N = int(os.environ.get("FACTORING_CHART_TOP_N", 20))
+OTHERS_LABEL = "Autres"
+
+# Un seul rendu matplotlib à la fois dans le processus : ni pyplot ni l'analyse
+# des textes mathématiques (graduations en échelle log) ne sont sûrs entre threads
+_render_lock = threading.Lock()
+
+
+def _subplots(nrows=1, ncols=1, **kwargs):
+    """Équivalent de `plt.subplots` hors de pyplot, dont l'état global n'est pas sûr entre threads."""
+    fig = Figure(**kwargs)
+    return fig, fig.subplots(nrows, ncols)
+
+
+def _thousands(x, _):
+    """Format « 10 000 » des axes."""
+    return f"{int(x):,}".replace(",", " ")
+
+
+def _bar_labels(ax, bars, **kwargs):
+    """Montants « 10 000 » au bout des barres, posés en un seul appel."""
+    ax.bar_label(bars, labels=[_thousands(bar.get_width(), None) for bar in bars], **kwargs)
+
+
+def chart_pages(count, n=CHART_TOP_N):
+    """Nombre de pages d'un graphique de `count` entités, `n` barres par page."""
+    return max(1, -(-count // n))
+
+
+def top_n_rows(stats, label_col, value_cols, n=CHART_TOP_N, page=0):
+    """Lignes de la page `page` (`n` par page, dans l'ordre de `stats`) et nombre d'entités suivantes.
+
+    Les entités après la page sont cumulées dans une dernière ligne « Autres (k) » :
+    le graphique garde une taille bornée quel que soit le nombre d'entités.
+    """
+    start = page * n
+    shown = stats.iloc[start:start + n]
+    rest = stats.iloc[start + n:]
+    if rest.empty:
+        return shown.reset_index(drop=True), 0
+    others = {label_col: f"{OTHERS_LABEL} ({len(rest):,})".replace(",", " ")}
+    others.update({col: rest[col].sum() for col in value_cols})
+    return pd.concat([shown, pd.DataFrame([others])], ignore_index=True), len(rest)
+
+
+def _others_mask(rows, hidden):
+    """Masque de la barre « Autres » (dernière ligne de top_n_rows s'il reste des entités)."""
+    mask = np.zeros(rows, dtype=bool)
+    if hidden:
+        mask[-1] = True
+    return mask
+
+
+def _page_title(title, total, n, page):
+    """Titre complété des rangs affichés lorsque le graphique a plusieurs pages."""
+    if total <= n:
+        return title
+    last = min(total, (page + 1) * n)
+    return f"{title} — rangs {page * n + 1} à {last} sur {total}"
+
+
+def _monthly_plot(monthly_balance):
+    """Mois réels du tableau mensuel (sans la ligne d'ouverture), solde d'ouverture reporté sur le premier."""
+    opening_balance = monthly_balance.loc[monthly_balance['YearMonth'].isna(), 'DR'].sum()
+    plot = monthly_balance[monthly_balance['YearMonth'].notna()].reset_index(drop=True)
+    plot['YearMonthStr'] = plot['YearMonth'].dt.strftime('%m-%Y')
+    # Colonnes pour barres empilées : l'ouverture uniquement sur la première barre
+    plot['OpeningDR'] = 0.0
+    plot['ActualDR'] = plot['DR']
+    if not plot.empty:
+        plot.loc[0, 'OpeningDR'] = opening_balance
+    return plot
+
+
+def monthly_movements_figure(monthly_balance):
+    """Histogramme mensuel DR (ouverture empilée sur le premier mois) et CR en négatif."""
+    plot = _monthly_plot(monthly_balance)
+    width = 0.35
+    fig, ax = _subplots(figsize=(10, 5))
+
+    # DR ouverture (vert clair)
+    ax.bar(plot['YearMonthStr'], plot['OpeningDR'], width, label='Solde Ouverture', color='lightgreen')
+    # DR normal (vert)
+    ax.bar(plot['YearMonthStr'], plot['ActualDR'], width, bottom=plot['OpeningDR'], color='green',
+           label='Débits (DR)')
+    # CR négatifs (bleu)
+    ax.bar(plot['YearMonthStr'], -plot['CR'], width, label='Crédits (CR)', color='blue', alpha=0.7)
+
+    ax.set_title("Histogramme mensuel des mouvements")
+    ax.set_xlabel("Mois")
+    ax.set_ylabel("Montants (Dt)")
+    ax.axhline(0, color='black', linewidth=1.2)
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    return fig
+
+
+def balance_evolution_figure(monthly_balance):
+    """Courbes du solde du mois et du solde cumulé, valeurs affichées sur les points."""
+    plot = _monthly_plot(monthly_balance)
+    fig, ax = _subplots(figsize=(10, 5))
+
+    sns.lineplot(data=plot, x='YearMonthStr', y='SoldeMois', marker='o', linewidth=2, color='green',
+                 label='Solde du mois', ax=ax)
+    sns.lineplot(data=plot, x='YearMonthStr', y='SoldeCumulatif', marker='o', linewidth=2, color='blue',
+                 label='Solde cumulé', ax=ax)
+
+    for i, val in enumerate(plot['SoldeCumulatif']):
+        ax.text(i, val, _thousands(val, None), ha='center', va='bottom', fontsize=9, color='blue')
+    for i, val in enumerate(plot['SoldeMois']):
+        ax.text(i, val, _thousands(val, None), ha='center', va='bottom', fontsize=9, color='green')
+
+    ax.set_title("Évolution mensuelle du solde (mois et cumulé)", fontsize=14)
+    ax.set_xlabel("Mois")
+    ax.set_ylabel("Solde (Dt)")
+    ax.grid(True, linestyle='--', alpha=0.5)
+
+    # Première valeur collée à l'axe Y
+    ax.margins(x=0)
+    ax.set_xlim(-0.1, len(plot['YearMonthStr']) - 1 + 0.1)
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0)
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    return fig
+
+
+def tires_figure(tires_stats, top_n=CHART_TOP_N, page=0):
+    """Barres horizontales DR/CR par tiré d'un adhérent, volume décroissant (SO en vert clair).
+
+    Seuls les `top_n` tirés de la page `page` sont tracés, les suivants sont cumulés
+    dans une barre « Autres » (gris).
+    """
+    tires_stats = tires_stats.copy()
+    tires_stats['Total'] = tires_stats['Total_DR'] + tires_stats['Total_CR']
+    tires_stats = tires_stats.sort_values(by='Total', ascending=False).reset_index(drop=True)
+    total = len(tires_stats)
+
+    # Couleurs en fonction du type de TIRES
+    tires_stats['TIRES'] = tires_stats['TIRES'].astype(str).str.strip().str.upper().str.replace(r'\s+', '', regex=True)
+    tires_stats, hidden = top_n_rows(tires_stats, 'TIRES', ['Total_DR', 'Total_CR', 'Total'], top_n, page)
+    so = (tires_stats['TIRES'] == 'SO').to_numpy()
+    others = _others_mask(len(tires_stats), hidden)
+    dr_colors = np.select([others, so], ['lightgray', 'lightgreen'], 'darkgreen').tolist()
+    cr_colors = np.select([others, so], ['darkgray', 'lightgreen'], 'darkblue').tolist()
+
+    # Hauteur dynamique, bornée par top_n
+    fig, ax = _subplots(figsize=(12, max(4, len(tires_stats) * 0.5)))
+    y = np.arange(len(tires_stats))
+    height = 0.35
+
+    bars_dr = ax.barh(y, tires_stats['Total_DR'], height, label='Débits (DR)', color=dr_colors, edgecolor='black')
+    bars_cr = ax.barh(y + height, tires_stats['Total_CR'], height,
+                      label='Crédits (CR)', color=cr_colors, alpha=0.8, edgecolor='black')
+
+    # Valeurs formatées sur les barres, avec 15 % de marge à droite pour les libellés
+    max_val = max(tires_stats['Total_DR'].max(), tires_stats['Total_CR'].max())
+    _bar_labels(ax, bars_dr, padding=3, fontsize=9)
+    _bar_labels(ax, bars_cr, padding=3, fontsize=9)
+    ax.set_xlim(0, max_val * 1.15)
+
+    ax.set_yticks(y + height / 2)
+    ax.set_yticklabels(tires_stats['TIRES'])
+    ax.set_xlabel("Montant total (Dt)")
+    ax.set_ylabel("Type de TIRES")
+    ax.set_title(_page_title("Montants DR et CR par TIRES (incluant SO)", total, top_n, page))
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0)
+    ax.grid(axis='x', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def rub_figure(rub_stats):
+    """Histogramme des quotas par RUB : barre SO puis DR/CR de chaque RUB."""
+    fig, ax = _subplots(figsize=(12, 5))
+    width = 0.35
+
+    so_row = rub_stats.iloc[0]
+    others = rub_stats.iloc[1:]
+    x = range(1, len(rub_stats))
+
+    ax.bar([0], [so_row['Total_DR']], width, label='Solde Ouverture (SO)', color='lightgreen', edgecolor='black',
+           linewidth=0.8)
+    ax.bar(x, others['Total_DR'], width, label='Débits (DR)', color='darkgreen', edgecolor='black', linewidth=0.8)
+    ax.bar([i + width for i in x], others['Total_CR'], width, label='Crédits (CR)', color='blue', alpha=0.8,
+           edgecolor='black', linewidth=0.8)
+
+    ax.set_xticks([0 + width / 2] + [i + width / 2 for i in x])
+    ax.set_xticklabels(rub_stats['RUB'], rotation=0)
+    ax.set_xlabel("Type de RUB")
+    ax.set_ylabel("Montant total (Dt)")
+    ax.set_title("Histogramme Quotas par transaction (RUB)")
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1))
+
+    # Montants au-dessus des barres
+    max_val = max(rub_stats['Total_DR'].max(), rub_stats['Total_CR'].max())
+    for bar in ax.containers:
+        for rect in bar:
+            height = rect.get_height()
+            if height > 0:
+                ax.text(rect.get_x() + rect.get_width() / 2, height + 0.01 * max_val,
+                        _thousands(height, None), ha='center', va='bottom', fontsize=9)
+
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    for i in range(len(rub_stats)):
+        ax.axvline(i + 1 - width / 2, color='gray', linestyle='--', alpha=0.5)
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def rubrique_figure(rubrique_stats):
+    """Histogramme groupé Débits vs Crédits par rubrique (analyse générale)."""
+    fig, ax = _subplots(figsize=(12, max(5, len(rubrique_stats) * 0.6)))
+    x = range(len(rubrique_stats))
+    width = 0.4
+
+    ax.bar([i - width / 2 for i in x], rubrique_stats['Total_DR'],
+           width=width, label='Débits (DR)', color='darkgreen', edgecolor='black', alpha=0.8)
+    ax.bar([i + width / 2 for i in x], rubrique_stats['Total_CR'],
+           width=width, label='Crédits (CR)', color='darkblue', edgecolor='black', alpha=0.8)
+
+    ax.set_xlabel("Rubrique", fontsize=12)
+    ax.set_ylabel("Montant (Dt)", fontsize=12)
+    ax.set_title("Histogramme Débits vs Crédits par Rubrique", fontsize=14, weight="bold")
+    ax.legend()
+    ax.set_xticks(x)
+    ax.set_xticklabels(rubrique_stats['Rubrique'], rotation=45, ha='right')
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def transaction_figure(transaction_stats):
+    """Barres horizontales DR/CR par type de transaction, échelle logarithmique."""
+    # Montants nuls ramenés à 1 pour l'échelle log
+    dr = transaction_stats['Total_DR'].apply(lambda x: x if x > 0 else 1)
+    cr = transaction_stats['Total_CR'].apply(lambda x: x if x > 0 else 1)
+
+    fig, ax = _subplots(figsize=(14, max(6, len(transaction_stats) * 0.5)))
+    y = range(len(transaction_stats))
+    height = 0.35
+
+    bars_dr = ax.barh([i + height / 2 for i in y], dr, height=height, color='darkgreen', label='Débits (DR)',
+                      edgecolor='black')
+    bars_cr = ax.barh([i - height / 2 for i in y], cr, height=height, color='darkblue', alpha=0.8,
+                      label='Crédits (CR)', edgecolor='black')
+
+    # Libellés à l'extérieur des barres
+    for bar in list(bars_dr) + list(bars_cr):
+        width = bar.get_width()
+        ax.text(width * 1.05, bar.get_y() + bar.get_height() / 2, _thousands(width, None), va='center', fontsize=10)
+
+    ax.set_yticks(y)
+    ax.set_yticklabels(transaction_stats['TRANSACTION'])
+    ax.set_xlabel("Montant (Dt, échelle log)")
+    ax.set_title("Montants Débits et Crédits par Type de Transaction")
+    ax.set_xscale('log')
+    ax.legend()
+    ax.grid(axis='x', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def monthly_totals_figure(monthly_stats):
+    """Évolution mensuelle des montants (DR / CR en négatif) et du nombre de transactions."""
+    labels = monthly_stats['YearMonth'].dt.strftime('%m-%Y')
+    fig, (ax1, ax2) = _subplots(2, 1, figsize=(12, 10))
+
+    ax1.bar(labels, monthly_stats['Total_DR'], width=0.4, label='Débits (DR)', color='darkgreen', edgecolor='black')
+    ax1.bar(labels, -monthly_stats['Total_CR'], width=0.4, label='Crédits (CR)', color='darkblue', alpha=0.8,
+            edgecolor='black')
+    ax1.set_title("Évolution mensuelle des montants")
+    ax1.set_ylabel("Montant (Dt)")
+    ax1.legend(loc='upper left')
+    ax1.grid(axis='y', linestyle='--', alpha=0.5)
+    ax1.tick_params(axis='x', rotation=45)
+    ax1.axhline(0, color='black', linewidth=1)
+
+    ax2.plot(labels, monthly_stats['Nombre_transactions'], marker='o', linewidth=2, color='orange',
+             label='Nombre de transactions')
+    ax2.set_title("Évolution du nombre de transactions")
+    ax2.set_ylabel("Nombre de transactions")
+    ax2.set_xlabel("Mois")
+    ax2.legend(loc='upper left')
+    ax2.grid(True, linestyle='--', alpha=0.5)
+    ax2.tick_params(axis='x', rotation=45)
+
+    ax1.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    fig.tight_layout()
+    return fig
+
+
+def top_clients_figure(top_clients):
+    """Débits vs Crédits des adhérents au plus fort volume (noms tronqués à 20 caractères)."""
+    fig, ax = _subplots(figsize=(12, 6))
+    x = range(len(top_clients))
+    width = 0.35
+    ax.bar([i - width / 2 for i in x], top_clients['Total_DR'], width, label='Débits (DR)', color='darkgreen',
+           edgecolor='black')
+    ax.bar([i + width / 2 for i in x], top_clients['Total_CR'], width, label='Crédits (CR)', color='darkblue',
+           alpha=0.8, edgecolor='black')
+    ax.set_xticks(x)
+    ax.set_xticklabels([f"{name[:20]}..." if len(name) > 20 else name for name in top_clients['Legal Client Name']],
+                       rotation=45, ha='right')
+    ax.set_xlabel("Clients")
+    ax.set_ylabel("Montant (Dt)")
+    ax.set_title(f"Top {len(top_clients)} Clients - Débits vs Crédits")
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.5)
+    ax.yaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    fig.tight_layout()
+    return fig
+
+
+def clients_figure(clients_stats, top_n=CHART_TOP_N, page=0):
+    """Barres horizontales DR/CR par adhérent d'un tiré, DR décroissant, au-delà de `top_n` cumulés en « Autres »."""
+    clients_stats = clients_stats.sort_values(by='Total_DR', ascending=False).reset_index(drop=True)
+    total = len(clients_stats)
+    clients_stats, hidden = top_n_rows(clients_stats, 'Legal Client Name', ['Total_DR', 'Total_CR'], top_n, page)
+    others = _others_mask(len(clients_stats), hidden)
+
+    fig, ax = _subplots(figsize=(12, max(4, len(clients_stats) * 0.4)))
+    y = np.arange(len(clients_stats))
+    height = 0.35
+
+    bars_dr = ax.barh(y, clients_stats['Total_DR'], height, label='Débits (DR)',
+                      color=np.where(others, 'lightgray', 'darkgreen').tolist(), edgecolor='black')
+    bars_cr = ax.barh(y + height, clients_stats['Total_CR'], height, label='Crédits (CR)',
+                      color=np.where(others, 'darkgray', 'darkblue').tolist(), alpha=0.8, edgecolor='black')
+
+    # Valeurs sur les barres
+    _bar_labels(ax, bars_dr, padding=3, fontsize=9)
+    _bar_labels(ax, bars_cr, padding=3, fontsize=9)
+    ax.set_xlim(0, max(clients_stats['Total_DR'].max(), clients_stats['Total_CR'].max()) * 1.15)
+
+    ax.set_yticks(y + height / 2)
+    ax.set_yticklabels(clients_stats['Legal Client Name'])
+    ax.set_xlabel("Montant total (Dt)")
+    ax.set_ylabel("adhérents")
+    ax.set_title(_page_title("Montants DR et CR par adhérent", total, top_n, page))
+    ax.xaxis.set_major_formatter(mticker.FuncFormatter(_thousands))
+    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1), borderaxespad=0)
+    ax.grid(axis='x', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def client_rubrique_figure(rubrique_stats):
+    """Barres horizontales DR/CR par rubrique d'un adhérent (recherche de l'analyse générale)."""
+    fig, ax = _subplots(figsize=(12, max(4, len(rubrique_stats) * 0.5)))
+    y = range(len(rubrique_stats))
+    height = 0.35
+    bars_dr = ax.barh([i + height / 2 for i in y], rubrique_stats['Total_DR'], height=height, color='darkgreen',
+                      label='Débits (DR)', edgecolor='black')
+    bars_cr = ax.barh([i - height / 2 for i in y], rubrique_stats['Total_CR'], height=height, color='darkblue',
+                      alpha=0.8, label='Crédits (CR)', edgecolor='black')
+
+    for bar in list(bars_dr) + list(bars_cr):
+        width = bar.get_width()
+        ax.text(width * 1.05, bar.get_y() + bar.get_height() / 2, _thousands(width, None), va='center', fontsize=10)
+
+    ax.set_yticks(y)
+    ax.set_yticklabels(rubrique_stats['Rubrique'])
+    ax.set_xlabel("Montant (Dt)")
+    ax.set_title("Montants Débits et Crédits par Rubrique")
+    ax.legend()
+    ax.grid(axis='x', linestyle='--', alpha=0.5)
+    fig.tight_layout()
+    return fig
+
+
+def render_figure(fig, fmt='png', dpi=RENDER_DPI):
+    """Image `fmt` ('png' ou 'svg') de la figure."""
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def data_digest(data):
+    """Empreinte du contenu d'un tableau à tracer (valeurs, index et noms de colonnes)."""
+    digest = hashlib.sha256(str(list(data.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:32]
+
+
+class FigureCache:
+    """Images de graphiques déjà rendues, partagées par toutes les sessions du serveur.
+
+    Une image est adressée par (jeu de données, entité, type de graphique,
+    paramètres, format) ; le jeu de données est identifié par l'empreinte du
+    tableau tracé, si bien qu'une autre version du grand livre donne une autre
+    clé. La figure matplotlib n'est construite qu'en cas d'absence, hors de
+    pyplot et un rendu à la fois : les reruns ne redessinent rien. Au-delà de
+    `max_items` images, la moins récemment affichée est évincée.
+    """
+
+    def __init__(self, max_items=RENDER_CACHE_SIZE):
+        self.max_items = max_items
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._images)
+
+    def render(self, draw, data, kind, entity=None, fmt=RENDER_FORMAT, **params):
+        """Image de `draw(data, **params)`, rendue au premier appel puis relue du cache."""
+        key = (data_digest(data), None if entity is None else str(entity), kind,
+               tuple(sorted(params.items())), fmt)
+        image = self._lookup(key)
+        if image is not None:
+            return image
+        # Rendus sérialisés, hors du verrou du cache : les images déjà rendues restent servies
+        with _render_lock:
+            # Image rendue par une autre session pendant l'attente
+            image = self._lookup(key)
+            if image is not None:
+                return image
+            image = render_figure(draw(data, **params), fmt)
+        with self._lock:
+            self.misses += 1
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_items:
+                self._images.popitem(last=False)
+        return image
+
+    def _lookup(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return image
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(len(image) for image in self._images.values())
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+
+_figure_cache = None
+_figure_cache_lock = threading.Lock()
+
+
+def shared_figure_cache():
+    """Cache d'images unique du processus serveur."""
+    global _figure_cache
+    with _figure_cache_lock:
+        if _figure_cache is None:
+            _figure_cache = FigureCache()
+        return _figure_cache
+
+
+def show_figure(draw, data, kind, entity=None, fmt=RENDER_FORMAT, **params):
+    """Affiche dans la page l'image en cache du graphique `draw(data, **params)`."""
+    import streamlit as st
+
+    image = shared_figure_cache().render(draw, data, kind, entity, fmt, **params)
+    if fmt == 'svg':
+        st.image(image.decode("utf-8"), use_container_width=True)
+    else:
+        st.image(image, use_container_width=True)
+
+
+def chart_page_input(count, key, n=CHART_TOP_N):
+    """Page (à partir de 0) choisie pour un graphique de `count` entités, sans sélecteur s'il tient sur une page."""
+    import streamlit as st
+
+    pages = chart_pages(count, n)
+    if pages == 1:
+        return 0
+    # Page hors bornes après un changement d'entité : retour à la première
+    if st.session_state.get(key, 1) > pages:
+        st.session_state[key] = 1
+    st.caption(f"{n} barres par page, les suivantes regroupées dans la barre « {OTHERS_LABEL} ».")
+    return st.number_input(f"Page du graphique (sur {pages})", min_value=1, max_value=pages, step=1, key=key) - 1
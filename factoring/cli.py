@@ -0,0 +1,128 @@
+"""Analyses des pages 1 à 3 en ligne de commande, sans Streamlit.
+
+Exemple : python -m factoring.cli grand_livre.xlsx --analyses clients general --charts --out rapports
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from factoring.batch import BATCH_SIZE, ENTITY_ANALYSES, FORMATS, entity_ids, run_batch, run_general, timing_table
+from factoring.cache import SheetCache, cache_key, file_digest
+from factoring.consolidation import MAX_WORKERS, ledger_sheets
+from factoring.excel_io import WorkbookSession
+from factoring.reports import GENERAL_COLUMNS
+from factoring.schema import HEADER_COLUMNS, SCHEMA_VERSION, normalize_ledger
+from factoring.totals import ledger_totals
+
+
+ANALYSES = ['clients', 'debtors', 'general']
+
+
+def load_ledger(path, sheet_name=None, header_row=None, use_cache=True):
+    """Grand livre normalisé d'une feuille : cache disque de l'application, sinon lecture Excel.
+
+    Sans feuille ni ligne d'entête, la première feuille reconnue et son entête
+    détectée sont utilisées.
+    """
+    cache = SheetCache() if use_cache else None
+    digest = file_digest(path)
+    workbook = None
+    try:
+        if sheet_name is None or header_row is None:
+            workbook = WorkbookSession(path)
+            if sheet_name is None:
+                found = ledger_sheets(workbook, all_sheets=False)
+                if not found:
+                    raise ValueError("Aucune feuille avec une entête reconnue dans le classeur.")
+                sheet_name = found[0][0]
+            if header_row is None:
+                header_row = workbook.header_row(sheet_name, HEADER_COLUMNS)
+                if header_row is None:
+                    raise ValueError(f"Entête non détectée dans la feuille « {sheet_name} » : préciser --header-row.")
+
+        key = cache_key(digest, sheet_name, header_row, version=SCHEMA_VERSION)
+        df = cache.load(key) if cache is not None else None
+        if df is None:
+            if workbook is None:
+                workbook = WorkbookSession(path)
+            df = normalize_ledger(workbook.read(sheet_name, header_row))
+            if cache is not None:
+                cache.store(key, df, file_name=str(path), sheet=sheet_name, header_row=header_row)
+        return df
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m factoring.cli",
+                                     description="Analyses par adhérent, par tiré et générale d'un grand livre.")
+    parser.add_argument("workbook", help="classeur Excel du grand livre")
+    parser.add_argument("--sheet", help="feuille à lire (par défaut la première dont l'entête est reconnue)")
+    parser.add_argument("--header-row", type=int, help="ligne d'entête Excel (1-based, détectée par défaut)")
+    parser.add_argument("--analyses", nargs="+", choices=ANALYSES, default=ANALYSES, help="analyses à produire")
+    parser.add_argument("--clients", nargs="+", help="numéros d'adhérents (par défaut tous)")
+    parser.add_argument("--debtors", nargs="+", help="numéros de tirés (par défaut tous)")
+    parser.add_argument("--out", default="rapports", help="dossier de sortie")
+    parser.add_argument("--format", choices=FORMATS, default="xlsx",
+                        help="classeur à onglets, CSV par tableau ou PDF (graphiques inclus)")
+    parser.add_argument("--charts", action="store_true", help="enregistre aussi les graphiques (PNG, xlsx et csv)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="nombre de processus")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="entités par tâche")
+    parser.add_argument("--no-cache", action="store_true", help="relit le classeur sans passer par le cache disque")
+    return parser.parse_args(argv)
+
+
+def print_progress(done, total):
+    """Avancement sur la sortie d'erreur, réécrit sur la même ligne."""
+    print(f"\r  {done} / {total}", end="\n" if done >= total else "", file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    df = load_ledger(args.workbook, args.sheet, args.header_row, use_cache=not args.no_cache)
+    print(f"Grand livre chargé : {len(df):,} lignes en {time.perf_counter() - start:.1f} s".replace(",", " "))
+
+    for analysis in args.analyses:
+        if analysis == 'general':
+            missing = [col for col in GENERAL_COLUMNS if col not in df.columns]
+            if missing:
+                print(f"Analyse générale ignorée, colonnes manquantes : {', '.join(missing)}", file=sys.stderr)
+                continue
+            start = time.perf_counter()
+            written = run_general(df, ledger_totals(df), args.out, args.format, args.charts)
+            print(f"Analyse générale : {len(written)} fichier(s) en {time.perf_counter() - start:.1f} s")
+            continue
+
+        column = ENTITY_ANALYSES[analysis][0]
+        if column not in df.columns:
+            print(f"Analyse '{analysis}' ignorée, colonne manquante : {column}", file=sys.stderr)
+            continue
+        keys = (args.clients if analysis == 'clients' else args.debtors) or entity_ids(df, analysis)
+
+        start = time.perf_counter()
+        results = run_batch(df, analysis, keys, args.out, args.format, args.charts,
+                            workers=args.workers, batch_size=args.batch_size, progress=print_progress)
+        elapsed = time.perf_counter() - start
+        timings = timing_table(results)
+        done = len(timings)
+        unknown = [key for key, _, files in results if not files]
+        print(f"Analyse '{analysis}' : {done} entité(s) en {elapsed:.1f} s, "
+              f"{done / elapsed if elapsed else 0:.1f} entités/s")
+        if done:
+            # Durée de chaque rapport, pour repérer les adhérents ou tirés les plus lourds
+            timings_path = Path(args.out) / ENTITY_ANALYSES[analysis][2] / "durees.csv"
+            timings.to_csv(timings_path, sep=';', index=False)
+            slowest = timings.iloc[0]
+            print(f"  Durée par rapport : moyenne {timings['Secondes'].mean():.2f} s, "
+                  f"max {slowest['Secondes']:.2f} s ({slowest['Identifiant']}), détail dans {timings_path}")
+        if unknown:
+            print(f"Identifiants inconnus : {', '.join(map(str, unknown))}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
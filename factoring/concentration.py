@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from factoring.indexes import frame_memo, key_index
+
+
+# Seuil (en %) au-delà duquel la part d'un tiré chez un adhérent est signalée
+CONCENTRATION_THRESHOLD = 25.0
+
+SHARE_COLUMNS = ['% DR', '% CR', '% Solde_Period']
+
+
+def _label_codes(s):
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), np.asarray(s.cat.categories, dtype=object)
+    codes, uniques = pd.factorize(s)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _share(part, total):
+    """Part en %, 0 quand le total de l'adhérent est nul."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(total != 0, part / total * 100, 0.0)
+
+
+def share_flags(pairs, threshold=CONCENTRATION_THRESHOLD):
+    """Dépassements du seuil par colonne de part (le solde est comparé en valeur absolue)."""
+    return pd.DataFrame({
+        '% DR': pairs['% DR'] > threshold,
+        '% CR': pairs['% CR'] > threshold,
+        '% Solde_Period': pairs['% Solde_Period'].abs() > threshold,
+    }, index=pairs.index)
+
+
+class DebtorConcentration:
+    """Parts des tirés par adhérent et indices de concentration pour tout le portefeuille.
+
+    `pairs` contient une ligne par (adhérent, TIRES, Debtor Number) avec les colonnes
+    du tableau de la page 1 ; `clients` une ligne par adhérent avec l'indice de
+    Herfindahl-Hirschman (HHI, de 0 à 10 000) sur les DR et les CR.
+    """
+
+    def __init__(self, pairs, clients, client_index, threshold=CONCENTRATION_THRESHOLD):
+        self.pairs = pairs
+        self.clients = clients
+        self.threshold = threshold
+        self._client_index = client_index
+        # Les paires sont triées par code adhérent : bornes de chaque adhérent
+        self._starts = np.searchsorted(pairs['_code'].to_numpy(), np.arange(len(client_index) + 1))
+
+    def for_client(self, key):
+        """Tableau des tirés d'un adhérent, trié par volume (DR + CR) décroissant."""
+        code = self._client_index.code(key)
+        if code is None:
+            return self.pairs.iloc[0:0].drop(columns=['_code', 'Client Number', 'Legal Client Name'])
+        rows = self.pairs.iloc[self._starts[code]:self._starts[code + 1]]
+        return rows.drop(columns=['_code', 'Client Number', 'Legal Client Name']).reset_index(drop=True)
+
+    def exceptions(self, threshold=None):
+        """Couples adhérent/tiré dont une part dépasse le seuil, la plus forte part en premier."""
+        threshold = self.threshold if threshold is None else threshold
+        flags = share_flags(self.pairs, threshold)
+        out = self.pairs.loc[flags.any(axis=1)].drop(columns=['_code', 'Total'])
+        out['Part max'] = out[SHARE_COLUMNS].abs().max(axis=1)
+        return out.sort_values('Part max', ascending=False).reset_index(drop=True)
+
+
+def build_debtor_concentration(df, client_col='Client Number', client_name_col='Legal Client Name',
+                               debtor_col='Debtor Number', debtor_name_col='TIRES',
+                               dr_col='EntryAmount', cr_col='EntryAmountSAC',
+                               threshold=CONCENTRATION_THRESHOLD):
+    """Calcule en une passe groupée les parts de chaque tiré chez chaque adhérent."""
+    clients = key_index(df, client_col)
+    debtors = key_index(df, debtor_col)
+    tires_codes, tires_labels = _label_codes(df[debtor_name_col])
+
+    keep = (clients.codes >= 0) & (debtors.codes >= 0) & (tires_codes >= 0)
+    grouped = (
+        pd.DataFrame({
+            '_code': clients.codes[keep],
+            '_debtor': debtors.codes[keep],
+            '_tires': tires_codes[keep],
+            'dr': df[dr_col].to_numpy(dtype=np.float64)[keep],
+            'cr': df[cr_col].to_numpy(dtype=np.float64)[keep],
+        })
+        .groupby(['_code', '_debtor', '_tires'], sort=False)
+        .agg(Nombre=('dr', 'size'), Total_DR=('dr', 'sum'), Total_CR=('cr', 'sum'))
+        .reset_index()
+    )
+    grouped['Solde_Period'] = grouped['Total_DR'] - grouped['Total_CR']
+    grouped['Total'] = grouped['Total_DR'] + grouped['Total_CR']
+
+    # Totaux par adhérent diffusés sur ses tirés
+    totals = grouped.groupby('_code')[['Total_DR', 'Total_CR', 'Solde_Period']].transform('sum')
+    share_dr = _share(grouped['Total_DR'].to_numpy(), totals['Total_DR'].to_numpy())
+    share_cr = _share(grouped['Total_CR'].to_numpy(), totals['Total_CR'].to_numpy())
+    share_solde = _share(grouped['Solde_Period'].to_numpy(), totals['Solde_Period'].to_numpy())
+
+    # Indice de Herfindahl-Hirschman sur les parts non arrondies
+    hhi = (
+        pd.DataFrame({'_code': grouped['_code'], 'HHI_DR': share_dr ** 2, 'HHI_CR': share_cr ** 2})
+        .groupby('_code').sum()
+    )
+
+    first_names = pd.Series(df[client_name_col].to_numpy()[keep]).groupby(clients.codes[keep]).first()
+    pairs = pd.DataFrame({
+        '_code': grouped['_code'],
+        'Client Number': clients.keys.to_numpy()[grouped['_code']],
+        'Legal Client Name': first_names.reindex(grouped['_code']).to_numpy(),
+        'TIRES': tires_labels[grouped['_tires']],
+        'Debtor Number': debtors.keys.to_numpy()[grouped['_debtor']],
+        'Nombre': grouped['Nombre'],
+        'Total_DR': grouped['Total_DR'],
+        'Total_CR': grouped['Total_CR'],
+        'Solde_Period': grouped['Solde_Period'],
+        '% DR': np.round(share_dr, 2),
+        '% CR': np.round(share_cr, 2),
+        '% Solde_Period': np.round(share_solde, 2),
+        'Total': grouped['Total'],
+    })
+    # Volume décroissant, puis ordre alphabétique des tirés à volume égal
+    pairs = pairs.sort_values(['_code', 'Total', 'TIRES', 'Debtor Number'], ascending=[True, False, True, True],
+                              kind='stable').reset_index(drop=True)
+
+    flags = share_flags(pairs, threshold).any(axis=1)
+    per_client = pairs.groupby('_code').agg(
+        **{'Client Number': ('Client Number', 'first'),
+           'Legal Client Name': ('Legal Client Name', 'first'),
+           'Nb_tires': ('Debtor Number', 'size'),
+           'Part_max_DR': ('% DR', 'max'),
+           'Part_max_CR': ('% CR', 'max')}
+    )
+    per_client['Nb_tires_au_dessus_seuil'] = flags.groupby(pairs['_code']).sum()
+    per_client['HHI_DR'] = hhi['HHI_DR'].round(0)
+    per_client['HHI_CR'] = hhi['HHI_CR'].round(0)
+    per_client = per_client.sort_values('HHI_DR', ascending=False).reset_index(drop=True)
+
+    return DebtorConcentration(pairs, per_client, clients, threshold)
+
+
+def debtor_concentration(df, **columns):
+    """DebtorConcentration mémorisé pour ce DataFrame (construit une seule fois par jeu de données)."""
+    key = ('debtor_concentration',) + tuple(sorted(columns.items()))
+    return frame_memo(df, key, lambda: build_debtor_concentration(df, **columns))
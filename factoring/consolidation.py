@@ -0,0 +1,75 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from factoring.delta import concat_column, row_id_column, row_keys
+from factoring.excel_io import WorkbookSession
+from factoring.schema import HEADER_COLUMNS, normalize_ledger
+
+
+# Nombre maximal de processus de lecture, surchargeable par variable d'environnement
+MAX_WORKERS = int(os.environ.get("FACTORING_MAX_WORKERS", os.cpu_count() or 1))
+
+
+def parse_sheet(data, sheet_name, header_row):
+    """Lit et normalise une feuille à partir du contenu binaire du classeur.
+
+    Fonction de niveau module pour pouvoir être exécutée dans un processus de travail.
+    """
+    workbook = WorkbookSession(io.BytesIO(data))
+    try:
+        return normalize_ledger(workbook.read(sheet_name, header_row))
+    finally:
+        workbook.close()
+
+
+def parse_sheets(tasks, max_workers=MAX_WORKERS):
+    """Lit les feuilles `tasks` (liste de (contenu, feuille, ligne d'entête)) en parallèle.
+
+    Les résultats sont renvoyés dans l'ordre des tâches. Avec une seule tâche ou un
+    seul processus autorisé, la lecture se fait directement sans pool.
+    """
+    workers = min(max_workers, len(tasks))
+    if workers <= 1:
+        return [parse_sheet(*task) for task in tasks]
+    # 'spawn' : processus neufs, sans hériter des threads du serveur Streamlit
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+        return list(pool.map(parse_sheet, *zip(*tasks)))
+
+
+def ledger_sheets(workbook, all_sheets=True):
+    """Feuilles du classeur dont l'entête est reconnue : liste de (feuille, ligne d'entête)."""
+    found = []
+    for sheet_name in workbook.sheetnames:
+        header_row = workbook.header_row(sheet_name, HEADER_COLUMNS)
+        if header_row is not None:
+            found.append((sheet_name, header_row))
+            if not all_sheets:
+                break
+    return found
+
+
+def consolidate(frames, id_col=None):
+    """Concatène des grands livres normalisés et retire les lignes en double.
+
+    Les doublons sont repérés par un ensemble haché des identifiants de ligne
+    (ledger item id, sinon Transaction Id, sinon empreinte de la ligne, comme pour
+    les lignes sans identifiant) : la première occurrence est conservée.
+    Renvoie `(df, nombre de doublons retirés)`.
+    """
+    columns = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+    frames = [frame.reindex(columns=columns) for frame in frames]
+    id_col = id_col or row_id_column(frames[0])
+
+    parts = [row_keys(frame, id_col) for frame in frames]
+    if len({part.dtype for part in parts}) > 1:
+        # Identifiants entiers dans un fichier, texte dans un autre : clés en texte partout
+        parts = [row_keys(frame, id_col, text=True) for frame in frames]
+    keep = ~pd.Index(np.concatenate(parts)).duplicated()
+
+    combined = pd.DataFrame({col: concat_column([frame[col] for frame in frames]) for col in columns})
+    return combined.loc[keep].reset_index(drop=True), int((~keep).sum())
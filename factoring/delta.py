@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from factoring.indexes import frame_memo, normalize_key
+from factoring.totals import ledger_totals
+
+
+# Identifiant d'une ligne du grand livre, par ordre de préférence
+ROW_ID_COLUMNS = ['ledger item id', 'Transaction Id']
+
+
+def row_id_column(df):
+    """Colonne identifiant les lignes (ledger item id, sinon Transaction Id), None si absente."""
+    return next((col for col in ROW_ID_COLUMNS if col in df.columns), None)
+
+
+def row_keys(df, id_col, text=False):
+    """Clés de déduplication : l'identifiant de ligne, sinon l'empreinte de la ligne entière.
+
+    Les identifiants entiers sans valeur manquante donnent des clés int64, les autres
+    (ou tous avec `text`) des clés texte ; une ligne sans identifiant est repérée par
+    l'empreinte de la ligne entière.
+    """
+    if id_col is None:
+        return pd.util.hash_pandas_object(df, index=False).to_numpy()
+    s = df[id_col]
+    if not text and pd.api.types.is_integer_dtype(s) and not s.hasnans:
+        return s.to_numpy(dtype=np.int64)
+    keys = normalize_key(s).to_numpy(dtype=object)
+    missing = s.isna().to_numpy()
+    if missing.any():
+        hashes = pd.util.hash_pandas_object(df.loc[missing], index=False).to_numpy()
+        keys[missing] = [f"#{h:016x}" for h in hashes]
+    return keys
+
+
+def row_ids(df, id_col):
+    """Clés des lignes de `df` (Index haché), mémorisées pour le jeu de données."""
+    return frame_memo(df, ('row_ids', id_col), lambda: pd.Index(row_keys(df, id_col)))
+
+
+def new_rows(base, extract, id_col=None):
+    """Lignes de `extract` absentes de `base`, doublons internes à l'extrait retirés."""
+    id_col = id_col or row_id_column(base)
+    if id_col is not None and id_col not in extract.columns:
+        raise ValueError(f"Colonne d'identifiant « {id_col} » absente de l'extrait.")
+    extract = extract.reindex(columns=base.columns)
+    keys = pd.Index(row_keys(extract, id_col))
+    known = row_ids(base, id_col)
+    if keys.dtype != known.dtype:
+        # Types d'identifiants différents (entier d'un côté, texte de l'autre) : comparaison en texte
+        keys = pd.Index(row_keys(extract, id_col, text=True))
+        known = pd.Index(row_keys(base, id_col, text=True))
+    fresh = ~keys.isin(known) & ~keys.duplicated()
+    return extract.loc[fresh]
+
+
+def concat_column(parts):
+    """Concatène les morceaux d'une colonne en conservant les catégories (union triée des libellés)."""
+    parts = [part.reset_index(drop=True) for part in parts]
+    if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+        parts = [part if isinstance(part.dtype, pd.CategoricalDtype) else part.astype('category') for part in parts]
+        try:
+            return pd.Series(union_categoricals(parts, sort_categories=True, ignore_order=True), name=parts[0].name)
+        except TypeError:
+            # Catégories de types différents (colonne absente d'un des fichiers par exemple)
+            return pd.concat([part.astype(object) for part in parts], ignore_index=True).astype('category')
+    return pd.concat(parts, ignore_index=True)
+
+
+def append_extract(base, extract, base_type=None, id_col=None):
+    """Ajoute au grand livre les seules lignes nouvelles d'un extrait, déjà normalisé.
+
+    Renvoie `(combined, delta)`. Les agrégats par adhérent, tiré et rubrique et les
+    identifiants de lignes de `combined` sont obtenus en fusionnant ceux de `base`
+    avec ceux du delta, sans recalcul sur l'historique.
+    """
+    id_col = id_col or row_id_column(base)
+    delta = new_rows(base, extract, id_col)
+    if delta.empty:
+        return base, delta
+
+    combined = pd.DataFrame({col: concat_column([base[col], delta[col]]) for col in base.columns})
+
+    totals = ledger_totals(base, base_type)
+    frame_memo(combined, ('ledger_totals', base_type), lambda: totals.updated(delta))
+    known = row_ids(base, id_col)
+    delta_keys = pd.Index(row_keys(delta, id_col))
+    if delta_keys.dtype == known.dtype:
+        # Types différents : les clés de `combined` (en texte) seront calculées à la demande
+        frame_memo(combined, ('row_ids', id_col), lambda: known.append(delta_keys))
+    return combined, delta
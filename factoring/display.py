@@ -0,0 +1,39 @@
+"""Affichage des tableaux dans les pages : colonnes gardées numériques, formatées par un Styler pandas.
+
+Les montants sont arrondis à l'unité en une opération sur le tableau, puis
+affichés avec une espace comme séparateur de milliers (« 10 000 »), quelle que
+soit la langue du navigateur. Seul le texte affiché est formaté : les valeurs
+restent numériques, le tri de la grille reste numérique et les graphiques
+réutilisent le même tableau.
+"""
+import pandas as pd
+
+# Format des pourcentages (valeurs déjà en %, deux décimales)
+PERCENT_FORMAT = "{:.2f} %"
+
+
+def rounded(table, columns):
+    """Copie de `table` aux colonnes `columns` arrondies à l'unité (colonnes absentes ignorées)."""
+    return table.round({col: 0 for col in columns if col in table.columns})
+
+
+def styled(table, numbers=(), percents=()):
+    """Styler de `table` (DataFrame ou Styler) : `numbers` en « 10 000 », `percents` suivies de « % »."""
+    styler = table.style if isinstance(table, pd.DataFrame) else table
+    columns = styler.data.columns
+    numbers = [col for col in numbers if col in columns]
+    percents = [col for col in percents if col in columns]
+    if numbers:
+        styler = styler.format(precision=0, thousands=' ', na_rep='', subset=numbers)
+    if percents:
+        styler = styler.format(PERCENT_FORMAT, na_rep='', subset=percents)
+    return styler
+
+
+def show_table(table, numbers=(), percents=(), hide_index=True):
+    """Affiche `table` (DataFrame ou Styler) : colonnes `numbers` arrondies et formatées, `percents` suivies de « % »."""
+    import streamlit as st
+
+    if isinstance(table, pd.DataFrame):
+        table = rounded(table, numbers)
+    st.dataframe(styled(table, numbers, percents), use_container_width=True, hide_index=hide_index)
@@ -0,0 +1,225 @@
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# Nombre de lignes lues avant de vider le tampon dans les colonnes typées
+CHUNK_SIZE = 20_000
+
+# Intervalle minimal (secondes) entre deux mises à jour de la progression
+PROGRESS_INTERVAL = 0.25
+
+_NUMERIC_TYPES = {int, float, type(None)}
+_DATE_TYPES = {datetime, date, type(None)}
+
+
+def _column_kind(values):
+    """Type de la colonne pour un bloc : 'num', 'date', 'empty' ou 'object'."""
+    types = set(map(type, values))
+    if types <= {type(None)}:
+        return "empty"
+    if types <= _NUMERIC_TYPES:
+        return "num"
+    if types <= _DATE_TYPES:
+        return "date"
+    return "object"
+
+
+def _to_array(values, kind):
+    if kind == "num":
+        return np.array(values, dtype=np.float64)
+    if kind == "date":
+        return pd.to_datetime(pd.Series(values, dtype=object), errors="coerce").to_numpy()
+    return np.array(values, dtype=object)
+
+
+def _to_object(arr, kind):
+    """Repasse un bloc typé en object quand la colonne s'avère hétérogène."""
+    if kind == "num":
+        return np.array([None if v != v else (int(v) if v.is_integer() else v) for v in arr.tolist()],
+                        dtype=object)
+    if kind == "date":
+        return pd.Series(arr).astype(object).where(pd.notna(arr), None).to_numpy()
+    return arr
+
+
+class _ColumnBuffer:
+    """Accumule une colonne bloc par bloc sous forme de tableaux numpy typés."""
+
+    def __init__(self):
+        self.kinds = []
+        self.chunks = []
+
+    def add(self, values):
+        kind = _column_kind(values)
+        self.kinds.append(kind)
+        self.chunks.append(_to_array(values, kind if kind != "empty" else "num"))
+
+    def to_series(self, name):
+        kinds = set(self.kinds) - {"empty"}
+        if not self.chunks:
+            return pd.Series([], name=name, dtype=object)
+        if not kinds:
+            return pd.Series(np.full(sum(map(len, self.chunks)), None, dtype=object), name=name)
+        if len(kinds) > 1:
+            # Types incompatibles entre blocs : repli sur object
+            arr = np.concatenate([
+                np.full(len(c), None, dtype=object) if k == "empty" else _to_object(c, k)
+                for k, c in zip(self.kinds, self.chunks)
+            ])
+            return pd.Series(arr, name=name)
+
+        kind = kinds.pop()
+        if kind == "num":
+            arr = np.concatenate(self.chunks)
+            # Colonne entière sans valeur manquante -> int64
+            if len(arr) and not np.isnan(arr).any() and np.array_equal(arr, np.trunc(arr)) \
+                    and np.abs(arr).max() < 2**53:
+                arr = arr.astype(np.int64)
+            return pd.Series(arr, name=name)
+        if kind == "date":
+            parts = [np.full(len(c), np.datetime64("NaT"), dtype="datetime64[ns]") if k == "empty" else c
+                     for k, c in zip(self.kinds, self.chunks)]
+            return pd.Series(np.concatenate(parts), name=name)
+        parts = [np.full(len(c), None, dtype=object) if k == "empty" else c
+                 for k, c in zip(self.kinds, self.chunks)]
+        # dtype inféré : chaîne native si la version de pandas le permet, sinon object
+        return pd.Series(np.concatenate(parts), name=name)
+
+
+def read_sheet_columnar(file, sheet_name, header_row=1, progress=None,
+                        chunk_size=CHUNK_SIZE, progress_interval=PROGRESS_INTERVAL):
+    """Lit une feuille Excel en flux et remplit des tampons typés par colonne.
+
+    `header_row` est le numéro de ligne Excel (1-based) de l'entête. `progress`
+    est un callable optionnel appelé avec (lignes_lues, total_lignes), au plus
+    une fois toutes les `progress_interval` secondes et une dernière fois à la fin.
+    Le DataFrame retourné a déjà ses types définitifs (float64/int64, datetime64, texte).
+    """
+    wb = load_workbook(filename=file, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        return read_worksheet_columnar(ws, header_row=header_row, progress=progress,
+                                       chunk_size=chunk_size, progress_interval=progress_interval)
+    finally:
+        wb.close()
+
+
+def _header(ws, header_row):
+    return next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+
+
+def _clean_columns(header):
+    return [str(col).strip() if col is not None else f"Unnamed_{i}" for i, col in enumerate(header)]
+
+
+def _row_chunks(ws, header_row, n_cols, progress, chunk_size, progress_interval):
+    """Lignes de données par blocs de `chunk_size`, avec suivi de la progression."""
+    max_row = ws.max_row
+    total_rows = max(max_row - header_row, 0) if max_row else 0
+    chunk = []
+    rows_read = 0
+    last_update = time.monotonic()
+
+    for row in ws.iter_rows(min_row=header_row + 1, max_row=max_row, values_only=True):
+        # Normaliser la largeur des lignes (les lignes courtes sont complétées par None)
+        if len(row) != n_cols:
+            row = (tuple(row) + (None,) * n_cols)[:n_cols]
+        chunk.append(row)
+        rows_read += 1
+
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+        # Progression basée sur le temps écoulé, l'horloge n'est consultée que toutes les 1024 lignes
+        if progress is not None and not rows_read & 1023 and time.monotonic() - last_update >= progress_interval:
+            progress(rows_read, max(total_rows, rows_read))
+            last_update = time.monotonic()
+
+    if chunk:
+        yield chunk
+    if progress is not None:
+        progress(rows_read, rows_read)
+
+
+def read_worksheet_columnar(ws, header_row=1, progress=None,
+                            chunk_size=CHUNK_SIZE, progress_interval=PROGRESS_INTERVAL):
+    """Variante de `read_sheet_columnar` sur une feuille openpyxl déjà ouverte."""
+    header = _header(ws, header_row)
+    buffers = [_ColumnBuffer() for _ in header]
+    for chunk in _row_chunks(ws, header_row, len(header), progress, chunk_size, progress_interval):
+        for buf, values in zip(buffers, zip(*chunk)):
+            buf.add(list(values))
+
+    # Nettoyer les colonnes
+    df = pd.DataFrame({i: buf.to_series(i) for i, buf in enumerate(buffers)})
+    df.columns = _clean_columns(header)
+    return df
+
+
+def iter_worksheet_chunks(ws, header_row=1, progress=None,
+                          chunk_size=CHUNK_SIZE, progress_interval=PROGRESS_INTERVAL):
+    """Lit la feuille bloc par bloc : un DataFrame typé de `chunk_size` lignes au plus à la fois.
+
+    La mémoire utilisée reste celle d'un bloc, quelle que soit la taille de la feuille.
+    """
+    header = _header(ws, header_row)
+    columns = _clean_columns(header)
+    for chunk in _row_chunks(ws, header_row, len(header), progress, chunk_size, progress_interval):
+        buffers = [_ColumnBuffer() for _ in header]
+        for buf, values in zip(buffers, zip(*chunk)):
+            buf.add(list(values))
+        df = pd.DataFrame({i: buf.to_series(i) for i, buf in enumerate(buffers)})
+        df.columns = columns
+        yield df
+
+
+# Nombre de lignes examinées en tête de feuille pour trouver l'entête
+HEADER_SCAN_ROWS = 30
+
+
+def detect_header_row(ws, known_columns, max_rows=HEADER_SCAN_ROWS, min_matches=2):
+    """Numéro de ligne Excel (1-based) de l'entête, ou None si aucune ligne ne convient.
+
+    La ligne retenue est celle des `max_rows` premières qui contient le plus de
+    noms de `known_columns` (au moins `min_matches`).
+    """
+    known = {str(col).strip() for col in known_columns}
+    best_row, best_score = None, min_matches - 1
+    for i, row in enumerate(ws.iter_rows(min_row=1, max_row=max_rows, values_only=True), start=1):
+        score = sum(1 for v in row if v is not None and str(v).strip() in known)
+        if score > best_score:
+            best_row, best_score = i, score
+    return best_row
+
+
+class WorkbookSession:
+    """Classeur ouvert une seule fois et réutilisé pour la liste des feuilles,
+    la détection de l'entête et la lecture des données."""
+
+    def __init__(self, file):
+        self.file = file
+        self.wb = load_workbook(filename=file, read_only=True, data_only=True)
+        self._header_rows = {}
+
+    @property
+    def sheetnames(self):
+        return self.wb.sheetnames
+
+    def header_row(self, sheet_name, known_columns):
+        if sheet_name not in self._header_rows:
+            self._header_rows[sheet_name] = detect_header_row(self.wb[sheet_name], known_columns)
+        return self._header_rows[sheet_name]
+
+    def read(self, sheet_name, header_row, progress=None):
+        return read_worksheet_columnar(self.wb[sheet_name], header_row=header_row, progress=progress)
+
+    def iter_chunks(self, sheet_name, header_row, progress=None, chunk_size=CHUNK_SIZE):
+        return iter_worksheet_chunks(self.wb[sheet_name], header_row=header_row, progress=progress,
+                                     chunk_size=chunk_size)
+
+    def close(self):
+        self.wb.close()
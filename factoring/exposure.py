@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+from factoring.balances import opening_mask
+from factoring.indexes import frame_memo, key_index
+
+
+def _first_label(df, column, codes, n):
+    """Premier libellé rencontré pour chaque code (nom d'adhérent ou de tiré)."""
+    if column is None or column not in df.columns:
+        return np.full(n, None, dtype=object)
+    valid = codes >= 0
+    first = pd.Series(df[column].to_numpy()[valid]).groupby(codes[valid]).first()
+    return first.reindex(np.arange(n)).to_numpy(dtype=object)
+
+
+class ExposureGraph:
+    """Graphe biparti adhérents <-> tirés stocké en listes d'adjacence compactes (CSR).
+
+    Chaque arête (adhérent, tiré) porte le nombre de mouvements et les totaux DR/CR.
+    Les voisins d'un nœud sont une tranche contiguë d'un tableau numpy : les requêtes
+    « tirés d'un adhérent », « adhérents d'un tiré » et les expositions à deux sauts
+    ne parcourent que les arêtes concernées.
+    """
+
+    def __init__(self, clients, debtors, client_names, debtor_names, edge_client, edge_debtor,
+                 count, dr, cr):
+        self.clients = clients
+        self.debtors = debtors
+        self.client_names = client_names
+        self.debtor_names = debtor_names
+        self.edge_client = edge_client
+        self.edge_debtor = edge_debtor
+        self.count = count
+        self.dr = dr
+        self.cr = cr
+
+        # Arêtes triées par adhérent (ordre de construction) et permutation triée par tiré
+        self._client_ptr = np.searchsorted(edge_client, np.arange(len(clients) + 1))
+        self._by_debtor = np.argsort(edge_debtor, kind='stable')
+        self._debtor_ptr = np.searchsorted(edge_debtor[self._by_debtor], np.arange(len(debtors) + 1))
+
+    @property
+    def n_edges(self):
+        return len(self.edge_client)
+
+    def _client_edges(self, code):
+        return np.arange(self._client_ptr[code], self._client_ptr[code + 1])
+
+    def _debtor_edges(self, code):
+        return self._by_debtor[self._debtor_ptr[code]:self._debtor_ptr[code + 1]]
+
+    def _edge_table(self, edges, side):
+        if side == 'client':
+            codes = self.edge_client[edges]
+            out = {'Client Number': self.clients.keys.to_numpy()[codes],
+                   'Legal Client Name': self.client_names[codes]}
+        else:
+            codes = self.edge_debtor[edges]
+            out = {'Debtor Number': self.debtors.keys.to_numpy()[codes],
+                   'TIRES': self.debtor_names[codes]}
+        key_col = next(iter(out))
+        out.update({'Nb_mouvements': self.count[edges], 'Total_DR': self.dr[edges], 'Total_CR': self.cr[edges]})
+        # Plus de mouvements d'abord, puis ordre des identifiants à égalité
+        return (pd.DataFrame(out)
+                .sort_values(['Nb_mouvements', key_col], ascending=[False, True], kind='stable')
+                .reset_index(drop=True))
+
+    def clients_of(self, debtor_key):
+        """Adhérents exposés au tiré `debtor_key`, avec mouvements et totaux DR/CR."""
+        code = self.debtors.code(debtor_key)
+        edges = np.empty(0, dtype=np.intp) if code is None else self._debtor_edges(code)
+        return self._edge_table(edges, 'client')
+
+    def debtors_of(self, client_key):
+        """Tirés de l'adhérent `client_key`, avec mouvements et totaux DR/CR."""
+        code = self.clients.code(client_key)
+        edges = np.empty(0, dtype=np.intp) if code is None else self._client_edges(code)
+        return self._edge_table(edges, 'debtor')
+
+    def shared_debtors(self, min_clients=2):
+        """Tirés communs à au moins `min_clients` adhérents, les plus partagés en premier."""
+        n_clients = np.diff(self._debtor_ptr)
+        volume = np.bincount(self.edge_debtor, weights=self.dr + self.cr, minlength=len(self.debtors))
+        moves = np.bincount(self.edge_debtor, weights=self.count, minlength=len(self.debtors))
+        shared = np.flatnonzero(n_clients >= min_clients)
+        return (pd.DataFrame({
+            'Debtor Number': self.debtors.keys.to_numpy()[shared],
+            'TIRES': self.debtor_names[shared],
+            'Nb_adherents': n_clients[shared],
+            'Nb_mouvements': moves[shared].astype(np.int64),
+            'Volume_DR_CR': volume[shared],
+        })
+            .sort_values(['Nb_adherents', 'Volume_DR_CR'], ascending=False, kind='stable')
+            .reset_index(drop=True))
+
+    def related_debtors(self, debtor_key):
+        """Exposition à deux sauts : tirés partageant au moins un adhérent avec `debtor_key`."""
+        code = self.debtors.code(debtor_key)
+        if code is None:
+            return pd.DataFrame(columns=['Debtor Number', 'TIRES', 'Nb_adherents_communs', 'Volume_DR_CR'])
+        clients = self.edge_client[self._debtor_edges(code)]
+        edges = np.concatenate([self._client_edges(c) for c in clients]) if len(clients) else np.empty(0, np.intp)
+        edges = edges[self.edge_debtor[edges] != code]
+        return self._hop_table(self.edge_debtor[edges], self.dr[edges] + self.cr[edges],
+                               self.debtors, self.debtor_names, ['Debtor Number', 'TIRES', 'Nb_adherents_communs'])
+
+    def related_clients(self, client_key):
+        """Exposition à deux sauts : adhérents partageant au moins un tiré avec `client_key`."""
+        code = self.clients.code(client_key)
+        if code is None:
+            return pd.DataFrame(columns=['Client Number', 'Legal Client Name', 'Nb_tires_communs', 'Volume_DR_CR'])
+        debtors = self.edge_debtor[self._client_edges(code)]
+        edges = np.concatenate([self._debtor_edges(d) for d in debtors]) if len(debtors) else np.empty(0, np.intp)
+        edges = edges[self.edge_client[edges] != code]
+        return self._hop_table(self.edge_client[edges], self.dr[edges] + self.cr[edges],
+                               self.clients, self.client_names,
+                               ['Client Number', 'Legal Client Name', 'Nb_tires_communs'])
+
+    @staticmethod
+    def _hop_table(codes, volume, index, names, columns):
+        uniq, inverse, common = np.unique(codes, return_inverse=True, return_counts=True)
+        return (pd.DataFrame({
+            columns[0]: index.keys.to_numpy()[uniq],
+            columns[1]: names[uniq],
+            columns[2]: common,
+            'Volume_DR_CR': np.bincount(inverse, weights=volume, minlength=len(uniq)),
+        })
+            .sort_values([columns[2], 'Volume_DR_CR'], ascending=False, kind='stable')
+            .reset_index(drop=True))
+
+
+def build_exposure_graph(df, client_col='Client Number', debtor_col='Debtor Number',
+                         dr_col='EntryAmount', cr_col='EntryAmountSAC',
+                         client_name_col='Legal Client Name', debtor_name_col='TIRES',
+                         transaction_col='Transaction', date_col='EntryDate'):
+    """Construit le graphe adhérents <-> tirés du grand livre.
+
+    Mêmes lignes que la liste d'adhérents de la page 2 : soldes d'ouverture et
+    lignes sans date d'écriture exclus.
+    """
+    clients = key_index(df, client_col)
+    debtors = key_index(df, debtor_col)
+    c, d = clients.codes, debtors.codes
+    keep = (c >= 0) & (d >= 0) & ~opening_mask(df, transaction_col)
+    if date_col in df.columns:
+        keep &= df[date_col].notna().to_numpy()
+
+    # Une arête par couple distinct, dans l'ordre (adhérent, tiré)
+    width = max(len(debtors), 1)
+    pair = c[keep].astype(np.int64) * width + d[keep]
+    edges, inverse = np.unique(pair, return_inverse=True)
+    n = len(edges)
+    count = np.bincount(inverse, minlength=n).astype(np.int64)
+    dr = np.bincount(inverse, weights=df[dr_col].to_numpy(dtype=np.float64)[keep], minlength=n)
+    cr = np.bincount(inverse, weights=df[cr_col].to_numpy(dtype=np.float64)[keep], minlength=n)
+
+    return ExposureGraph(
+        clients, debtors,
+        _first_label(df, client_name_col, c, len(clients)),
+        _first_label(df, debtor_name_col, d, len(debtors)),
+        edges // width, edges % width, count, dr, cr,
+    )
+
+
+def exposure_graph(df, **columns):
+    """ExposureGraph mémorisé pour ce DataFrame (construit une seule fois par jeu de données)."""
+    key = ('exposure_graph',) + tuple(sorted(columns.items()))
+    return frame_memo(df, key, lambda: build_exposure_graph(df, **columns))
@@ -0,0 +1,95 @@
+"""Affichage paginé des lignes du grand livre : tri, filtre et choix des colonnes côté serveur.
+
+Seule la page visible est envoyée au navigateur, quelle que soit la taille du
+DataFrame : le coût d'un rerun ne dépend plus du nombre de lignes affichables.
+"""
+import numpy as np
+import pandas as pd
+
+from factoring.balances import label_contains
+from factoring.indexes import frame_memo
+
+
+# Tailles de page proposées, la première par défaut
+PAGE_SIZES = [50, 100, 250, 500]
+
+# Libellé du tri « ordre d'origine » dans le sélecteur
+NO_SORT = "(ordre d'origine)"
+
+
+def sort_order(df, column, ascending=True):
+    """Positions des lignes triées par `column` (valeurs manquantes en dernier), mémorisées pour ce DataFrame."""
+    def build():
+        values = df[column].reset_index(drop=True)
+        return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+    return frame_memo(df, ('sort_order', column, ascending), build)
+
+
+def filter_mask(s, query):
+    """Lignes dont la valeur correspond à `query` : égalité pour un nombre, sinon texte contenu (sans casse)."""
+    query = query.strip()
+    if pd.api.types.is_numeric_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        number = pd.to_numeric(query.replace(" ", "").replace(",", "."), errors='coerce')
+        if pd.notna(number):
+            return (s == number).to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        # Dates comparées sous la forme affichée « aaaa-mm-jj »
+        return label_contains(s.dt.strftime('%Y-%m-%d'), query)
+    return label_contains(s, query, case=False)
+
+
+def view_positions(df, sort_by=None, ascending=True, filter_col=None, query=""):
+    """Positions des lignes retenues par le filtre, dans l'ordre du tri.
+
+    Le tri réutilise l'ordre mémorisé du DataFrame complet, restreint aux lignes filtrées.
+    """
+    if sort_by:
+        positions = sort_order(df, sort_by, ascending)
+    else:
+        positions = np.arange(len(df))
+    if filter_col and query.strip():
+        mask = filter_mask(df[filter_col], query)
+        positions = positions[mask[positions]]
+    return positions
+
+
+def page_rows(df, positions, page=0, page_size=PAGE_SIZES[0], columns=None):
+    """Lignes de la page `page` parmi `positions` : seules `page_size` lignes (et `columns`) sont extraites."""
+    start = page * page_size
+    rows = df.iloc[positions[start:start + page_size]]
+    if columns:
+        rows = rows[list(columns)]
+    return rows
+
+
+def paged_dataframe(df, key, page_sizes=PAGE_SIZES):
+    """Tableau paginé Streamlit de `df` : tri, filtre, colonnes et page choisis dans la page, calculés côté serveur."""
+    import streamlit as st
+
+    all_columns = list(df.columns)
+    c1, c2, c3, c4 = st.columns([3, 1, 3, 3])
+    sort_by = c1.selectbox("Trier par", [NO_SORT] + all_columns, key=f"{key}_sort")
+    descending = c2.toggle("Décroissant", key=f"{key}_desc")
+    filter_col = c3.selectbox("Filtrer la colonne", all_columns, key=f"{key}_filter_col")
+    query = c4.text_input("Valeur (texte contenu ou nombre exact)", key=f"{key}_query")
+    with st.expander("Colonnes affichées"):
+        columns = st.multiselect("Colonnes", all_columns, default=all_columns, key=f"{key}_columns",
+                                 label_visibility="collapsed")
+
+    positions = view_positions(df, None if sort_by == NO_SORT else sort_by, not descending, filter_col, query)
+    total = len(positions)
+    c1, c2, c3 = st.columns([1, 1, 3])
+    page_size = c2.selectbox("Lignes par page", page_sizes, key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+    # Page hors bornes après un filtre ou un changement de taille : retour à la première
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = 1
+    page = c1.number_input(f"Page (sur {pages})", min_value=1, max_value=pages, step=1, key=f"{key}_page") - 1
+
+    rows = page_rows(df, positions, page, page_size, columns or all_columns)
+    start = page * page_size
+    c3.caption(f"Lignes {min(start + 1, total):,} à {start + len(rows):,} sur {total:,}".replace(",", " ")
+               + (f" ({len(df):,} au total)".replace(",", " ") if total != len(df) else ""))
+    st.dataframe(rows, use_container_width=True, hide_index=True)
+    return rows
@@ -0,0 +1,78 @@
+import weakref
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_key(s):
+    """Clé texte d'un identifiant : espaces retirés et suffixe '.0' des nombres Excel supprimé."""
+    return s.astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+
+
+class KeyIndex:
+    """Index clé -> positions de lignes, construit une seule fois par colonne.
+
+    Les positions d'une même clé sont stockées de façon contiguë (format CSR) et
+    dans l'ordre d'origine des lignes : une recherche est une lecture de dictionnaire
+    suivie d'une tranche numpy, indépendante de la taille du grand livre.
+    """
+
+    def __init__(self, series):
+        codes, uniques = pd.factorize(normalize_key(series), use_na_sentinel=True)
+        self.keys = pd.Index(uniques)
+        self.codes = codes
+        self._code_of = {key: i for i, key in enumerate(uniques)}
+
+        valid = codes >= 0
+        self._order = np.flatnonzero(valid)[np.argsort(codes[valid], kind='stable')]
+        counts = np.bincount(codes[valid], minlength=len(uniques))
+        self._starts = np.concatenate(([0], np.cumsum(counts)))
+
+    def __contains__(self, key):
+        return str(key).strip() in self._code_of
+
+    def __len__(self):
+        return len(self.keys)
+
+    def code(self, key):
+        """Code entier de `key` (position dans `keys`), None si la clé est inconnue."""
+        return self._code_of.get(str(key).strip())
+
+    def positions(self, key):
+        """Positions (iloc) des lignes de `key`, tableau vide si la clé est inconnue."""
+        code = self.code(key)
+        if code is None:
+            return np.empty(0, dtype=np.intp)
+        return self._order[self._starts[code]:self._starts[code + 1]]
+
+    def count(self, key):
+        return len(self.positions(key))
+
+    def take(self, df, key):
+        """Lignes de `df` correspondant à `key` (même résultat qu'un filtre booléen sur la colonne)."""
+        return df.iloc[self.positions(key)]
+
+
+# Structures dérivées déjà construites, par DataFrame (libérées avec lui) puis par clé
+_derived = {}
+
+
+def frame_memo(df, key, build):
+    """Résultat de `build()` mémorisé pour ce DataFrame et cette clé.
+
+    Les structures dérivées (index, agrégats) sont ainsi construites une seule fois
+    par jeu de données chargé, quelle que soit la page ou la session qui les demande.
+    """
+    entry = _derived.get(id(df))
+    if entry is None or entry[0]() is not df:
+        ref = weakref.ref(df, lambda _, k=id(df): _derived.pop(k, None))
+        entry = _derived[id(df)] = (ref, {})
+    value = entry[1].get(key)
+    if value is None:
+        value = entry[1][key] = build()
+    return value
+
+
+def key_index(df, column):
+    """KeyIndex de `df[column]`, construit au premier appel puis réutilisé."""
+    return frame_memo(df, ('key_index', column), lambda: KeyIndex(df[column]))
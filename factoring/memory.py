@@ -0,0 +1,65 @@
+import pandas as pd
+
+
+# Colonnes d'identifiants : entiers stockés en float par Excel, réduits au plus petit type entier
+ID_COLUMNS = ['Client Number', 'Debtor Number', 'Transaction Id', 'Accounting Transaction ID',
+              'ledger item id', 'Service Agreement ID', 'Document Number', 'Month No', 'Year No']
+
+# Part maximale de valeurs distinctes pour convertir une colonne texte en catégorie
+CATEGORY_MAX_RATIO = 0.5
+
+
+def column_memory(df):
+    """Mémoire occupée par colonne (octets, objets Python compris)."""
+    return df.memory_usage(deep=True, index=False)
+
+
+def _downcast_id(s):
+    if pd.api.types.is_integer_dtype(s):
+        return pd.to_numeric(s, downcast='integer')
+    if not pd.api.types.is_float_dtype(s):
+        return s
+    values = s.dropna()
+    if not (values == values.round()).all():
+        return s
+    if values.empty or s.notna().all():
+        return pd.to_numeric(s.astype('int64'), downcast='integer')
+    # Identifiants manquants : entier nullable du plus petit type possible
+    small = pd.to_numeric(values.astype('int64'), downcast='integer')
+    return s.astype(f"Int{small.dtype.itemsize * 8}")
+
+
+def compact_frame(df, max_category_ratio=CATEGORY_MAX_RATIO):
+    """Version compacte du DataFrame et rapport mémoire avant/après par colonne.
+
+    Les colonnes entièrement vides sont supprimées, les textes peu variés passent
+    en catégories et les identifiants numériques sont réduits au plus petit entier.
+    Les montants restent en float64 pour ne pas perdre de précision.
+    """
+    empty = [col for col in df.columns if df[col].isna().all()]
+    out = df.drop(columns=empty)
+
+    n = len(out)
+    for col in out.columns:
+        s = out[col]
+        if col in ID_COLUMNS or pd.api.types.is_integer_dtype(s):
+            out[col] = _downcast_id(s)
+        elif (pd.api.types.is_object_dtype(s) or pd.api.types.is_string_dtype(s)) \
+                and not isinstance(s.dtype, pd.CategoricalDtype) and n:
+            if s.nunique(dropna=True) <= max_category_ratio * n:
+                out[col] = s.astype('category')
+
+    return out, memory_report(df, out)
+
+
+def memory_report(df, out):
+    """Types et mémoire par colonne avant (`df`) et après (`out`) compactage."""
+    before = column_memory(df)
+    after = column_memory(out)
+    return pd.DataFrame({
+        'Colonne': before.index,
+        'Type avant': df.dtypes.astype(str).reindex(before.index).values,
+        'Type après': [str(out[col].dtype) if col in out.columns else "supprimée" for col in before.index],
+        'Mémoire avant (Mo)': before.values / 1024 / 1024,
+        'Mémoire après (Mo)': after.reindex(before.index).fillna(0).values / 1024 / 1024,
+    })
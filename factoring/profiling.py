@@ -0,0 +1,146 @@
+"""Mesure optionnelle des sections des pages et du chargement : temps réel, temps CPU, pic d'allocation.
+
+Les pages sont des scripts linéaires : `lap(nom)` clôt la section en cours et
+ouvre la suivante, sans réindenter le code mesuré ; `section(nom)` fait de même
+sous forme de bloc `with`. Chaque section mesurée est ajoutée au journal JSON
+lines (une ligne par section) pour l'analyse hors ligne.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from factoring.cache import CACHE_DIR
+
+
+# Journal des mesures, surchargeable par variable d'environnement
+PROFILE_LOG = Path(os.environ.get("FACTORING_PROFILE_LOG", CACHE_DIR.parent / "profile.jsonl"))
+
+# Mesures gardées dans la session pour l'affichage des exécutions précédentes
+HISTORY_SIZE = 200
+
+_log_lock = threading.Lock()
+
+
+def append_log(records, path=PROFILE_LOG):
+    """Ajoute les mesures `records` (dictionnaires) au journal JSON lines."""
+    if not records:
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+
+
+def read_log(path=PROFILE_LOG):
+    """Journal des mesures en DataFrame (vide si absent)."""
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame()
+    return pd.read_json(path, lines=True)
+
+
+class Profiler:
+    """Sections mesurées d'une exécution de page (un rerun Streamlit).
+
+    Inactif, il ne mesure rien et ne coûte qu'un test par section. Actif, il
+    relève pour chaque section le temps réel, le temps CPU du thread (celui de la
+    session) et le pic d'allocation Python via tracemalloc. Le suivi tracemalloc
+    est global au processus : le pic inclut les allocations des autres sessions
+    actives au même moment.
+    """
+
+    def __init__(self, page, enabled=False, log_path=PROFILE_LOG, run=None, history=None, **context):
+        self.page = page
+        self.enabled = enabled
+        self.log_path = log_path
+        self.run = run or uuid.uuid4().hex[:12]
+        self.context = context
+        self.records = []
+        # Mesures des exécutions précédentes (interrompues par un rerun par exemple), partagées par la session
+        self.history = history if history is not None else []
+        self._current = None
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def lap(self, name):
+        """Clôt la section en cours et commence la section `name`."""
+        if not self.enabled:
+            return
+        self.finish()
+        tracemalloc.reset_peak()
+        self._current = (name, time.perf_counter(), time.thread_time(), tracemalloc.get_traced_memory()[0])
+
+    def finish(self):
+        """Clôt la section en cours (sans effet s'il n'y en a pas) et l'ajoute au journal."""
+        if self._current is None:
+            return
+        name, wall, cpu, memory = self._current
+        wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] - memory if tracemalloc.is_tracing() else None
+        self._current = None
+        record = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'run': self.run, 'page': self.page, 'section': name,
+            'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3),
+            'peak_kb': None if peak is None else round(max(peak, 0) / 1024, 1), **self.context,
+        }
+        self.records.append(record)
+        self.history.append(record)
+        del self.history[:-HISTORY_SIZE]
+        append_log([record], self.log_path)
+
+    @contextmanager
+    def section(self, name):
+        """Bloc mesuré comme une section `name` (les sections ne s'imbriquent pas)."""
+        self.lap(name)
+        try:
+            yield
+        finally:
+            self.finish()
+
+    def table(self, records=None):
+        """Sections mesurées pendant cette exécution (ou `records`), dans l'ordre."""
+        columns = ['time', 'page', 'section', 'wall_ms', 'cpu_ms', 'peak_kb']
+        return pd.DataFrame(self.records if records is None else records, columns=columns)
+
+
+def page_profiler(page, **context):
+    """Profiler de la page : interrupteur dans la barre latérale, partagé par toutes les pages de la session."""
+    import streamlit as st
+
+    # Valeur gardée hors du widget : elle suit la session d'une page à l'autre
+    enabled = st.sidebar.toggle("Mode profilage", value=st.session_state.get("profiling", False),
+                                help="Mesure temps, CPU et mémoire de chaque section (ralentit l'affichage).")
+    st.session_state.profiling = enabled
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        st.session_state.profiling_tracer = True
+    elif not enabled and st.session_state.pop("profiling_tracer", False):
+        # Suivi démarré par cette session : arrêté quand elle désactive le profilage
+        tracemalloc.stop()
+    return Profiler(page, enabled, history=st.session_state.setdefault("profiling_history", []), **context)
+
+
+def profiling_panel(profiler):
+    """Clôt la dernière section et affiche les mesures de l'exécution dans la barre latérale."""
+    import streamlit as st
+
+    if not profiler.enabled:
+        return
+    profiler.finish()
+    table = profiler.table()[['section', 'wall_ms', 'cpu_ms', 'peak_kb']].sort_values('wall_ms', ascending=False)
+    with st.sidebar.expander(f"Profilage : {profiler.page}", expanded=True):
+        st.caption(f"Total {table['wall_ms'].sum():,.0f} ms, CPU {table['cpu_ms'].sum():,.0f} ms".replace(",", " "))
+        st.dataframe(table, use_container_width=True, hide_index=True)
+        st.caption(f"Journal : {profiler.log_path}")
+    earlier = [record for record in profiler.history if record['run'] != profiler.run]
+    if earlier:
+        with st.sidebar.expander("Profilage : exécutions précédentes"):
+            st.dataframe(profiler.table(earlier[::-1]), use_container_width=True, hide_index=True)
@@ -0,0 +1,158 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from factoring.cache import SheetCache
+
+
+# Budget mémoire des jeux de données partagés, surchargeable par variable d'environnement
+REGISTRY_MAX_MB = float(os.environ.get("FACTORING_REGISTRY_MAX_MB", 2048))
+
+
+def dataset_key(*parts):
+    """Clé d'un jeu de données dérivé (consolidation, ajout d'extrait, mode compact) de ses sources."""
+    raw = "\x00".join(str(part) for part in parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class DatasetLease:
+    """Référence d'une session vers un jeu de données partagé.
+
+    Tant qu'un bail existe (dans `st.session_state` par exemple), le jeu de données
+    n'est pas évincé ; il redevient évinçable dès que la session l'abandonne.
+    """
+
+    def __init__(self, key, df, info):
+        self.key = key
+        self.df = df
+        self.info = info
+
+
+class DatasetRegistry:
+    """Jeux de données partagés par toutes les sessions du serveur, adressés par contenu.
+
+    Un fichier téléversé par plusieurs utilisateurs n'est lu et gardé en mémoire
+    qu'une fois : chaque session ne détient qu'un bail vers le DataFrame commun, ce
+    qui partage aussi les index et agrégats dérivés (voir frame_memo). Au-delà du
+    budget mémoire, les jeux sans bail actif sont évincés du moins récemment utilisé
+    au plus récent, après écriture dans le cache disque d'où ils sont relus sans
+    repasser par Excel.
+    """
+
+    def __init__(self, max_mb=REGISTRY_MAX_MB, spill=None):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.spill = spill if spill is not None else SheetCache()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._leases = {}
+        self._loading = {}
+
+    def _lease(self, key, entry):
+        lease = DatasetLease(key, entry['df'], entry['info'])
+        self._leases.setdefault(key, weakref.WeakSet()).add(lease)
+        return lease
+
+    def in_use(self, key):
+        """Vrai si au moins une session détient encore un bail sur `key`."""
+        return bool(self._leases.get(key))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return self._lease(key, entry), 'memory'
+        df = self.spill.load(key)
+        if df is None:
+            return None, None
+        return self._admit(key, df, self.spill.info(key) or {}), 'disk'
+
+    def get(self, key):
+        """Bail sur `key` (relu du disque s'il a été évincé), ou None si inconnu."""
+        return self._get(key)[0]
+
+    def put(self, key, df, persist=False, **info):
+        """Enregistre `df` sous `key` et renvoie un bail ; `persist` l'écrit aussi tout de suite sur disque."""
+        if persist:
+            self.spill.store(key, df, **info)
+        return self._admit(key, df, info)
+
+    def get_or_load(self, key, load, persist=False):
+        """Bail sur `key`, chargé par `load()` -> (df, info) s'il est inconnu. Renvoie (bail, origine).
+
+        Le chargement n'a lieu qu'une fois même si plusieurs sessions demandent la
+        même clé en même temps : les suivantes attendent puis reçoivent le même
+        DataFrame. Origine : 'memory', 'disk' ou 'source'.
+        """
+        with self._lock:
+            # [verrou, sessions en attente ou en cours de chargement]
+            loading = self._loading.setdefault(key, [threading.Lock(), 0])
+            loading[1] += 1
+        try:
+            with loading[0]:
+                lease, origin = self._get(key)
+                if lease is None:
+                    df, info = load()
+                    lease, origin = self.put(key, df, persist=persist, **info), 'source'
+        finally:
+            with self._lock:
+                # Dernière session servie : le verrou de la clé est retiré
+                loading[1] -= 1
+                if not loading[1]:
+                    del self._loading[key]
+        return lease, origin
+
+    def _admit(self, key, df, info):
+        entry = {'df': df, 'bytes': int(df.memory_usage(deep=True).sum()), 'info': info}
+        with self._lock:
+            # Chargé entre-temps par une autre session : on partage l'entrée existante
+            entry = self._entries.setdefault(key, entry)
+            self._entries.move_to_end(key)
+            lease = self._lease(key, entry)
+        self.enforce_budget()
+        return lease
+
+    def enforce_budget(self):
+        """Évince les jeux sans bail, du moins récemment utilisé au plus récent, jusqu'à respecter le budget."""
+        with self._lock:
+            total = sum(entry['bytes'] for entry in self._entries.values())
+            victims = []
+            for key, entry in self._entries.items():
+                if total <= self.max_bytes:
+                    break
+                if not self.in_use(key):
+                    victims.append((key, entry))
+                    total -= entry['bytes']
+        for key, entry in victims:
+            # Écriture hors verrou (si absent du disque) : l'entrée reste servie depuis la mémoire pendant ce temps
+            if self.spill.info(key) is None:
+                self.spill.store(key, entry['df'], **entry['info'])
+            with self._lock:
+                if self._entries.get(key) is entry and not self.in_use(key):
+                    del self._entries[key]
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['bytes'] for entry in self._entries.values())
+
+    def entries(self):
+        """Jeux en mémoire (dictionnaires), le plus récemment utilisé en premier."""
+        with self._lock:
+            return [{**entry['info'], 'key': key, 'rows': len(entry['df']), 'size_bytes': entry['bytes'],
+                     'sessions': len(self._leases.get(key, ()))}
+                    for key, entry in reversed(self._entries.items())]
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry():
+    """Registre unique du processus, commun à toutes les sessions Streamlit."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = DatasetRegistry()
+        return _shared
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from factoring.balances import OPENING_LABEL, balance_cube, label_contains, opening_mask
+from factoring.concentration import debtor_concentration
+from factoring.exposure import exposure_graph
+from factoring.indexes import key_index
+
+
+# Colonnes indispensables à l'analyse générale (page 3)
+GENERAL_COLUMNS = ['Entry Amount', 'Entry Amount SAC', 'Client Number', 'Legal Client Name', 'Rubrique']
+
+# Noms des mois en français pour les libellés des tableaux mensuels
+MOIS_FR = {
+    'January': 'janvier', 'February': 'février', 'March': 'mars', 'April': 'avril', 'May': 'mai', 'June': 'juin',
+    'July': 'juillet', 'August': 'août', 'September': 'septembre', 'October': 'octobre',
+    'November': 'novembre', 'December': 'décembre'
+}
+
+
+def month_labels(months):
+    """Libellés « janvier - 2025 » des mois, « solde d'ouverture » pour la ligne sans date."""
+    labels = months.dt.strftime('%B - %Y').replace(MOIS_FR, regex=True).str.lower()
+    return labels.fillna("solde d'ouverture")
+
+
+def client_summary(client_data):
+    """Résumé des mouvements d'un adhérent : nombre, solde d'ouverture, DR, CR et solde final."""
+    opening = client_data.loc[opening_mask(client_data), 'EntryAmount'].sum()
+    return pd.DataFrame({
+        "Rubrique": [
+            "Nombre de mouvements",
+            "Solde d'ouverture",
+            "Total Débits (DR)",
+            "Total Crédits (CR)",
+            "Solde final du client"
+        ],
+        "Valeur": [
+            len(client_data),
+            opening,
+            client_data['EntryAmount'].sum(),
+            client_data['EntryAmountSAC'].sum(),
+            client_data['solde'].sum()
+        ]
+    })
+
+
+def debtor_summary(tire_data):
+    """Résumé financier d'un tiré : nombre de mouvements, solde d'ouverture, DR, CR et solde DR - CR."""
+    total_dr = tire_data['EntryAmount'].sum()
+    total_cr = tire_data['EntryAmountSAC'].sum()
+    opening = 0
+    if 'Transaction' in tire_data.columns:
+        opening = tire_data.loc[opening_mask(tire_data), 'EntryAmount'].sum()
+    return pd.DataFrame({
+        "Rubrique": ["Nombre de mouvements", "Solde d'ouverture", "Total Débits (DR)", "Total Crédits (CR)",
+                     "Solde final (DR-CR)"],
+        "Valeur": [len(tire_data), opening, total_dr, total_cr, total_dr - total_cr],
+    })
+
+
+def monthly_balance_table(df, key_col, key, opening=None, dr_col='EntryAmount', cr_col='EntryAmountSAC'):
+    """Tableau mensuel d'une entité précédé de la ligne « solde d'ouverture » (YearMonth vide).
+
+    Les mois viennent du cube (entité x mois) construit une fois pour tout le grand
+    livre ; `opening` remplace le solde d'ouverture du cube s'il est fourni.
+    """
+    cube = balance_cube(df, key_col, dr_col, cr_col)
+    if opening is None:
+        opening = cube.opening_balance(key)
+    return pd.concat([
+        pd.DataFrame([{
+            'YearMonth': pd.NaT,
+            'SoldeInitial': '',
+            'DR': opening,
+            'CR': 0,
+            'SoldeMois': 0,
+            'SoldeCumulatif': opening
+        }]),
+        cube.entity_table(key)
+    ], ignore_index=True)
+
+
+def rub_table(rows, rub_col='RUB'):
+    """Nombre et totaux DR/CR par RUB, la ligne de solde d'ouverture (SO) en premier."""
+    # Libellé testé une fois par catégorie, pas par ligne
+    so_mask = label_contains(rows['Transaction'], OPENING_LABEL, case=False)
+    dr = rows['EntryAmount'].to_numpy(dtype=np.float64)
+    cr = rows['EntryAmountSAC'].to_numpy(dtype=np.float64)
+
+    # Sommes par RUB en une passe numpy (codes triés comme les groupes de groupby, RUB manquant exclu)
+    rest = ~so_mask
+    codes, labels = pd.factorize(rows[rub_col].to_numpy()[rest], sort=True)
+    valid = codes >= 0
+    codes = codes[valid]
+
+    stats = pd.DataFrame({
+        rub_col: np.concatenate([['SO'], np.asarray(labels, dtype=object)]),
+        'Nombre': np.concatenate([[so_mask.sum()], np.bincount(codes, minlength=len(labels))]),
+        'Total_DR': np.concatenate([[dr[so_mask].sum()],
+                                    np.bincount(codes, weights=dr[rest][valid], minlength=len(labels))]),
+        'Total_CR': np.concatenate([[cr[so_mask].sum()],
+                                    np.bincount(codes, weights=cr[rest][valid], minlength=len(labels))]),
+    })
+
+    # SO en premier, puis DR décroissant
+    stats['ordre'] = (stats[rub_col] != "SO").astype(int)
+    return stats.sort_values(by=['ordre', 'Total_DR'], ascending=[True, False]).drop(columns=['ordre'])
+
+
+def client_report(df, client):
+    """Tableaux de l'analyse par adhérent (page 1) pour `client`, None s'il est inconnu."""
+    client_data = key_index(df, 'Client Number').take(df, client).reset_index(drop=True)
+    if client_data.empty:
+        return None
+    tables = {'Mouvements': client_data}
+    if 'EntryAmount' in df.columns:
+        tables['Résumé'] = client_summary(client_data)
+        monthly = monthly_balance_table(df, 'Client Number', client)
+        tables['Mensuel'] = monthly.assign(YearMonth=month_labels(monthly['YearMonth'])) \
+            .rename(columns={'YearMonth': 'Date'})
+    if 'TIRES' in df.columns and 'Debtor Number' in df.columns:
+        tables['Tirés'] = debtor_concentration(df).for_client(client).drop(columns=['Total'])
+    if 'RUB' in df.columns:
+        tables['RUB'] = rub_table(client_data)
+    return tables
+
+
+def debtor_report(df, debtor):
+    """Tableaux de l'analyse par tiré (page 2) pour `debtor`, None s'il est inconnu."""
+    tire_data = key_index(df, 'Debtor Number').take(df, debtor).reset_index(drop=True)
+    if tire_data.empty:
+        return None
+    tables = {'Mouvements': tire_data}
+    if 'EntryAmount' in df.columns and 'EntryAmountSAC' in df.columns:
+        summary = debtor_summary(tire_data)
+        tables['Résumé'] = summary
+        monthly = monthly_balance_table(df, 'Debtor Number', debtor, opening=summary['Valeur'].iloc[1]) \
+            .drop(columns=['SoldeInitial'])
+        tables['Mensuel'] = monthly.assign(YearMonth=month_labels(monthly['YearMonth'])) \
+            .rename(columns={'YearMonth': 'Date'})
+    if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
+        tables['Adhérents'] = exposure_graph(df).clients_of(debtor)
+    if 'RUB' in df.columns:
+        tables['RUB'] = rub_table(tire_data)
+    return tables
+
+
+def ledger_overview(df):
+    """Nombre d'adhérents et de lignes, totaux DR et CR (analyse générale, page 3)."""
+    return {'clients': df['Client Number'].nunique(), 'rows': len(df),
+            'dr': df['Entry Amount'].sum(), 'cr': df['Entry Amount SAC'].sum()}
+
+
+def rubrique_table(totals):
+    """Statistiques par rubrique à partir des agrégats (LedgerTotals ou équivalent), DR décroissant."""
+    stats = totals.summary('rubriques', Nombre_clients=('rubrique_clients', 'Client Number')) \
+        .rename(columns={'Nombre': 'Nombre_transactions'})
+    stats['Solde_Net'] = stats['Total_DR'] - stats['Total_CR']
+    return stats.sort_values(by='Total_DR', ascending=False)
+
+
+def transaction_table(totals):
+    """Statistiques par type de transaction à partir des agrégats, DR décroissant."""
+    stats = totals.summary('transactions', Nombre_clients=('transaction_clients', 'Client Number')) \
+        .rename(columns={'Nombre': 'Nombre_transactions'})
+    stats['Solde_Net'] = stats['Total_DR'] - stats['Total_CR']
+    return stats.sort_values(by='Total_DR', ascending=False)
+
+
+def monthly_totals(df, min_year=2000, max_year=2100):
+    """Nombre de lignes et totaux DR/CR par mois (dates hors [min_year, max_year] exclues)."""
+    d = df['EntryDate']
+    d = d.where((d.dt.year >= min_year) & (d.dt.year <= max_year))
+    valid = d.notna().to_numpy()
+    months = pd.DataFrame({
+        'YearMonth': d[valid].dt.to_period('M').dt.to_timestamp(),
+        'Nombre_transactions': 1,
+        'Total_DR': df['Entry Amount'].to_numpy(dtype=np.float64)[valid],
+        'Total_CR': df['Entry Amount SAC'].to_numpy(dtype=np.float64)[valid],
+    })
+    return months.groupby('YearMonth', as_index=False).sum()
+
+
+def top_clients_table(totals, n=15):
+    """Les `n` adhérents au plus fort volume (DR + CR)."""
+    top = totals.table('clients').rename(columns={'Nombre': 'Nombre_transactions'})
+    top['Solde_Net'] = top['Total_DR'] - top['Total_CR']
+    top['Total_Volume'] = top['Total_DR'] + top['Total_CR']
+    return top.sort_values(by='Total_Volume', ascending=False).head(n)
+
+
+def general_report(df, totals):
+    """Tableaux de l'analyse générale (page 3) : vue d'ensemble, rubriques, transactions, mois, top adhérents."""
+    stats = ledger_overview(df)
+    tables = {"Vue d'ensemble": pd.DataFrame({
+        'Indicateur': ["Nombre de clients", "Nombre de transactions", "Total Débits", "Total Crédits"],
+        'Valeur': [stats['clients'], stats['rows'], stats['dr'], stats['cr']],
+    })}
+    tables['Rubriques'] = rubrique_table(totals)
+    if 'transactions' in totals:
+        tables['Transactions'] = transaction_table(totals)
+    if 'EntryDate' in df.columns:
+        monthly = monthly_totals(df)
+        monthly['Solde_Net'] = monthly['Total_DR'] - monthly['Total_CR']
+        tables['Mensuel'] = monthly
+    tables['Top adhérents'] = top_clients_table(totals)
+    return tables
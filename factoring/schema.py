@@ -0,0 +1,131 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+
+# Colonnes de la première base (originale)
+BASE1_COLUMNS = ['TIRES', 'Debtor Number', 'EntryAmountSAC', 'RUB']
+
+# Colonnes de la deuxième base (alternative)
+BASE2_COLUMNS = ['Entry Amount SAC', 'Rubrique', 'MVT', 'ledger item id']
+
+# Colonnes communes aux deux formats, utiles pour repérer la ligne d'entête
+COMMON_COLUMNS = ['Client Number', 'Legal Client Name', 'EntryDate', 'Transaction', 'TRANSACTION',
+                  'EntryAmount', 'Entry Amount', 'Transaction Id']
+
+HEADER_COLUMNS = BASE1_COLUMNS + BASE2_COLUMNS + COMMON_COLUMNS
+
+# Version du schéma canonique : à incrémenter si la normalisation change (invalide le cache disque)
+SCHEMA_VERSION = 1
+
+# Schéma canonique : rôle -> nom de colonne dans chacun des deux formats
+CANONICAL_COLUMNS = {
+    "original": {
+        "client_id": "Client Number",
+        "client_name": "Legal Client Name",
+        "debtor_id": "Debtor Number",
+        "debtor_name": "TIRES",
+        "dr": "EntryAmount",
+        "cr": "EntryAmountSAC",
+        "balance": "solde",
+        "date": "EntryDate",
+        "rubrique": "RUB",
+        "transaction": "Transaction",
+        "txn_id": "Transaction Id",
+    },
+    "alternative": {
+        "client_id": "Client Number",
+        "client_name": "Legal Client Name",
+        "dr": "Entry Amount",
+        "cr": "Entry Amount SAC",
+        "balance": "Solde",
+        "date": "EntryDate",
+        "rubrique": "Rubrique",
+        "transaction": "TRANSACTION",
+        "mvt": "MVT",
+        "txn_id": "Transaction Id",
+        "item_id": "ledger item id",
+    },
+}
+
+# Types définitifs appliqués une seule fois après l'ingestion
+AMOUNT_COLUMNS = ['EntryAmount', 'EntryAmountSAC', 'solde', 'Entry Amount', 'Entry Amount SAC', 'Solde']
+DATE_COLUMNS = ['EntryDate', 'DueDate']
+LABEL_COLUMNS = ['Legal Client Name', 'TIRES', 'RUB', 'Transaction', 'Rubrique', 'TRANSACTION', 'MVT',
+                 'TransactionType', 'Entry Type', 'Cal Month Name']
+# Libellés dont les valeurs manquantes sont regroupées sous un libellé explicite
+MISSING_LABELS = {'RUB': "Non définie", 'Rubrique': "Non définie"}
+
+
+def canonical_columns(df, base_type):
+    """Correspondance rôle -> colonne pour les colonnes effectivement présentes dans `df`."""
+    mapping = CANONICAL_COLUMNS.get(base_type, {})
+    return {role: col for role, col in mapping.items() if col in df.columns}
+
+
+def to_amount(s):
+    """Montants en float64 (gère les textes du type "33 989", espaces insécables, virgule décimale)."""
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype('float64').fillna(0)
+    values = pd.to_numeric(s, errors='coerce')
+    text = s.notna() & values.isna()
+    if text.any():
+        values[text] = pd.to_numeric(
+            s[text].astype(str)
+                   .str.replace('\u00A0', '', regex=False)  # nbsp
+                   .str.replace(' ', '', regex=False)       # espaces milliers
+                   .str.replace(',', '.', regex=False),     # virgule -> point
+            errors='coerce'
+        )
+    return values.astype('float64').fillna(0)
+
+
+def to_date(s):
+    """Dates en datetime64 : objets date, textes jour/mois/année et numéros de série Excel."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s
+    d = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    is_date = s.map(lambda v: isinstance(v, (datetime, date)))
+    if is_date.any():
+        d[is_date] = pd.to_datetime(s[is_date])
+    rest = s.notna() & ~is_date
+    if rest.any():
+        as_num = pd.to_numeric(s[rest], errors='coerce')
+        serial = as_num.notna()
+        # Convertir les "séries Excel" en dates (origine Excel)
+        if serial.any():
+            d[as_num[serial].index] = pd.to_datetime(as_num[serial], unit='D', origin='1899-12-30')
+        text = as_num[~serial].index
+        if len(text):
+            d[text] = pd.to_datetime(s[text].astype(str).str.strip(), dayfirst=True, errors='coerce')
+    return d
+
+
+def to_label(s, missing=None):
+    """Libellés nettoyés (espaces en bord) stockés en catégories."""
+    cleaned = s.where(s.isna(), s.astype(str).str.strip())
+    if missing is not None:
+        cleaned = cleaned.fillna(missing)
+    return cleaned.astype('category')
+
+
+def normalize_ledger(df):
+    """Applique une fois pour toutes les types définitifs au grand livre chargé.
+
+    Les deux formats (original et alternatif) sont traités : montants en float64,
+    dates en datetime64, libellés en catégories, noms de colonnes nettoyés. Les pages
+    peuvent ensuite utiliser les colonnes sans conversion à chaque rerun.
+    """
+    # Nettoyage approfondi des noms de colonnes
+    df.columns = [str(col).strip().replace('\n', '').replace('\r', '') if col is not None else f"Unnamed_{i}"
+                  for i, col in enumerate(df.columns)]
+    for col in AMOUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = to_amount(df[col])
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = to_date(df[col])
+    for col in LABEL_COLUMNS:
+        if col in df.columns:
+            df[col] = to_label(df[col], MISSING_LABELS.get(col))
+    return df
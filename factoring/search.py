@@ -0,0 +1,157 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from factoring.indexes import frame_memo, key_index
+
+
+# Nombre de suggestions proposées et score minimal des correspondances approchées
+SUGGESTION_LIMIT = 10
+MIN_FUZZY_SCORE = 0.3
+
+
+def normalize_text(text):
+    """Texte de recherche : minuscules, sans accents, ponctuation remplacée par des espaces."""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return re.sub(r'[^0-9a-z]+', ' ', text).strip()
+
+
+def trigrams(text):
+    """Trigrammes du texte normalisé, bordés d'espaces pour favoriser les débuts de mots."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _csr(groups, n_groups, values):
+    """Listes `values` regroupées par `groups` : (ordre, bornes) au format CSR."""
+    order = np.argsort(groups, kind='stable')
+    starts = np.concatenate(([0], np.cumsum(np.bincount(groups, minlength=n_groups))))
+    return np.asarray(values)[order], starts
+
+
+class SearchIndex:
+    """Index de recherche des adhérents ou des tirés par numéro et par nom.
+
+    - Préfixes : chaque numéro et chaque mot du nom sont rangés dans un tableau trié
+      (trie compacté) ; un préfixe correspond à une tranche trouvée par dichotomie.
+    - Approché : un index inversé de trigrammes donne pour chaque entrée le
+      coefficient de Dice avec la saisie, ce qui tolère fautes de frappe et inversions.
+    Une requête ne touche que les entrées concernées, sans parcourir le grand livre.
+    """
+
+    def __init__(self, keys, labels, counts, key_col, label_col):
+        self.keys = np.asarray(keys, dtype=object)
+        self.labels = np.asarray(labels, dtype=object)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.key_col = key_col
+        self.label_col = label_col
+
+        texts = [normalize_text(label) if label is not None and label == label else ''
+                 for label in self.labels]
+
+        self._code_of = {normalize_text(key): i for i, key in enumerate(self.keys)}
+
+        # Termes (numéro + mots du nom) triés, avec l'entrée à laquelle ils renvoient
+        terms, owners = [], []
+        for i, (key, text) in enumerate(zip(self.keys, texts)):
+            for term in {normalize_text(key), *text.split()}:
+                if term:
+                    terms.append(term)
+                    owners.append(i)
+        terms = np.array(terms, dtype=str)
+        order = np.argsort(terms, kind='stable')
+        self._terms = terms[order]
+        self._term_owner = np.asarray(owners, dtype=np.int64)[order]
+
+        # Index inversé trigramme -> entrées
+        gram_ids, gram_of, gram_owner = {}, [], []
+        self._n_grams = np.zeros(len(self.keys), dtype=np.int64)
+        for i, (key, text) in enumerate(zip(self.keys, texts)):
+            grams = trigrams(f"{text} {normalize_text(key)}".strip())
+            self._n_grams[i] = len(grams)
+            for gram in grams:
+                gram_of.append(gram_ids.setdefault(gram, len(gram_ids)))
+                gram_owner.append(i)
+        self._gram_ids = gram_ids
+        self._postings, self._gram_starts = _csr(np.asarray(gram_of, dtype=np.int64), len(gram_ids),
+                                                 np.asarray(gram_owner, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prefix(self, word):
+        lo = np.searchsorted(self._terms, word, side='left')
+        hi = np.searchsorted(self._terms, word + '\uffff', side='left')
+        return np.unique(self._term_owner[lo:hi])
+
+    def prefix_matches(self, query):
+        """Entrées dont chaque mot de la saisie commence un terme (numéro ou mot du nom)."""
+        words = normalize_text(query).split()
+        if not words:
+            return np.empty(0, dtype=np.int64)
+        hits = self._prefix(words[0])
+        for word in words[1:]:
+            hits = np.intersect1d(hits, self._prefix(word), assume_unique=True)
+        return hits
+
+    def fuzzy_scores(self, query):
+        """Coefficient de Dice entre les trigrammes de la saisie et ceux de chaque entrée."""
+        query_grams = trigrams(normalize_text(query))
+        grams = [self._gram_ids[g] for g in query_grams if g in self._gram_ids]
+        if not grams:
+            return np.zeros(len(self.keys))
+        postings = np.concatenate([self._postings[self._gram_starts[g]:self._gram_starts[g + 1]] for g in grams])
+        common = np.bincount(postings, minlength=len(self.keys))
+        return 2.0 * common / (len(query_grams) + self._n_grams)
+
+    def suggest(self, query, limit=SUGGESTION_LIMIT, min_score=MIN_FUZZY_SCORE):
+        """Meilleures suggestions pour la saisie : numéro exact, puis préfixes, puis approchées.
+
+        À pertinence égale, les entrées ayant le plus de mouvements passent en premier.
+        """
+        columns = [self.key_col, self.label_col, 'Nb_mouvements', 'Pertinence']
+        text = normalize_text(query)
+        if not text or not len(self.keys):
+            return pd.DataFrame(columns=columns)
+
+        score = self.fuzzy_scores(query)
+        score[score < min_score] = 0.0
+        prefix = self.prefix_matches(query)
+        # Préfixes avant approchées, départagés entre eux par la similarité
+        score[prefix] += 1.0
+        exact = self._code_of.get(text)
+        if exact is not None:
+            score[exact] = 3.0
+
+        candidates = np.flatnonzero(score > 0)
+        order = np.lexsort((-self.counts[candidates], -score[candidates]))[:limit]
+        best = candidates[order]
+        return pd.DataFrame({
+            self.key_col: self.keys[best],
+            self.label_col: self.labels[best],
+            'Nb_mouvements': self.counts[best],
+            'Pertinence': np.round(np.minimum(score[best], 1.0), 2),
+        })
+
+
+def build_search_index(df, key_col, label_col):
+    """Construit le SearchIndex des entités de `key_col` (libellé : premier nom rencontré)."""
+    index = key_index(df, key_col)
+    codes = index.codes
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(index))
+    if label_col in df.columns:
+        first = pd.Series(df[label_col].to_numpy()[valid]).groupby(codes[valid]).first()
+        labels = first.reindex(np.arange(len(index))).to_numpy(dtype=object)
+    else:
+        labels = np.full(len(index), None, dtype=object)
+    return SearchIndex(index.keys.to_numpy(dtype=object), labels, counts, key_col, label_col)
+
+
+def search_index(df, key_col, label_col):
+    """SearchIndex mémorisé pour ce DataFrame (construit une seule fois par jeu de données)."""
+    return frame_memo(df, ('search_index', key_col, label_col),
+                      lambda: build_search_index(df, key_col, label_col))
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from factoring.balances import OPENING_LABEL
+from factoring.cache import CACHE_DIR
+from factoring.schema import DATE_COLUMNS, normalize_ledger
+from factoring.search import SearchIndex
+from factoring.totals import GROUPINGS, LedgerTotals, ledger_columns
+
+
+# Répertoire des bases SQLite (une par feuille ingérée), surchargeable par variable d'environnement
+STORE_DIR = os.environ.get("FACTORING_STORE_DIR", os.path.join(os.path.dirname(CACHE_DIR), "store"))
+
+# Colonnes indexées quand elles existent : adhérent, tiré, date et rubrique
+INDEX_ROLES = ['client_id', 'debtor_id', 'date', 'rubrique']
+
+_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_type(s):
+    if pd.api.types.is_integer_dtype(s):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(s):
+        return 'REAL'
+    return 'TEXT'
+
+
+def _sql_values(df):
+    """Lignes du bloc en valeurs Python acceptées par SQLite (dates en texte ISO, NaN -> NULL)."""
+    columns = []
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            values = s.dt.strftime(_DATE_FORMAT).to_numpy(dtype=object)
+        else:
+            values = s.to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        columns.append(values.tolist())
+    return list(zip(*columns))
+
+
+class LedgerStore:
+    """Grand livre conservé dans une base SQLite locale plutôt qu'en mémoire.
+
+    L'ingestion se fait bloc par bloc et les agrégats des pages (adhérents, tirés,
+    rubriques, transactions, mois) sont calculés par des GROUP BY SQL : seule la
+    taille des résultats compte en mémoire, pas celle du grand livre. Les lignes
+    d'un adhérent ou d'un tiré sont relues via les index et renvoyées normalisées.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Streamlit exécute les reruns dans des threads différents : connexion partagée protégée par un verrou
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._memo = {}
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def query(self, sql, params=()):
+        """Résultat d'une requête SQL sous forme de DataFrame."""
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    @property
+    def complete(self):
+        """Vrai si une ingestion est allée à son terme dans ce fichier."""
+        tables = {row[0] for row in self._execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        return 'meta' in tables and bool(self._execute("SELECT 1 FROM meta WHERE key = 'complete'"))
+
+    def ingest(self, chunks):
+        """Remplace le grand livre par les blocs `chunks` (DataFrames bruts, normalisés ici)."""
+        conn = self._conn
+        with self._lock:
+            conn.execute("DROP TABLE IF EXISTS ledger")
+            conn.execute("DROP TABLE IF EXISTS meta")
+            columns = None
+            for chunk in chunks:
+                chunk = normalize_ledger(chunk)
+                if columns is None:
+                    columns = list(chunk.columns)
+                    conn.execute("CREATE TABLE ledger ({})".format(
+                        ", ".join(f"{_quote(col)} {_sql_type(chunk[col])}" for col in columns)))
+                chunk = chunk.reindex(columns=columns)
+                conn.executemany("INSERT INTO ledger VALUES ({})".format(", ".join("?" * len(columns))),
+                                 _sql_values(chunk))
+            if columns is None:
+                raise ValueError("Feuille vide : aucune ligne à stocker.")
+
+            # Index créés après le chargement (plus rapide que de les maintenir ligne à ligne)
+            roles = ledger_columns(pd.DataFrame(columns=columns))
+            for role in INDEX_ROLES:
+                if role in roles:
+                    conn.execute(f"CREATE INDEX {_quote('idx_' + role)} ON ledger ({_quote(roles[role])})")
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("INSERT INTO meta VALUES ('complete', '1')")
+            conn.commit()
+        self._memo.clear()
+
+    @property
+    def columns(self):
+        return [row[1] for row in self._execute("PRAGMA table_info(ledger)")]
+
+    @property
+    def roles(self):
+        """Rôle -> colonne pour le format du grand livre stocké."""
+        return ledger_columns(pd.DataFrame(columns=self.columns))
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM ledger")[0][0]
+
+    def _from_sql(self, df):
+        """Repasse un résultat SQL aux types canoniques (dates, montants, catégories)."""
+        for col in DATE_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format=_DATE_FORMAT, errors='coerce').astype('datetime64[ns]')
+        return normalize_ledger(df)
+
+    def head(self, n=1000):
+        """Premières lignes du grand livre."""
+        return self._from_sql(self.query(f"SELECT * FROM ledger LIMIT {int(n)}"))
+
+    def rows(self, column, keys):
+        """Lignes dont `column` vaut l'une des clés `keys` (recherche par index)."""
+        keys = [str(k).strip() for k in ([keys] if isinstance(keys, str) or np.isscalar(keys) else keys)]
+        if not keys:
+            return self.head(0)
+        placeholders = ", ".join("?" * len(keys))
+        return self._from_sql(self.query(
+            f"SELECT * FROM ledger WHERE {_quote(column)} IN ({placeholders}) ORDER BY rowid", keys))
+
+    def overview(self):
+        """Nombre d'adhérents et de lignes, totaux DR et CR."""
+        roles = self.roles
+        row = self._execute(
+            f"SELECT COUNT(DISTINCT {_quote(roles['client_id'])}), COUNT(*), "
+            f"TOTAL({_quote(roles['dr'])}), TOTAL({_quote(roles['cr'])}) FROM ledger")[0]
+        return dict(zip(['clients', 'rows', 'dr', 'cr'], row))
+
+    def totals(self):
+        """LedgerTotals calculé par des GROUP BY SQL (mêmes tables qu'en mémoire)."""
+        if 'totals' not in self._memo:
+            roles = self.roles
+            dr = f"TOTAL({_quote(roles['dr'])})" if 'dr' in roles else "0.0"
+            cr = f"TOTAL({_quote(roles['cr'])})" if 'cr' in roles else "0.0"
+            tables = {}
+            for name, group_roles in GROUPINGS.items():
+                if all(role in roles for role in group_roles):
+                    keys = ", ".join(_quote(roles[role]) for role in group_roles)
+                    not_null = " AND ".join(f"{_quote(roles[role])} IS NOT NULL" for role in group_roles)
+                    tables[name] = self.query(
+                        f"SELECT {keys}, COUNT(*) AS Nombre, {dr} AS Total_DR, {cr} AS Total_CR "
+                        f"FROM ledger WHERE {not_null} GROUP BY {keys} ORDER BY {keys}")
+            self._memo['totals'] = LedgerTotals(tables, roles)
+        return self._memo['totals']
+
+    def monthly_totals(self, min_year=2000, max_year=2100):
+        """Nombre de lignes et totaux DR/CR par mois (dates hors [min_year, max_year] exclues)."""
+        roles = self.roles
+        date = _quote(roles['date'])
+        out = self.query(
+            f"SELECT substr({date}, 1, 7) AS YearMonth, COUNT(*) AS Nombre_transactions, "
+            f"TOTAL({_quote(roles['dr'])}) AS Total_DR, TOTAL({_quote(roles['cr'])}) AS Total_CR "
+            f"FROM ledger WHERE {date} IS NOT NULL AND CAST(substr({date}, 1, 4) AS INTEGER) BETWEEN ? AND ? "
+            f"GROUP BY YearMonth ORDER BY YearMonth", (min_year, max_year))
+        out['YearMonth'] = pd.to_datetime(out['YearMonth'], format='%Y-%m')
+        return out
+
+    def _not_opening(self):
+        roles = self.roles
+        if 'transaction' not in roles:
+            return "1"
+        return f"instr(COALESCE({_quote(roles['transaction'])}, ''), '{OPENING_LABEL}') = 0"
+
+    def distinct_count(self, column):
+        return self._execute(f"SELECT COUNT(DISTINCT {_quote(column)}) FROM ledger")[0][0]
+
+    def shared_debtors(self, min_clients=2):
+        """Tirés communs à au moins `min_clients` adhérents (même tableau que ExposureGraph)."""
+        r = {role: _quote(col) for role, col in self.roles.items()}
+        return self.query(
+            f"SELECT {r['debtor_id']} AS \"Debtor Number\", MIN({r['debtor_name']}) AS TIRES, "
+            f"COUNT(DISTINCT {r['client_id']}) AS Nb_adherents, COUNT(*) AS Nb_mouvements, "
+            f"TOTAL({r['dr']}) + TOTAL({r['cr']}) AS Volume_DR_CR FROM ledger "
+            f"WHERE {r['client_id']} IS NOT NULL AND {r['debtor_id']} IS NOT NULL AND {self._not_opening()} "
+            f"GROUP BY {r['debtor_id']} HAVING Nb_adherents >= ? "
+            f"ORDER BY Nb_adherents DESC, Volume_DR_CR DESC", (min_clients,))
+
+    def related_debtors(self, debtor_key):
+        """Tirés partageant au moins un adhérent avec `debtor_key` (même tableau que ExposureGraph)."""
+        r = {role: _quote(col) for role, col in self.roles.items()}
+        key = str(debtor_key).strip()
+        return self.query(
+            f"SELECT {r['debtor_id']} AS \"Debtor Number\", MIN({r['debtor_name']}) AS TIRES, "
+            f"COUNT(DISTINCT {r['client_id']}) AS Nb_adherents_communs, "
+            f"TOTAL({r['dr']}) + TOTAL({r['cr']}) AS Volume_DR_CR FROM ledger "
+            f"WHERE {r['client_id']} IN (SELECT {r['client_id']} FROM ledger "
+            f"WHERE {r['debtor_id']} = ? AND {self._not_opening()}) "
+            f"AND {r['debtor_id']} IS NOT NULL AND {r['debtor_id']} <> ? AND {self._not_opening()} "
+            f"GROUP BY {r['debtor_id']} ORDER BY Nb_adherents_communs DESC, Volume_DR_CR DESC", (key, key))
+
+    def search_index(self, key_col, label_col):
+        """SearchIndex des entités de `key_col`, construit à partir d'un GROUP BY."""
+        memo_key = ('search_index', key_col, label_col)
+        if memo_key not in self._memo:
+            table = self.query(
+                f"SELECT {_quote(key_col)} AS k, MIN({_quote(label_col)}) AS label, COUNT(*) AS n "
+                f"FROM ledger WHERE {_quote(key_col)} IS NOT NULL GROUP BY {_quote(key_col)}")
+            keys = table['k'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
+            self._memo[memo_key] = SearchIndex(keys.to_numpy(dtype=object), table['label'].to_numpy(dtype=object),
+                                               table['n'].to_numpy(), key_col, label_col)
+        return self._memo[memo_key]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(key, chunks=None):
+    """Base du grand livre identifié par `key` (clé du cache), alimentée par `chunks` si elle est incomplète."""
+    os.makedirs(STORE_DIR, exist_ok=True)
+    store = LedgerStore(os.path.join(STORE_DIR, f"{key}.sqlite"))
+    if not store.complete:
+        if chunks is None:
+            store.close()
+            return None
+        store.ingest(chunks)
+    return store
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+from factoring.indexes import normalize_key
+from factoring.schema import normalize_ledger
+from factoring.totals import GROUPINGS, LedgerTotals, build_ledger_totals, ledger_columns
+
+
+# Précision des compteurs HyperLogLog : 2**12 registres (4 Ko par compteur), erreur type d'environ 1,6 %
+HLL_PRECISION = 12
+
+# Regroupements tenus en mode agrégats : pas de tables de couples, trop grosses sur des millions de lignes
+STREAM_GROUPINGS = ['clients', 'rubriques', 'transactions']
+
+# Tables de couples remplacées par un compteur d'adhérents distincts par groupe du regroupement indiqué
+DISTINCT_SKETCHES = {'rubrique_clients': 'rubriques', 'transaction_clients': 'transactions'}
+
+# Lignes conservées pour l'aperçu de la base
+PREVIEW_ROWS = 1000
+
+_POWERS = np.left_shift(np.uint64(1), np.arange(64, dtype=np.uint64))
+
+
+def hash_keys(s):
+    """Empreintes 64 bits des clés, calculées sur le texte normalisé (même clé d'un bloc à l'autre)."""
+    return pd.util.hash_array(normalize_key(s).to_numpy(dtype=object))
+
+
+def _registers(groups, n_groups, hashes, precision):
+    """Registres HyperLogLog (n_groups x 2**precision) des empreintes `hashes` réparties par `groups`."""
+    slots = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    # Bit de garde : le rang est borné même si les bits restants sont tous nuls
+    rest = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    # Rang du premier bit à 1 (zéros de tête + 1), par comparaison exacte aux puissances de deux
+    ranks = (65 - np.searchsorted(_POWERS, rest, side='right')).astype(np.uint8)
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    np.maximum.at(registers, (groups, slots), ranks)
+    return registers
+
+
+def estimate(registers):
+    """Nombre de valeurs distinctes estimé pour chaque ligne de registres (correction des petits effectifs)."""
+    registers = np.atleast_2d(registers)
+    m = registers.shape[1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    # Peu de valeurs : le comptage linéaire des registres vides est plus précis
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.rint(np.where(small, linear, raw)).astype(np.int64)
+
+
+class HyperLogLog:
+    """Compteur approché de valeurs distinctes, de taille fixe et fusionnable (maximum des registres)."""
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, hashes):
+        if len(hashes):
+            groups = np.zeros(len(hashes), dtype=np.int64)
+            np.maximum(self.registers, _registers(groups, 1, hashes, self.precision)[0], out=self.registers)
+
+    def update(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        return int(estimate(self.registers)[0])
+
+
+class ApproxTotals(LedgerTotals):
+    """LedgerTotals dont les adhérents distincts par rubrique ou par transaction sont estimés.
+
+    `sketches` associe à un nom de table de couples (voir DISTINCT_SKETCHES) les
+    registres HyperLogLog de chaque groupe : `summary` s'utilise comme en mémoire.
+    """
+
+    def __init__(self, tables, columns, sketches):
+        super().__init__(tables, columns)
+        self.sketches = sketches
+
+    def distinct(self, name, by, of):
+        if name not in self.sketches:
+            return super().distinct(name, by, of)
+        sketch = self.sketches[name]
+        if not sketch:
+            return pd.Series([], dtype='int64', index=pd.Index([], name=by[0]))
+        return pd.Series(estimate(np.vstack(list(sketch.values()))), index=pd.Index(list(sketch), name=by[0]))
+
+
+class StreamAggregates:
+    """Agrégats partiels d'un grand livre lu bloc par bloc, sans conserver les lignes.
+
+    Chaque bloc est résumé en sommes et nombres (vue d'ensemble, adhérents,
+    rubriques, transactions), en compteurs HyperLogLog d'adhérents distincts et en
+    cumuls mensuels, puis fusionné avec les agrégats déjà tenus. La mémoire dépend
+    du nombre de groupes et de mois, pas du nombre de lignes ; seul un aperçu des
+    premières lignes est gardé. Deux agrégats partiels se fusionnent avec `merge`.
+    """
+
+    def __init__(self, base_type=None, precision=HLL_PRECISION, preview_rows=PREVIEW_ROWS):
+        self.base_type = base_type
+        self.precision = precision
+        self.preview_rows = preview_rows
+        self.columns = None
+        self.roles = None
+        self.preview = None
+        self.rows = 0
+        self.dr = 0.0
+        self.cr = 0.0
+        self.clients = HyperLogLog(precision)
+        self.sketches = {name: {} for name in DISTINCT_SKETCHES}
+        self._totals = None
+        self._months = None
+
+    def __len__(self):
+        return self.rows
+
+    def _summarize(self, chunk):
+        """Agrégats partiels d'un seul bloc déjà normalisé."""
+        self.columns = list(chunk.columns)
+        self.roles = roles = ledger_columns(chunk, self.base_type)
+        self.preview = chunk.head(self.preview_rows)
+        self.rows = len(chunk)
+        self.dr = float(chunk[roles['dr']].sum()) if 'dr' in roles else 0.0
+        self.cr = float(chunk[roles['cr']].sum()) if 'cr' in roles else 0.0
+        self._totals = build_ledger_totals(chunk, columns=roles, groupings=STREAM_GROUPINGS)
+
+        if 'client_id' in roles:
+            clients = chunk[roles['client_id']]
+            self.clients.add(hash_keys(clients[clients.notna()]))
+            for name, grouping in DISTINCT_SKETCHES.items():
+                role = GROUPINGS[grouping][0]
+                if role not in roles:
+                    continue
+                valid = clients.notna() & chunk[roles[role]].notna()
+                codes, uniques = pd.factorize(chunk.loc[valid, roles[role]])
+                registers = _registers(codes, len(uniques), hash_keys(clients[valid]), self.precision)
+                self.sketches[name] = dict(zip(uniques, registers))
+
+        if 'date' in roles:
+            dates = chunk[roles['date']]
+            valid = dates.notna()
+            months = pd.DataFrame({
+                'YearMonth': dates[valid].dt.to_period('M').dt.to_timestamp(),
+                'Nombre_transactions': 1,
+                'Total_DR': chunk.loc[valid, roles['dr']].to_numpy(dtype=np.float64) if 'dr' in roles else 0.0,
+                'Total_CR': chunk.loc[valid, roles['cr']].to_numpy(dtype=np.float64) if 'cr' in roles else 0.0,
+            })
+            self._months = months.groupby('YearMonth', as_index=False).sum()
+
+    def add(self, chunk):
+        """Intègre un bloc brut de lignes (normalisé ici)."""
+        partial = StreamAggregates(self.base_type, self.precision, self.preview_rows)
+        partial._summarize(normalize_ledger(chunk))
+        self.merge(partial)
+
+    def merge(self, other):
+        """Fusionne les agrégats partiels `other` (blocs suivants ou autre lecteur)."""
+        if other.columns is None:
+            return
+        if self.columns is None:
+            self.columns, self.roles = other.columns, other.roles
+            self.preview, self._totals, self._months = other.preview, other._totals, other._months
+        else:
+            if len(self.preview) < self.preview_rows:
+                self.preview = pd.concat([self.preview, other.preview.head(self.preview_rows - len(self.preview))],
+                                         ignore_index=True)
+            self._totals = self._totals.merged(other._totals)
+            if other._months is not None:
+                self._months = (pd.concat([self._months, other._months], ignore_index=True)
+                                .groupby('YearMonth', as_index=False).sum())
+        self.rows += other.rows
+        self.dr += other.dr
+        self.cr += other.cr
+        self.clients.update(other.clients)
+        for name, sketch in other.sketches.items():
+            mine = self.sketches[name]
+            for key, registers in sketch.items():
+                mine[key] = np.maximum(mine[key], registers) if key in mine else registers
+
+    def head(self, n=PREVIEW_ROWS):
+        """Premières lignes lues (au plus `preview_rows`)."""
+        return self.preview.head(n)
+
+    def overview(self):
+        """Nombre d'adhérents (estimé) et de lignes, totaux DR et CR."""
+        return {'clients': self.clients.count(), 'rows': self.rows, 'dr': self.dr, 'cr': self.cr}
+
+    def totals(self):
+        """Tables d'agrégats par adhérent, rubrique et transaction, adhérents distincts estimés."""
+        return ApproxTotals(self._totals.tables, self.roles, self.sketches)
+
+    def monthly_totals(self, min_year=2000, max_year=2100):
+        """Nombre de lignes et totaux DR/CR par mois (dates hors [min_year, max_year] exclues)."""
+        if self._months is None:
+            return pd.DataFrame(columns=['YearMonth', 'Nombre_transactions', 'Total_DR', 'Total_CR'])
+        years = self._months['YearMonth'].dt.year
+        return self._months[(years >= min_year) & (years <= max_year)].reset_index(drop=True)
+
+
+def aggregate_chunks(chunks, base_type=None):
+    """Lit les blocs `chunks` (DataFrames bruts) et n'en garde que les agrégats partiels fusionnés."""
+    aggregates = StreamAggregates(base_type)
+    for chunk in chunks:
+        aggregates.add(chunk)
+    if aggregates.columns is None:
+        raise ValueError("Feuille vide : aucune ligne à agréger.")
+    return aggregates
@@ -0,0 +1,141 @@
+"""Grands livres de factoring synthétiques, aux formats original (base1) et alternatif (base2).
+
+Les DataFrames produits ressemblent à ce que renvoie la lecture d'un classeur,
+avant normalisation : identifiants numériques, dates de formats mélangés (dates,
+textes jour/mois/année, numéros de série Excel), lignes « Solde Ouverture ».
+"""
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from factoring.balances import OPENING_LABEL
+
+
+# Bornes du nombre de lignes générées
+MIN_ROWS = 10_000
+MAX_ROWS = 10_000_000
+
+# Part des dates de chaque format : objets date, textes « jj/mm/aaaa », numéros de série Excel
+DATE_FORMAT_SHARES = {'datetime': 0.6, 'text': 0.3, 'serial': 0.1}
+
+# Libellés des mouvements ordinaires : (transaction, RUB / rubrique, sens)
+MOVEMENTS = [
+    ("Remise de factures", 'FAC', 'DR'),
+    ("Avoir", 'AV', 'CR'),
+    ("Règlement tiré", 'REG', 'CR'),
+    ("Financement", 'FIN', 'DR'),
+    ("Commission de factoring", 'COM', 'DR'),
+    ("Impayé", 'IMP', 'DR'),
+    ("Rétrocession", 'RET', 'CR'),
+]
+
+EXCEL_EPOCH = np.datetime64('1899-12-30')
+
+
+def zipf_weights(n, skew):
+    """Poids décroissants 1 / rang^skew : quelques gros adhérents, une longue traîne de petits."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _mixed_dates(days, rng, shares=DATE_FORMAT_SHARES):
+    """Colonne objet de dates (datetime64[D]) dans des formats mélangés, comme une feuille saisie à la main."""
+    kinds = rng.choice(len(shares), size=len(days), p=np.array(list(shares.values())) / sum(shares.values()))
+    names = list(shares)
+    out = np.empty(len(days), dtype=object)
+    stamps = pd.DatetimeIndex(days)
+    for i, name in enumerate(names):
+        mask = kinds == i
+        if not mask.any():
+            continue
+        if name == 'datetime':
+            out[mask] = stamps[mask].to_pydatetime()
+        elif name == 'text':
+            out[mask] = np.asarray(stamps[mask].strftime('%d/%m/%Y'), dtype=object)
+        else:
+            out[mask] = (days[mask] - EXCEL_EPOCH).astype(np.int64)
+    return out
+
+
+def synthetic_ledger(rows, base_type='original', clients=None, debtors=None, skew=1.1, opening_share=0.02,
+                     start='2024-01-01', months=12, seed=0):
+    """Grand livre brut de `rows` lignes au format `base_type` ('original' ou 'alternative').
+
+    Adhérents et tirés suivent une loi de Zipf de paramètre `skew` ; chaque
+    adhérent travaille avec un sous-ensemble de tirés voisins. Une part
+    `opening_share` des lignes sont des soldes d'ouverture datés du premier jour.
+    """
+    if not MIN_ROWS <= rows <= MAX_ROWS:
+        low, high, count = (f"{n:,}".replace(",", " ") for n in (MIN_ROWS, MAX_ROWS, rows))
+        raise ValueError(f"Nombre de lignes hors de [{low}, {high}] : {count}")
+    if base_type not in ('original', 'alternative'):
+        raise ValueError(f"Format inconnu : {base_type}")
+    rng = np.random.default_rng(seed)
+    n_clients = clients or max(20, rows // 2_000)
+    n_debtors = debtors or max(50, rows // 200)
+
+    client = rng.choice(n_clients, size=rows, p=zipf_weights(n_clients, skew))
+    # Tirés d'un adhérent : voisinage de son rang, concentré sur quelques tirés
+    offset = rng.choice(min(n_debtors, 500), size=rows, p=zipf_weights(min(n_debtors, 500), skew))
+    debtor = (client * 37 + offset) % n_debtors
+
+    opening = rng.random(rows) < opening_share
+    movement = rng.integers(0, len(MOVEMENTS), size=rows)
+    side = np.array([m[2] for m in MOVEMENTS])[movement]
+    amount = np.round(rng.lognormal(mean=8.5, sigma=1.4, size=rows), 3)
+    dr = np.where(opening | (side == 'DR'), amount, 0.0)
+    cr = np.where(~opening & (side == 'CR'), amount, 0.0)
+
+    start = np.datetime64(start, 'D')
+    span = (np.datetime64(pd.Timestamp(start) + pd.DateOffset(months=months), 'D') - start).astype(np.int64)
+    days = start + np.where(opening, 0, rng.integers(0, span, size=rows)).astype('timedelta64[D]')
+    order = np.argsort(days, kind='stable')
+
+    transaction = np.where(opening, OPENING_LABEL, np.array([m[0] for m in MOVEMENTS], dtype=object)[movement])
+    rub = np.where(opening, 'SO', np.array([m[1] for m in MOVEMENTS], dtype=object)[movement])
+    client_no = 100_000 + client
+    client_name = np.array([f"ADHERENT {i:05d} SARL" for i in range(n_clients)], dtype=object)[client]
+
+    if base_type == 'original':
+        columns = {
+            'Client Number': client_no,
+            'Legal Client Name': client_name,
+            'Debtor Number': 500_000 + debtor,
+            'TIRES': np.array([f"TIRE {j:06d}" for j in range(n_debtors)], dtype=object)[debtor],
+            'EntryDate': _mixed_dates(days, rng),
+            'Transaction': transaction,
+            'RUB': rub,
+            'EntryAmount': dr,
+            'EntryAmountSAC': cr,
+            'solde': dr - cr,
+            'Transaction Id': np.arange(1, rows + 1),
+        }
+    else:
+        columns = {
+            'Client Number': client_no,
+            'Legal Client Name': client_name,
+            'EntryDate': _mixed_dates(days, rng),
+            'TRANSACTION': transaction,
+            'Rubrique': rub,
+            'MVT': np.where(dr > 0, 'D', 'C').astype(object),
+            'Entry Amount': dr,
+            'Entry Amount SAC': cr,
+            'Solde': dr - cr,
+            'ledger item id': np.arange(1, rows + 1),
+            'Transaction Id': np.arange(1, rows + 1),
+        }
+    # Ordre chronologique, comme un extrait du système comptable
+    return pd.DataFrame({name: values[order] for name, values in columns.items()})
+
+
+def write_ledger_workbook(df, path, header_row=5, sheet_name="Grand livre"):
+    """Écrit `df` dans un classeur, entête à la ligne `header_row` sous quelques lignes de titre."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    for i in range(1, header_row):
+        ws.append(["Extrait du grand livre" if i == 1 else None])
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        ws.append([value.item() if isinstance(value, np.generic) else value for value in row])
+    wb.save(path)
+    return path
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+
+from factoring.indexes import frame_memo
+from factoring.schema import canonical_columns
+
+
+# Regroupements tenus à jour : rôles des colonnes clés (voir CANONICAL_COLUMNS)
+GROUPINGS = {
+    'clients': ['client_id', 'client_name'],
+    'debtors': ['debtor_name', 'debtor_id'],
+    'rubriques': ['rubrique'],
+    'client_tires': ['client_id', 'client_name', 'debtor_name'],
+    'debtor_clients': ['debtor_name', 'debtor_id', 'client_name'],
+    'rubrique_clients': ['rubrique', 'client_id'],
+    'transactions': ['transaction'],
+    'transaction_clients': ['transaction', 'client_id'],
+}
+
+TOTAL_COLUMNS = ['Nombre', 'Total_DR', 'Total_CR']
+
+
+def _group_totals(df, keys, dr_col, cr_col):
+    """Nombre de lignes et sommes DR/CR par valeur de `keys` (clés manquantes exclues)."""
+    data = df[keys].copy()
+    data['Nombre'] = 1
+    data['Total_DR'] = df[dr_col].to_numpy(dtype=np.float64) if dr_col else 0.0
+    data['Total_CR'] = df[cr_col].to_numpy(dtype=np.float64) if cr_col else 0.0
+    return data.groupby(keys, observed=True).sum().reset_index()
+
+
+class LedgerTotals:
+    """Agrégats additifs (nombre, DR, CR) par adhérent, tiré, rubrique et couples.
+
+    Chaque table ne contient qu'une ligne par groupe : fusionner les totaux d'un
+    extrait complémentaire coûte la taille du delta et du nombre de groupes, sans
+    relire l'historique. Les comptes de valeurs distinctes se déduisent des tables
+    de couples (par exemple les tirés distincts d'un adhérent).
+    """
+
+    def __init__(self, tables, columns):
+        self.tables = tables
+        self.columns = columns
+
+    def __contains__(self, name):
+        return name in self.tables
+
+    def table(self, name):
+        """Table d'agrégats `name` : colonnes clés puis Nombre, Total_DR, Total_CR."""
+        return self.tables[name]
+
+    def distinct(self, name, by, of):
+        """Nombre de valeurs distinctes de la colonne `of` par groupe `by`, dans la table `name`."""
+        pairs = self.tables[name][by + [of]].drop_duplicates()
+        return pairs.groupby(by, observed=True).size()
+
+    def summary(self, name, **distinct):
+        """Table `name` complétée de comptes distincts : colonne=(table de couples, colonne comptée)."""
+        out = self.tables[name]
+        keys = [col for col in out.columns if col not in TOTAL_COLUMNS]
+        for col, (pairs, of) in distinct.items():
+            counts = self.distinct(pairs, keys, of).rename(col).reset_index()
+            out = out.merge(counts, on=keys, how='left')
+            out[col] = out[col].fillna(0).astype('int64')
+        return out
+
+    def merged(self, other):
+        """Somme table à table avec les totaux `other` (mêmes regroupements)."""
+        tables = {}
+        for name, table in self.tables.items():
+            keys = [col for col in table.columns if col not in TOTAL_COLUMNS]
+            # Une seule ligne par groupe : fusion proportionnelle au nombre de groupes
+            tables[name] = (pd.concat([table, other.tables[name]], ignore_index=True)
+                            .groupby(keys, observed=True).sum().reset_index())
+        return LedgerTotals(tables, self.columns)
+
+    def updated(self, delta):
+        """Nouveaux totaux après ajout des lignes `delta` (mêmes colonnes que le grand livre)."""
+        return self.merged(build_ledger_totals(delta, columns=self.columns, groupings=list(self.tables)))
+
+
+def ledger_columns(df, base_type=None):
+    """Rôle -> colonne pour le format détecté (colonnes absentes ignorées)."""
+    if base_type is None:
+        base_type = 'alternative' if 'Rubrique' in df.columns else 'original'
+    return canonical_columns(df, base_type)
+
+
+def build_ledger_totals(df, base_type=None, columns=None, groupings=None):
+    """Calcule les tables d'agrégats du grand livre (toutes par défaut) en une passe par regroupement."""
+    columns = columns or ledger_columns(df, base_type)
+    tables = {}
+    for name in groupings or GROUPINGS:
+        roles = GROUPINGS[name]
+        if all(role in columns for role in roles):
+            keys = [columns[role] for role in roles]
+            tables[name] = _group_totals(df, keys, columns.get('dr'), columns.get('cr'))
+    return LedgerTotals(tables, columns)
+
+
+def ledger_totals(df, base_type=None):
+    """LedgerTotals mémorisé pour ce DataFrame (construit une seule fois par jeu de données)."""
+    return frame_memo(df, ('ledger_totals', base_type), lambda: build_ledger_totals(df, base_type))
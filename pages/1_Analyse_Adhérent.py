@@ -1,23 +1,40 @@
+import tempfile
+import time
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib.ticker as mticker
+import numpy as np
+
+from factoring.batch import entity_ids, run_batch, timing_table, zip_reports
+from factoring.charts import (CHART_TOP_N, balance_evolution_figure, chart_page_input, monthly_movements_figure,
+                              rub_figure, show_figure, tires_figure)
+from factoring.concentration import CONCENTRATION_THRESHOLD, debtor_concentration, share_flags
+from factoring.display import rounded, show_table
+from factoring.grid import paged_dataframe
+from factoring.indexes import key_index
+from factoring.profiling import page_profiler, profiling_panel
+from factoring.reports import client_summary, month_labels, monthly_balance_table, rub_table
+from factoring.search import search_index
+from factoring.totals import ledger_totals
 
 st.title("Analyse par Adhérent")
 
-mois_fr = {
-    'January':'janvier','February':'février','March':'mars','April':'avril',
-    'May':'mai','June':'juin','July':'juillet','August':'août',
-    'September':'septembre','October':'octobre','November':'novembre','December':'décembre'
-}
+# Mesure optionnelle de chaque section (interrupteur dans la barre latérale)
+profiler = page_profiler("Analyse par Adhérent")
 
 # Vérifier que les données sont disponibles
-if 'df' not in st.session_state or st.session_state.df is None:
-    st.warning("Veuillez charger un fichier depuis la page d'accueil.")
+if st.session_state.get('df') is None and st.session_state.get('store') is None:
+    if st.session_state.get('aggregates') is not None:
+        st.warning("Mode agrégats : les lignes ne sont pas conservées, seule l'analyse générale est disponible.")
+    else:
+        st.warning("Veuillez charger un fichier depuis la page d'accueil.")
     st.stop()
 
 df = st.session_state.df  # Récupérer le DataFrame chargé
+# Mode base locale : seules les lignes de l'adhérent choisi sont chargées (df vide jusque-là, pour les colonnes)
+store = st.session_state.get('store')
+if store is not None:
+    df = store.head(0)
 
 
 # Initialiser la variable
@@ -35,16 +52,62 @@ if st.session_state.df is not None:
 if 'Client Number' in df.columns and 'Legal Client Name' in df.columns and 'TIRES' in df.columns:
 # Tableau résumé clients avant saisie
     st.subheader("Liste des adhérents")
+    profiler.lap("Liste des adhérents : agrégats")
+    # Agrégats par adhérent tenus à jour lors des ajouts d'extraits (voir factoring.totals)
     clients_summary = (
-        df.groupby(['Client Number', 'Legal Client Name'])
-        .agg(
-            Nb_mouvements=('Client Number', 'size'),
-            Nb_Tires_Uniques=('TIRES', 'nunique')
-        )
-        .reset_index()
+        (store.totals() if store is not None else ledger_totals(df))
+        .summary('clients', Nb_Tires_Uniques=('client_tires', 'TIRES'))
+        .rename(columns={'Nombre': 'Nb_mouvements'})
+        [['Client Number', 'Legal Client Name', 'Nb_mouvements', 'Nb_Tires_Uniques']]
         .sort_values(by='Nb_mouvements', ascending=False)
     )
+    profiler.lap("Liste des adhérents : affichage")
     st.dataframe(clients_summary, use_container_width=True, hide_index=True)
+    profiler.finish()
+
+    # Concentration des tirés sur tout le portefeuille (une seule passe groupée, calculée à la demande)
+    if store is None and 'EntryAmount' in df.columns and 'Debtor Number' in df.columns and \
+            st.toggle("Afficher la concentration des tirés sur tout le portefeuille"):
+        profiler.lap("Concentration : calcul")
+        concentration = debtor_concentration(df)
+        profiler.lap("Concentration : affichage")
+        st.markdown("**Indice de concentration (HHI, 0 à 10 000) par adhérent**")
+        st.dataframe(concentration.clients, use_container_width=True, hide_index=True)
+
+        threshold = st.number_input("Seuil de part d'un tiré (%)", min_value=0.0, max_value=100.0,
+                                    value=CONCENTRATION_THRESHOLD, step=5.0)
+        exceptions = concentration.exceptions(threshold)
+        st.markdown(f"**{len(exceptions)} couples adhérent / tiré au-dessus de {threshold:g} %**")
+        st.dataframe(exceptions, use_container_width=True, hide_index=True)
+        profiler.finish()
+
+    # Rapports de fin de mois : la page adhérent complète pour chaque adhérent, répartie sur les processeurs
+    if store is None and st.toggle("Générer les rapports de tous les adhérents"):
+        bulk_format = st.radio("Format", ['xlsx', 'pdf'], horizontal=True,
+                               format_func=lambda f: "Excel (un onglet par tableau)" if f == 'xlsx' else "PDF")
+        bulk_charts = bulk_format == 'xlsx' and st.checkbox("Joindre les graphiques (PNG)")
+        if st.button("Lancer la génération"):
+            profiler.lap("Rapports en lot")
+            keys = entity_ids(df, 'clients')
+            bar = st.progress(0.0, text=f"0 / {len(keys)} adhérents")
+            start = time.perf_counter()
+            with tempfile.TemporaryDirectory() as out_dir:
+                # 'spawn' : pas de fork du serveur Streamlit ; le grand livre est envoyé une fois par processus
+                results = run_batch(df, 'clients', keys, out_dir, bulk_format, bulk_charts, start_method='spawn',
+                                    progress=lambda done, total: bar.progress(done / total,
+                                                                              text=f"{done} / {total} adhérents"))
+                st.session_state.bulk_reports = zip_reports(out_dir)
+            st.session_state.bulk_timings = timing_table(results)
+            st.session_state.bulk_elapsed = time.perf_counter() - start
+            profiler.finish()
+
+        if st.session_state.get('bulk_reports') is not None:
+            timings = st.session_state.bulk_timings
+            st.success(f"{len(timings)} rapport(s) en {st.session_state.bulk_elapsed:.1f} s")
+            st.download_button("Télécharger les rapports (zip)", st.session_state.bulk_reports,
+                               file_name="rapports_adherents.zip", mime="application/zip")
+            st.markdown("**Durée par rapport (secondes)**")
+            st.dataframe(timings, use_container_width=True, hide_index=True)
 
     ###
     ###
@@ -52,6 +115,35 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns and 'TIRE
     #st.write("Colonnes lues :", df.columns.tolist())
 
 if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
+    # Recherche par nom ou numéro : quelques suggestions issues de l'index, sans parcourir la liste
+    def select_client():
+        choice = st.session_state.client_suggestion
+        if choice is not None:
+            st.session_state.client_input = choice
+            # Recréer le champ de saisie avec le numéro choisi
+            st.session_state.pop("client_input_box", None)
+
+    client_query = st.text_input("Rechercher un adhérent (nom ou début de numéro)", key="client_search")
+    if client_query.strip():
+        profiler.lap("Recherche : suggestions")
+        index = store.search_index('Client Number', 'Legal Client Name') if store is not None \
+            else search_index(df, 'Client Number', 'Legal Client Name')
+        suggestions = index.suggest(client_query)
+        if suggestions.empty:
+            st.caption("Aucun adhérent ne correspond à cette recherche.")
+        else:
+            names = dict(zip(suggestions['Client Number'], suggestions['Legal Client Name']))
+            st.selectbox(
+                "Suggestions",
+                list(names),
+                index=None,
+                format_func=lambda key: f"{key} — {names[key]}",
+                placeholder="Choisir un adhérent",
+                key="client_suggestion",
+                on_change=select_client
+            )
+        profiler.finish()
+
     # Saisie du numéro de client
     client_input = st.text_input(
         "Entrer le numéro d'adhérent",
@@ -64,14 +156,13 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
         
         client_input = st.session_state.client_input.strip()
         if client_input:
-            client_number_series = (
-                df['Client Number']
-                .astype(str)
-                .str.strip()
-                .str.replace(r'\.0$', '', regex=True)
-            )
-  
-            client_data = df[client_number_series == client_input]
+            profiler.lap("Adhérent : lignes")
+            if store is not None:
+                # Lignes de l'adhérent relues via l'index SQLite : la suite de la page travaille sur elles
+                df = store.rows('Client Number', client_input)
+            # Index numéro d'adhérent -> lignes, construit une seule fois pour le grand livre chargé
+            client_index = key_index(df, 'Client Number')
+            client_data = client_index.take(df, client_input)
             EntryAmount = client_data.get('EntryAmount', pd.Series(dtype='float'))
             EntryAmountSAC = client_data.get('EntryAmountSAC', pd.Series(dtype='float'))
 
@@ -84,51 +175,21 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
                 # Supprimer l'ancienne colonne d'index
                 client_data = client_data.reset_index(drop=True)
 
-                # Afficher sans l'index inutile
-                st.dataframe(client_data, use_container_width=True)
+                # Afficher sans l'index inutile, page par page (tri et filtre côté serveur)
+                profiler.lap("Adhérent : affichage des lignes")
+                paged_dataframe(client_data, "client_rows")
 ###
 
                 if 'EntryAmount' in client_data.columns:
-                    # Calculs principaux
-                    total_dr = client_data['EntryAmount'].sum()
-                    total_cr = client_data['EntryAmountSAC'].sum()
-                    total_tx = len(client_data)
-
-                    # Solde d'ouverture
-                    opening_balance = client_data.loc[
-                        client_data['Transaction'].str.contains("Solde Ouverture", na=False), 
-                        'EntryAmount'
-                    ].sum()
-
-                    # Solde final
-                    final_balance = client_data['solde'].sum()
-
-                    # Creation d'un tableau récapitulatif
-                    summary_table = pd.DataFrame({
-                        "Rubrique": [
-                            "Nombre de mouvements",
-                            "Solde d'ouverture",
-                            "Total Débits (DR)",
-                            "Total Crédits (CR)",
-                            "Solde final du client"
-                        ],
-                        "Valeur": [
-                            total_tx,
-                            opening_balance,
-                            total_dr,
-                            total_cr,
-                            final_balance
-                        ]
-                    })
-
-                    # Arrondir et formater comme Excel (espaces pour milliers)
-                    summary_table['Valeur'] = summary_table['Valeur'].round(0).astype(int).astype(str)
-                    summary_table['Valeur'] = summary_table['Valeur'].str.replace(r"(\d)(?=(\d{3})+$)", r"\1 ", regex=True)
-
-                    # Affichage dans Streamlit
+                    # Tableau récapitulatif : mouvements, solde d'ouverture, DR, CR et solde final
+                    profiler.lap("Résumé : calcul")
+                    summary_table = client_summary(client_data)
+
+                    # Affichage dans Streamlit, arrondi et espaces pour milliers comme Excel (valeurs gardées numériques)
                     st.markdown("---")
                     st.subheader("Résumé des mouvements")
-                    st.dataframe(summary_table, use_container_width=True, hide_index=True)
+                    profiler.lap("Résumé : affichage")
+                    show_table(summary_table, numbers=['Valeur'])
 
 
 
@@ -136,90 +197,15 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
                     # Création du tableau résumé mensuel
 
 
-                    # Séparation du solde d'ouverture
-                    opening_balance = 0
-                    if 'Transaction' in client_data.columns:
-                        opening_rows = client_data['Transaction'].str.contains("Solde Ouverture", na=False)
-                        opening_balance = client_data.loc[opening_rows, 'EntryAmount'].sum()
-                        client_data = client_data.loc[~opening_rows]  # Retirer les lignes de solde d'ouverture
-
-                    # Conversion et tri
-                    client_data['EntryDate'] = pd.to_datetime(client_data['EntryDate'], dayfirst=True, errors='coerce')
-                    client_data = client_data.dropna(subset=['EntryDate']).sort_values('EntryDate')
-                    client_data['YearMonth'] = client_data['EntryDate'].dt.to_period('M').dt.to_timestamp()
-
-                    # Période fixe: janvier à juin (2025)
-                    start_date = pd.Timestamp('2025-01-01')
-                    end_date = pd.Timestamp('2025-06-01')
-                    all_months = pd.date_range(start=start_date, end=end_date, freq='MS')
-                    base_months_df = pd.DataFrame({'YearMonth': all_months})
-
-                    # Regrouper les montants réels par mois
-                    grouped = (
-                        client_data.groupby('YearMonth')[['EntryAmount', 'EntryAmountSAC']].sum()
-                        .rename(columns={'EntryAmount': 'DR', 'EntryAmountSAC': 'CR'})
-                        .reset_index()
-                    )
-
-                    # Fusion avec les mois fixes
-                    monthly_summary = base_months_df.merge(grouped, on='YearMonth', how='left').fillna(0)
-
-                    # Calcul du solde du mois
-                    monthly_summary['SoldeMois'] = 0.0
-                    for i in range(len(monthly_summary)):
-                        if i == 0:
-                            monthly_summary.loc[i, 'SoldeMois'] = opening_balance + monthly_summary.loc[i, 'DR'] - monthly_summary.loc[i, 'CR']
-                        else:
-                            monthly_summary.loc[i, 'SoldeMois'] = (
-                                monthly_summary.loc[i - 1, 'SoldeMois']
-                                + monthly_summary.loc[i, 'DR']
-                                - monthly_summary.loc[i, 'CR']
-                            )
-
-                    # Calcul du Solde cumulé (DR+CR cumulés)
-                    monthly_summary['SoldeCumulatif'] = 0.0
-                    for i in range(len(monthly_summary)):
-                        if i == 0:
-                            monthly_summary.loc[i, 'SoldeCumulatif'] = opening_balance + monthly_summary.loc[i, 'DR'] + monthly_summary.loc[i, 'CR']
-                        else:
-                            monthly_summary.loc[i, 'SoldeCumulatif'] = (
-                                monthly_summary.loc[i - 1, 'SoldeCumulatif']
-                                + monthly_summary.loc[i, 'DR']
-                                + monthly_summary.loc[i, 'CR']
-                            )
-
-                    # Ajouter la colonne "Solde initial" (valeur de SoldeMois du mois précédent)
-                    monthly_summary['SoldeInitial'] = 0.0
-                    for i in range(1, len(monthly_summary)):
-                        monthly_summary.loc[i, 'SoldeInitial'] = monthly_summary.loc[i - 1, 'SoldeMois']
-                    monthly_summary.loc[0, 'SoldeInitial'] = 0  # ou = opening_balance si voulu
-
-                    # Réorganiser les colonnes pour insérer SoldeInitial avant DR
-                    monthly_summary = monthly_summary[['YearMonth', 'SoldeInitial', 'DR', 'CR', 'SoldeMois', 'SoldeCumulatif']]
-
-                    # Ajouter ligne initiale "Solde d'ouverture"
-                    monthly_balance = pd.concat([
-                        pd.DataFrame([{
-                            'YearMonth': pd.NaT,
-                            'SoldeInitial': '',
-                            'DR': opening_balance,
-                            'CR': 0,
-                            'SoldeMois': 0,
-                            'SoldeCumulatif': opening_balance
-                        }]),
-                        monthly_summary
-                    ], ignore_index=True)
+                    # Cube (adhérent x mois) calculé une fois pour tout le grand livre, sur la période réelle des données :
+                    # ligne de solde d'ouverture, puis DR/CR mensuels, SoldeInitial, SoldeMois (progressif) et SoldeCumulatif (DR+CR)
+                    profiler.lap("Mensuel : calcul")
+                    monthly_balance = monthly_balance_table(df, 'Client Number', client_input)
 
                     # Format affichage
-                    mois_fr = {
-                        'January': 'janvier', 'February': 'février', 'March': 'mars', 'April': 'avril', 'May': 'mai', 'June': 'juin',
-                        'July': 'juillet', 'August': 'août', 'September': 'septembre', 'October': 'octobre', 'November': 'novembre', 'December': 'décembre'
-                    }
-
+                    profiler.lap("Mensuel : formatage")
                     display_table = monthly_balance.copy()
-                    display_table['YearMonth'] = display_table['YearMonth'].dt.strftime('%B - %Y')
-                    display_table['YearMonth'] = display_table['YearMonth'].replace(mois_fr, regex=True).str.lower()
-                    display_table['YearMonth'] = display_table['YearMonth'].fillna("solde d'ouverture")
+                    display_table['YearMonth'] = month_labels(display_table['YearMonth'])
                     display_table.rename(columns={
                         'YearMonth': 'Date',
                         'SoldeInitial': 'Solde initial',
@@ -227,136 +213,25 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
                         'SoldeCumulatif': 'Solde cumulé'
                     }, inplace=True)
 
-                    # Formater les montants
-                    for col in ['Solde initial', 'DR', 'CR', 'Solde du mois', 'Solde cumulé']:
-                        display_table[col] = pd.to_numeric(display_table[col], errors='coerce').fillna(0)
-                        display_table[col] = display_table[col].round(0).astype(int).apply(lambda x: f"{x:,}".replace(",", " "))
+                    # Montants numériques (solde initial vide sur la ligne d'ouverture -> 0), une conversion par colonne
+                    amount_columns = ['Solde initial', 'DR', 'CR', 'Solde du mois', 'Solde cumulé']
+                    display_table[amount_columns] = display_table[amount_columns] \
+                        .apply(pd.to_numeric, errors='coerce').fillna(0)
 
-                    # Affichage final
+                    # Affichage final, séparateur de milliers appliqué par show_table
                     st.markdown("---")
                     st.subheader("Résumé mensuel des mouvements")
-                    st.dataframe(display_table, use_container_width=True, hide_index=True)
-
-
-
-                    # Préparation des données pour les graphes
-                    monthly_balance_plot = monthly_balance.copy()
-
-                    # Ignorer la ligne de solde d'ouverture pour les courbes mensuelles, 
-                    # avec récupéreration de sa valeur pour l'afficher dans la première barre
-                    opening_balance = monthly_balance_plot.loc[monthly_balance_plot['YearMonth'].isna(), 'DR'].sum()
-
-                    # On ne garde que les mois réels
-                    monthly_balance_plot = monthly_balance_plot[monthly_balance_plot['YearMonth'].notna()].reset_index(drop=True)
-
-                    # Conversion pour affichage
-                    monthly_balance_plot['YearMonthStr'] = monthly_balance_plot['YearMonth'].dt.strftime('%m-%Y')
-
-                    # Colonnes pour barres empilées
-                    monthly_balance_plot['OpeningDR'] = 0
-                    monthly_balance_plot['ActualDR'] = monthly_balance_plot['DR']
-
-                    if not monthly_balance_plot.empty:
-                        # Ajouter l'ouverture uniquement sur la première barre pour le graphique
-                        monthly_balance_plot.loc[0, 'OpeningDR'] = opening_balance
-
-                        # Largeur des barres
-                        width = 0.35  
-
-                        # Histogramme DR/CR
-                        fig, ax = plt.subplots(figsize=(10, 5))
-
-                        # DR ouverture (vert clair)
-                        ax.bar(
-                            monthly_balance_plot['YearMonthStr'], 
-                            monthly_balance_plot['OpeningDR'], 
-                            width, label='Solde Ouverture', color='lightgreen'
-                        )
-                        # DR normal (vert)
-                        ax.bar(
-                            monthly_balance_plot['YearMonthStr'], 
-                            monthly_balance_plot['ActualDR'], 
-                            width, bottom=monthly_balance_plot['OpeningDR'], color='green', label='Débits (DR)'
-                        )
-                        # CR négatifs (bleu)
-                        ax.bar(
-                            monthly_balance_plot['YearMonthStr'], 
-                            -monthly_balance_plot['CR'], 
-                            width, label='Crédits (CR)', color='blue', alpha=0.7
-                        )
-
-                        ax.set_title("Histogramme mensuel des mouvements")
-                        ax.set_xlabel("Mois")
-                        ax.set_ylabel("Montants (Dt)")
-                        ax.axhline(0, color='black', linewidth=1.2)
-                        ax.legend(
-                            loc='upper left',
-                            bbox_to_anchor=(1.02, 1),
-                            borderaxespad=0
-                        )
-
-                        plt.xticks(rotation=45)
-                        ax.grid(axis='y', linestyle='--', alpha=0.5)
-
-                        # Formater l’axe Y
-                        ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{int(x):,}".replace(",", " ")))
-
-                        st.pyplot(fig)
-
-
-
-                        # Graphique linéaire : évolution du solde mensuel et cumulé
-                        fig, ax = plt.subplots(figsize=(10, 5))
-
-                        sns.lineplot(
-                            data=monthly_balance_plot,
-                            x='YearMonthStr',
-                            y='SoldeMois',
-                            marker='o',
-                            linewidth=2,
-                            color='green',
-                            label='Solde du mois',
-                            ax=ax
-                        )
-
-                        sns.lineplot(
-                            data=monthly_balance_plot,
-                            x='YearMonthStr',
-                            y='SoldeCumulatif',
-                            marker='o',
-                            linewidth=2,
-                            color='blue',
-                            label='Solde cumulé',
-                            ax=ax
-                        )
-
-                        # Ajouter les valeurs formatées sur les points
-                        for i, val in enumerate(monthly_balance_plot['SoldeCumulatif']):
-                            ax.text(i, val, f"{int(val):,}".replace(",", " "), ha='center', va='bottom', fontsize=9, color='blue')
-
-                        for i, val in enumerate(monthly_balance_plot['SoldeMois']):
-                            ax.text(i, val, f"{int(val):,}".replace(",", " "), ha='center', va='bottom', fontsize=9, color='green')
-
-                        ax.set_title("Évolution mensuelle du solde (mois et cumulé)", fontsize=14)
-                        ax.set_xlabel("Mois")
-                        ax.set_ylabel("Solde (Dt)")
-                        ax.grid(True, linestyle='--', alpha=0.5)
-
-                        # Réduire l’espace avant la première date
-                        ax.margins(x=0)             # supprime la marge à gauche/droite
-                        ax.set_xlim(-0.1, len(monthly_balance_plot['YearMonthStr'])-1 + 0.1)  # colle la première valeur à l'axe Y
-
-                        ax.legend(
-                            loc='upper left',
-                            bbox_to_anchor=(1.02, 1),
-                            borderaxespad=0
-                        )
-                        plt.xticks(rotation=45)
-
-                        # Formater l’axe Y avec espaces pour milliers
-                        ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{int(x):,}".replace(",", " ")))
-
-                        st.pyplot(fig)
+                    profiler.lap("Mensuel : affichage")
+                    show_table(display_table, numbers=amount_columns)
+
+
+
+                    # Histogramme DR/CR puis évolution du solde, sur les mois réels (ouverture sur la première barre)
+                    # Images rendues une fois puis relues du cache partagé (voir factoring.charts)
+                    if monthly_balance['YearMonth'].notna().any():
+                        profiler.lap("Mensuel : graphiques")
+                        show_figure(monthly_movements_figure, monthly_balance, 'mouvements_mensuels', client_input)
+                        show_figure(balance_evolution_figure, monthly_balance, 'evolution_solde', client_input)
 
 
                 ####
@@ -365,267 +240,64 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
 ###
                 # Analyse des TIRES
                 if 'TIRES' in df.columns and 'Debtor Number' in df.columns:
-                    # Récupéreration des données originales du client (non modifiées) pour inclure les SO
-                    client_number_series_tires = (
-                        df['Client Number']
-                        .astype(str)
-                        .str.strip()
-                        .str.replace(r'\.0$', '', regex=True)
-                    )
-                    client_data_original_tires = df[client_number_series_tires == client_input].copy()
-                    
                     st.markdown("---")
                     st.subheader("Analyse des tirés / Adhérent")
 
-                    # Calcul des stats avec Debtor Number sur les données complètes
-                    tires_stats = client_data_original_tires.groupby(['TIRES', 'Debtor Number']).agg(
-                        Nombre=('TIRES', 'count'),
-                        Total_DR=('EntryAmount', 'sum'),
-                        Total_CR=('EntryAmountSAC', 'sum')
-                    ).reset_index()
-
-                    tires_stats['Debtor Number'] = tires_stats['Debtor Number'].astype(int).astype(str)
-
-                    # Calculer le Solde Period (Total_DR - Total_CR)
-                    tires_stats['Solde_Period'] = tires_stats['Total_DR'] - tires_stats['Total_CR']
-
-                    # Ajouter les pourcentages DR et CR
-                    total_dr = tires_stats['Total_DR'].sum()
-                    total_cr = tires_stats['Total_CR'].sum()
-                    tires_stats['% DR'] = (tires_stats['Total_DR'] / total_dr * 100).round(2)
-                    tires_stats['% CR'] = (tires_stats['Total_CR'] / total_cr * 100).round(2)
-
-                    # Calculer le % Solde Period
-                    total_solde_period = tires_stats['Solde_Period'].sum()
-                    if total_solde_period != 0:
-                        tires_stats['% Solde_Period'] = (tires_stats['Solde_Period'] / total_solde_period * 100).round(2)
-                    else:
-                        tires_stats['% Solde_Period'] = 0
-
-                    # Remplacer NaN par 0
-                    tires_stats[['% DR', '% CR', '% Solde_Period']] = tires_stats[['% DR', '% CR', '% Solde_Period']].fillna(0)
-
-                    # Trier par Total_DR + Total_CR décroissant
-                    tires_stats['Total'] = tires_stats['Total_DR'] + tires_stats['Total_CR']
-                    tires_stats = tires_stats.sort_values(by='Total', ascending=False)
+                    # Parts des tirés calculées une fois pour tout le portefeuille (SO inclus), lecture de l'adhérent
+                    profiler.lap("Tirés : calcul")
+                    concentration = debtor_concentration(df)
+                    tires_stats = concentration.for_client(client_input)
 
                     # Préparer le tableau final
                     final_tires_table = tires_stats.drop(columns=['Total']).reset_index(drop=True)
 
-                    # Formater les colonnes numériques
-                    for col in ['Total_DR', 'Total_CR', 'Solde_Period']:
-                        final_tires_table[col] = final_tires_table[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-                    for col in ['% DR', '% CR', '% Solde_Period']:
-                        final_tires_table[col] = final_tires_table[col].astype(str) + ' %'
+                    # Dépassements du seuil de 25 % (% Solde Period en valeur absolue)
+                    over_threshold = share_flags(final_tires_table, CONCENTRATION_THRESHOLD)
+
+                    # Montants arrondis à l'unité (gardés numériques, formatés à l'affichage par show_table)
+                    profiler.lap("Tirés : formatage")
+                    final_tires_table = rounded(final_tires_table, ['Total_DR', 'Total_CR', 'Solde_Period'])
 
                     # Renommer les colonnes pour l'affichage
+                    over_threshold.columns = ['% DR', '% CR', '% Solde Period']
                     final_tires_table.rename(columns={
                         'Solde_Period': 'Solde Period',
                         '% Solde_Period': '% Solde Period'
                     }, inplace=True)
 
-                    # Fonction de surlignage : %DR, %CR ou % Solde Period > 25
-                    def highlight_over_25(row):
-                        try:
-                            percent_dr = float(row['% DR'].replace(' %', ''))
-                            percent_cr = float(row['% CR'].replace(' %', ''))
-                            percent_solde = float(row['% Solde Period'].replace(' %', ''))
-                        except:
-                            percent_dr, percent_cr, percent_solde = 0, 0, 0
-
-                        colors = [''] * len(row)
-                        # Couleur sur la colonne % DR
-                        if percent_dr > 25:
-                            colors[list(final_tires_table.columns).index('% DR')] = 'background-color: #CF9280'
-                        # Couleur sur la colonne % CR
-                        if percent_cr > 25:
-                            colors[list(final_tires_table.columns).index('% CR')] = 'background-color: #CF9280'
-                        # Couleur sur la colonne % Solde Period
-                        if abs(percent_solde) > 25:  # Utiliser abs() car le solde peut être négatif
-                            colors[list(final_tires_table.columns).index('% Solde Period')] = 'background-color: #CF9280'
-                        return colors
-
-                    styled_table = final_tires_table.style.apply(highlight_over_25, axis=1)
-
-                    # Affichage du tableau stylé
-                    st.dataframe(styled_table, use_container_width=True, hide_index=True)
-
-                    # Préparation des données pour le graphique
-                    tires_stats['Total'] = tires_stats['Total_DR'] + tires_stats['Total_CR']
-
-                    # Trier en ordre décroissant
-                    tires_stats = tires_stats.sort_values(by='Total', ascending=False).reset_index(drop=True)
-
-                    # Histogramme horizontal
-                    fig, ax = plt.subplots(figsize=(12, max(4, len(tires_stats)*0.5)))  # Hauteur dynamique
-
-                    y = range(len(tires_stats))
-                    height = 0.35  # épaisseur des barres
-
-                    # Définir les couleurs en fonction du type de TIRES
-                    tires_stats['TIRES'] = tires_stats['TIRES'].astype(str).str.strip().str.upper().str.replace(r'\s+', '', regex=True)
-
-
-                    dr_colors = ['lightgreen' if tire == 'SO' else 'darkgreen' for tire in tires_stats['TIRES']]
-                    cr_colors = ['lightgreen' if tire == 'SO' else 'darkblue' for tire in tires_stats['TIRES']]
-
-                    bars_dr = ax.barh(y, tires_stats['Total_DR'], height, 
-                                    label='Débits (DR)', color=dr_colors, edgecolor='black')
-                    bars_cr = ax.barh([i + height for i in y], tires_stats['Total_CR'], height, 
-                                    label='Crédits (CR)', color=cr_colors, alpha=0.8, edgecolor='black')
-
-                    # Calcul du max pour définir les marges
-                    max_val = max(tires_stats['Total_DR'].max(), tires_stats['Total_CR'].max())
-
-                    # Ajouter valeurs formatées sur les barres
-                    for bar in bars_dr:
-                        width = bar.get_width()
-                        ax.text(width + max_val*0.01, 
-                                bar.get_y() + bar.get_height()/2,
-                                f"{int(width):,}".replace(",", " "),  # Format 10 000
-                                va='center', fontsize=9, color='black')
-
-                    for bar in bars_cr:
-                        width = bar.get_width()
-                        ax.text(width + max_val*0.01, 
-                                bar.get_y() + bar.get_height()/2,
-                                f"{int(width):,}".replace(",", " "),  # Format 10 000
-                                va='center', fontsize=9, color='black')
-
-                    # Ajuster la limite X pour éviter les coupures
-                    ax.set_xlim(0, max_val * 1.15)  # 15% de marge à droite pour les labels
-
-                    # Labels et axes
-                    ax.set_yticks([i + height/2 for i in y])
-                    ax.set_yticklabels(tires_stats['TIRES'])
-                    ax.set_xlabel("Montant total (Dt)")
-                    ax.set_ylabel("Type de TIRES")
-                    ax.set_title("Montants DR et CR par TIRES (incluant SO)")
-
-                    # Légende avec distinction SO
-                    from matplotlib.patches import Patch
-                    legend_elements = [
-                        Patch(facecolor='darkgreen', label='Débits (DR) - Normal'),
-                        Patch(facecolor='darkblue', alpha=0.8, label='Crédits (CR) - Normal'),
-                        #Patch(facecolor='lightgreen', label='SO (Solde Ouverture)')
-                    ]
-                    ax.legend(
-                        loc='upper left',
-                        bbox_to_anchor=(1.02, 1),
-                        borderaxespad=0
+                    # Surlignage colonne par colonne à partir des dépassements précalculés
+                    styled_table = final_tires_table.style.apply(
+                        lambda col: np.where(over_threshold[col.name], 'background-color: #CF9280', ''),
+                        subset=list(over_threshold.columns)
                     )
 
-                    # Grille verticale
-                    ax.grid(axis='x', linestyle='--', alpha=0.5)
+                    # Affichage du tableau stylé
+                    profiler.lap("Tirés : affichage")
+                    show_table(styled_table, numbers=['Nombre', 'Total_DR', 'Total_CR', 'Solde Period'],
+                               percents=list(over_threshold.columns))
 
-                    plt.tight_layout()
-                    st.pyplot(fig)
+                    # Histogramme horizontal DR/CR par tiré, volume décroissant, par pages de CHART_TOP_N tirés
+                    profiler.lap("Tirés : graphique")
+                    page = chart_page_input(len(tires_stats), "tires_chart_page")
+                    show_figure(tires_figure, tires_stats, 'tires', client_input, top_n=CHART_TOP_N, page=page)
 
 
 
 
                 ### Analyse des catégories RUB
                 if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
-                    # Récupérer les données originales du client (non modifiées)
-                    client_number_series_rub = (
-                        df['Client Number']
-                        .astype(str)
-                        .str.strip()
-                        .str.replace(r'\.0$', '', regex=True)
-                    )
-                    client_data_original = df[client_number_series_rub == client_input].copy()
-                    
-                    # Nettoyage des colonnes clés
-                    client_data_original['Transaction'] = client_data_original['Transaction'].astype(str).str.strip().fillna("")
-                    client_data_original['RUB'] = client_data_original['RUB'].astype(str).str.strip().fillna("")
-                    client_data_original['EntryAmount'] = pd.to_numeric(client_data_original['EntryAmount'], errors='coerce').fillna(0)
-                    client_data_original['EntryAmountSAC'] = pd.to_numeric(client_data_original['EntryAmountSAC'], errors='coerce').fillna(0)
-
-                    # Identifier la ligne de "Solde Ouverture" (insensible à la casse et nettoyé)
-                    so_mask = client_data_original['Transaction'].str.lower().str.contains("solde ouverture", na=False)
-
-                    # Séparer les lignes SO
-                    opening_dr = client_data_original.loc[so_mask, 'EntryAmount'].sum()
-                    opening_cr = client_data_original.loc[so_mask, 'EntryAmountSAC'].sum()
-
-                    # Nettoyer les données pour le groupby
-                    client_data_clean = client_data_original.loc[~so_mask].copy()
-
-                    # Grouper par RUB
-                    rub_stats = client_data_clean.groupby('RUB').agg(
-                        Nombre=('RUB', 'count'),
-                        Total_DR=('EntryAmount', 'sum'),
-                        Total_CR=('EntryAmountSAC', 'sum')
-                    ).reset_index()
-
-                    # Ajouter la ligne SO en haut
-                    rub_stats = pd.concat([
-                        pd.DataFrame([{
-                            'RUB': 'SO',
-                            'Nombre': so_mask.sum(),
-                            'Total_DR': opening_dr,
-                            'Total_CR': opening_cr
-                        }]),
-                        rub_stats
-                    ], ignore_index=True)
-
-                    # Ordonner la ligne SO en premier
-                    rub_stats['ordre'] = rub_stats['RUB'].apply(lambda x: 0 if x == "SO" else 1)
-                    rub_stats = rub_stats.sort_values(by=['ordre', 'Total_DR'], ascending=[True, False]).drop(columns=['ordre'])
-
-                    # Formater les valeurs
-                    rub_stats_fmt = rub_stats.copy()
-                    rub_stats_fmt['Total_DR'] = rub_stats_fmt['Total_DR'].round(0).astype(int).apply(lambda x: f"{x:,}".replace(",", " "))
-                    rub_stats_fmt['Total_CR'] = rub_stats_fmt['Total_CR'].round(0).astype(int).apply(lambda x: f"{x:,}".replace(",", " "))
-
-                    # Affichage du tableau
-                    st.subheader("Quotas par transaction (RUB)")
-                    st.dataframe(rub_stats_fmt, use_container_width=True, hide_index=True)
-
-                    # --- Création du graphique ---
-                    rub_stats_plot = rub_stats.copy()  # Pour valeurs numériques
-                    fig, ax = plt.subplots(figsize=(12, 5))
-                    width = 0.35
-
-                    so_row = rub_stats_plot.iloc[0]
-                    rub_stats_others = rub_stats_plot.iloc[1:]
+                    # Tableau par RUB, ligne SO en premier (Transaction, RUB et montants déjà typés au chargement)
+                    profiler.lap("RUB : calcul")
+                    rub_stats = rub_table(client_index.take(df, client_input))
 
-                    x = range(1, len(rub_stats_plot))  # Positions X pour les autres RUB
-
-                    # Barres SO
-                    ax.bar([0], [so_row['Total_DR']], width, label='Solde Ouverture (SO)', color='lightgreen', edgecolor='black', linewidth=0.8)
-
-                    # Barres DR/CR
-                    bars_dr = ax.bar(x, rub_stats_others['Total_DR'], width, label='Débits (DR)', color='darkgreen', edgecolor='black', linewidth=0.8)
-                    bars_cr = ax.bar([i + width for i in x], rub_stats_others['Total_CR'], width, label='Crédits (CR)', color='blue', alpha=0.8, edgecolor='black', linewidth=0.8)
-
-                    # Axe X
-                    ax.set_xticks([0 + width/2] + [i + width/2 for i in x])
-                    ax.set_xticklabels(rub_stats_plot['RUB'], rotation=0)
-                    ax.set_xlabel("Type de RUB")
-                    ax.set_ylabel("Montant total (Dt)")
-                    ax.set_title("Histogramme Quotas par transaction (RUB)")
-
-                    # Légende
-                    ax.legend(loc='upper left', bbox_to_anchor=(1.02, 1))
-
-                    # Affichage des montants
-                    max_val = max(rub_stats_plot['Total_DR'].max(), rub_stats_plot['Total_CR'].max())
-                    for bar in ax.containers:
-                        for rect in bar:
-                            height = rect.get_height()
-                            if height > 0:
-                                ax.text(rect.get_x() + rect.get_width() / 2, height + 0.01 * max_val,
-                                        f"{int(height):,}".replace(",", " "), ha='center', va='bottom', fontsize=9)
-
-                    # Grille
-                    ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{int(x):,}".replace(",", " ")))
-                    for i in range(len(rub_stats_plot)):
-                        ax.axvline(i + 1 - width/2, color='gray', linestyle='--', alpha=0.5)
-                    ax.grid(axis='y', linestyle='--', alpha=0.5)
+                    # Affichage du tableau (montants numériques, formatés par show_table)
+                    st.subheader("Quotas par transaction (RUB)")
+                    profiler.lap("RUB : affichage")
+                    show_table(rub_stats, numbers=['Nombre', 'Total_DR', 'Total_CR'])
 
-                    plt.tight_layout()
-                    st.pyplot(fig)
+                    # Graphique partagé avec l'analyse par tiré et les rapports (voir factoring.charts)
+                    profiler.lap("RUB : graphique")
+                    show_figure(rub_figure, rub_stats, 'rub', client_input)
 
 
 
@@ -655,4 +327,6 @@ if 'Client Number' in df.columns and 'Legal Client Name' in df.columns:
 else:
     st.error("Le fichier doit contenir les colonnes 'Client Number' et 'Legal Client Name'.")
 
+profiling_panel(profiler)
+
 
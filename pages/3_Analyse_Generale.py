@@ -1,28 +1,44 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import matplotlib.ticker as mticker
+
+from factoring.charts import (client_rubrique_figure, monthly_totals_figure, rubrique_figure, show_figure,
+                              top_clients_figure, transaction_figure)
+from factoring.display import show_table
+from factoring.grid import paged_dataframe
+from factoring.indexes import frame_memo, key_index
+from factoring.profiling import page_profiler, profiling_panel
+from factoring.reports import GENERAL_COLUMNS, ledger_overview, monthly_totals, rubrique_table, top_clients_table, transaction_table
+from factoring.totals import ledger_totals
 
 st.title("Analyse Générale")
 
-if 'df' not in st.session_state or st.session_state.df is None:
+# Mesure optionnelle de chaque section (interrupteur dans la barre latérale)
+profiler = page_profiler("Analyse générale")
+
+if (st.session_state.get('df') is None and st.session_state.get('store') is None
+        and st.session_state.get('aggregates') is None):
     st.warning("Veuillez charger un fichier depuis la page d'accueil.")
     st.stop()
 
-df = st.session_state.df
+# Mode base locale : le grand livre reste dans SQLite, seuls les agrégats et les lignes demandées sont chargés
+store = st.session_state.get('store')
+# Mode agrégats : seuls les agrégats partiels fusionnés pendant la lecture sont en mémoire
+aggregates = st.session_state.get('aggregates') if store is None else None
+# Source hors mémoire (même interface : head, overview, totals, monthly_totals)
+offline = store if store is not None else aggregates
+df = st.session_state.df if offline is None else offline.head(1000)
 
-# --- SECTION 0: APERCU DE LA BASE ---
-st.header("Base de données complète")
 
-st.dataframe(df, use_container_width=True, hide_index=True)
+def section_memo(name, build):
+    """Tableau d'une section mémorisé pour le jeu de données chargé, partagé par les sessions et les reruns.
 
-st.markdown("---")
+    La mémoire est attachée à l'objet source (base locale, agrégats ou DataFrame) :
+    un nouveau chargement crée un nouvel objet et recalcule les sections.
+    """
+    source = offline if offline is not None else df
+    return frame_memo(source, ('analyse_generale', name), build)
 
 
-# Nettoyage approfondi des noms de colonnes
-df.columns = [str(col).strip().replace('\n', '').replace('\r', '') if col is not None else f"Unnamed_{i}" for i, col in enumerate(df.columns)]
-
 # Déterminer le type de base - avec valeur par défaut "alternative" si non défini
 base_type = st.session_state.get("base_type", "alternative")
 
@@ -47,309 +63,187 @@ if missing_columns:
     st.info("L'analyse continuera avec les colonnes disponibles.")
 
 # Vérifier les colonnes essentielles
-essential_columns = ['Entry Amount', 'Entry Amount SAC', 'Client Number', 'Legal Client Name', 'Rubrique']
-missing_essential = [col for col in essential_columns if col not in df.columns]
+missing_essential = [col for col in GENERAL_COLUMNS if col not in df.columns]
 
 if missing_essential:
     st.error(f"Les colonnes essentielles suivantes sont manquantes : {', '.join(missing_essential)}")
+    profiling_panel(profiler)
     st.stop()
 
-# --- Conversion des montants ---
-df['Entry Amount'] = pd.to_numeric(df['Entry Amount'], errors='coerce').fillna(0)
-df['Entry Amount SAC'] = pd.to_numeric(df['Entry Amount SAC'], errors='coerce').fillna(0)
-
-# --- SECTION 1: VUE D'ENSEMBLE ---
-st.header("Vue d'ensemble")
-
-# Appliquer du style CSS pour réduire la taille du texte
-st.markdown("""
-    <style>
-    [data-testid="stMetricValue"] {
-        font-size: 16px; /* Taille de la valeur */
-    }
-    [data-testid="stMetricLabel"] {
-        font-size: 13px; /* Taille du label */
-    }
-    </style>
-    """, unsafe_allow_html=True)
-
-col1, col2, col3, col4 = st.columns(4)
-
-col1.metric("Nombre de clients", f"{df['Client Number'].nunique():,}".replace(",", " "))
-col2.metric("Nombre de transactions", f"{len(df):,}".replace(",", " "))
-col3.metric("Total Débits", f"{df['Entry Amount'].sum():,.0f}".replace(",", " "))
-col4.metric("Total Crédits", f"{df['Entry Amount SAC'].sum():,.0f}".replace(",", " "))
-
+# Montants, dates et libellés sont déjà typés par la normalisation faite au chargement
 
+# Une seule section calculée et affichée par exécution : la recherche d'un adhérent ne recalcule
+# pas les sections du portefeuille, et ces dernières sont relues de section_memo d'un rerun à l'autre
+SECTIONS = ["Aperçu de la base", "Vue d'ensemble", "Rubriques", "Transactions", "Analyse temporelle",
+            "Top adhérents", "Recherche adhérent"]
+section = st.radio("Section", SECTIONS, index=1, horizontal=True, key="general_section",
+                   label_visibility="collapsed")
 st.markdown("---")
 
-# --- SECTION 2: ANALYSE PAR RUBRIQUE ---
-st.header("Analyse par Rubrique")
-df['Rubrique'] = df['Rubrique'].astype(str).str.strip().fillna("Non définie")
-
-rubrique_stats = df.groupby('Rubrique').agg(
-    Nombre_transactions=('Rubrique', 'count'),
-    Total_DR=('Entry Amount', 'sum'),
-    Total_CR=('Entry Amount SAC', 'sum'),
-    Nombre_clients=('Client Number', 'nunique')
-).reset_index()
-
-rubrique_stats['Solde_Net'] = rubrique_stats['Total_DR'] - rubrique_stats['Total_CR']
-rubrique_stats = rubrique_stats.sort_values(by='Total_DR', ascending=False)
-
-# Tableau formaté
-rubrique_display = rubrique_stats.copy()
-for col in ['Total_DR', 'Total_CR', 'Solde_Net']:
-    rubrique_display[col] = rubrique_display[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-
-st.subheader("Statistiques par Rubrique")
-st.dataframe(rubrique_display, use_container_width=True, hide_index=True)
-
-# Graphique des rubriques
-
-if len(rubrique_stats) > 0:
-    fig, ax = plt.subplots(figsize=(12, max(5, len(rubrique_stats)*0.6)))
-
-    # Position des barres
-    x = range(len(rubrique_stats))
-    width = 0.4  # largeur des barres
-
-    # Histogramme groupé
-    ax.bar([i - width/2 for i in x], rubrique_stats['Total_DR'], 
-           width=width, label='Débits (DR)', color='darkgreen', edgecolor='black', alpha=0.8)
-    ax.bar([i + width/2 for i in x], rubrique_stats['Total_CR'], 
-           width=width, label='Crédits (CR)', color='darkblue', edgecolor='black', alpha=0.8)
-
-    # Titre et labels
-    ax.set_xlabel("Rubrique", fontsize=12)
-    ax.set_ylabel("Montant (Dt)", fontsize=12)
-    ax.set_title("Histogramme Débits vs Crédits par Rubrique", fontsize=14, weight="bold")
-    ax.legend()
-
-    # Axe X avec noms des rubriques
-    ax.set_xticks(x)
-    ax.set_xticklabels(rubrique_stats['Rubrique'], rotation=45, ha='right')
-
-    # Formatter pour espacer les milliers
-    ax.yaxis.set_major_formatter(
-        mticker.FuncFormatter(lambda val, _: f"{int(val):,}".replace(",", " "))
-    )
-
-    ax.grid(axis='y', linestyle='--', alpha=0.5)
-
-    plt.tight_layout()
-    st.pyplot(fig)
-
-
-
+# --- SECTION 0: APERCU DE LA BASE ---
+if section == "Aperçu de la base":
+    st.header("Base de données complète")
+
+    if store is not None:
+        st.caption(f"Mode base locale : aperçu des {len(df):,} premières lignes sur {len(store):,}.".replace(",", " "))
+    elif aggregates is not None:
+        st.caption(f"Mode agrégats : aperçu des {len(df):,} premières lignes sur {len(aggregates):,} lues. "
+                   f"Les nombres de clients distincts sont estimés (HyperLogLog, ~2 %).".replace(",", " "))
+    # Grand livre page par page : seules les lignes visibles sont envoyées au navigateur
+    profiler.lap("Aperçu : affichage")
+    paged_dataframe(df, "ledger_rows")
+    profiler.finish()
 
+# --- SECTION 1: VUE D'ENSEMBLE ---
+elif section == "Vue d'ensemble":
+    st.header("Vue d'ensemble")
+
+    # Appliquer du style CSS pour réduire la taille du texte
+    st.markdown("""
+        <style>
+        [data-testid="stMetricValue"] {
+            font-size: 16px; /* Taille de la valeur */
+        }
+        [data-testid="stMetricLabel"] {
+            font-size: 13px; /* Taille du label */
+        }
+        </style>
+        """, unsafe_allow_html=True)
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    profiler.lap("Vue d'ensemble")
+    overview = section_memo('overview', lambda: offline.overview() if offline is not None else ledger_overview(df))
+    col1.metric("Nombre de clients", f"{overview['clients']:,}".replace(",", " "))
+    col2.metric("Nombre de transactions", f"{overview['rows']:,}".replace(",", " "))
+    col3.metric("Total Débits", f"{overview['dr']:,.0f}".replace(",", " "))
+    col4.metric("Total Crédits", f"{overview['cr']:,.0f}".replace(",", " "))
+    profiler.finish()
 
+# --- SECTION 2: ANALYSE PAR RUBRIQUE ---
+elif section == "Rubriques":
+    st.header("Analyse par Rubrique")
+
+    # Agrégats par rubrique tenus à jour lors des ajouts d'extraits (voir factoring.totals), en SQL en mode base locale,
+    # fusionnés bloc par bloc en mode agrégats (voir factoring.streaming)
+    profiler.lap("Rubriques : calcul")
+    rubrique_stats = section_memo('rubriques', lambda: rubrique_table(
+        offline.totals() if offline is not None else ledger_totals(df)))
+
+    # Tableau formaté par show_table (valeurs numériques, tri conservé)
+    st.subheader("Statistiques par Rubrique")
+    profiler.lap("Rubriques : affichage")
+    show_table(rubrique_stats, numbers=['Nombre_transactions', 'Nombre_clients', 'Total_DR', 'Total_CR', 'Solde_Net'])
+
+    # Graphique des rubriques
+    if len(rubrique_stats) > 0:
+        profiler.lap("Rubriques : graphique")
+        show_figure(rubrique_figure, rubrique_stats, 'rubriques')
+    profiler.finish()
 
 # --- SECTION 4: ANALYSE PAR TRANSACTION ---
-st.markdown("---")
-st.header("Analyse par Type de Transaction")
-
-# Vérification que la colonne 'TRANSACTION' existe
-if 'TRANSACTION' in df.columns:
-    transaction_stats = df.groupby('TRANSACTION').agg(
-        Nombre_transactions=('TRANSACTION', 'count'),
-        Total_DR=('Entry Amount', 'sum'),
-        Total_CR=('Entry Amount SAC', 'sum'),
-        Nombre_clients=('Client Number', 'nunique')
-    ).reset_index()
-
-    transaction_stats['Solde_Net'] = transaction_stats['Total_DR'] - transaction_stats['Total_CR']
-    transaction_stats = transaction_stats.sort_values(by='Total_DR', ascending=False)
-
-    # Tableau formaté
-    transaction_display = transaction_stats.copy()
-    for col in ['Total_DR', 'Total_CR', 'Solde_Net']:
-        transaction_display[col] = transaction_display[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-
-    st.subheader("Statistiques par Transaction")
-    st.dataframe(transaction_display, use_container_width=True, hide_index=True)
-
-    # Graphique
-    # Graphique transaction avec échelle log
-    # Préparer les données
-    transaction_stats['Total_DR_log'] = transaction_stats['Total_DR'].apply(lambda x: x if x>0 else 1)
-    transaction_stats['Total_CR_log'] = transaction_stats['Total_CR'].apply(lambda x: x if x>0 else 1)
-
-    fig, ax = plt.subplots(figsize=(14, max(6, len(transaction_stats)*0.5)))
-    y = range(len(transaction_stats))
-    height = 0.35
-
-    # Barres séparées pour DR et CR
-    bars_dr = ax.barh([i + height/2 for i in y], transaction_stats['Total_DR_log'], height=height, color='darkgreen', label='Débits (DR)', edgecolor='black')
-    bars_cr = ax.barh([i - height/2 for i in y], transaction_stats['Total_CR_log'], height=height, color='darkblue', alpha=0.8, label='Crédits (CR)', edgecolor='black')
-
-    # Labels à l’extérieur des barres et taille plus grande
-    for bar in bars_dr:
-        width = bar.get_width()
-        ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}".replace(",", " "), va='center', fontsize=10)
-    for bar in bars_cr:
-        width = bar.get_width()
-        ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}".replace(",", " "), va='center', fontsize=10)
-
-    ax.set_yticks(y)
-    ax.set_yticklabels(transaction_stats['TRANSACTION'])
-    ax.set_xlabel("Montant (Dt, échelle log)")
-    ax.set_title("Montants Débits et Crédits par Type de Transaction")
-    ax.set_xscale('log')
-    ax.legend()
-    ax.grid(axis='x', linestyle='--', alpha=0.5)
-    plt.tight_layout()
-    st.pyplot(fig)
-
-
-
-else:
-    st.warning("Colonne 'TRANSACTION' non trouvée dans le fichier, impossible de faire l'analyse par type de transaction.")
-
+elif section == "Transactions":
+    st.header("Analyse par Type de Transaction")
+
+    # Vérification que la colonne 'TRANSACTION' existe
+    if 'TRANSACTION' in df.columns:
+        profiler.lap("Transactions : calcul")
+        transaction_stats = section_memo('transactions', lambda: transaction_table(
+            offline.totals() if offline is not None else ledger_totals(df)))
+
+        # Tableau formaté par show_table
+        st.subheader("Statistiques par Transaction")
+        profiler.lap("Transactions : affichage")
+        show_table(transaction_stats,
+                   numbers=['Nombre_transactions', 'Nombre_clients', 'Total_DR', 'Total_CR', 'Solde_Net'])
+
+        # Graphique transaction avec échelle log
+        profiler.lap("Transactions : graphique")
+        show_figure(transaction_figure, transaction_stats, 'transactions')
+        profiler.finish()
+    else:
+        st.warning("Colonne 'TRANSACTION' non trouvée dans le fichier, impossible de faire l'analyse par type de transaction.")
 
 # --- SECTION 4: ANALYSE TEMPORELLE ---
 # --- ANALYSE TEMPORELLE (robuste) ---
-st.markdown("---")
-st.header("Analyse Temporelle")
-
-if 'EntryDate' in df.columns:
-    # 1) Nettoyage MONTANTS (gère "33 989", nbsp, virgule décimale)
-    for col in ['Entry Amount', 'Entry Amount SAC']:
-        df[col] = pd.to_numeric(
-            df[col].astype(str)
-                  .str.replace('\u00A0', '', regex=False)  # nbsp
-                  .str.replace(' ', '')                    # espaces milliers
-                  .str.replace(',', '.'),                  # virgule -> point
-            errors='coerce'
-        ).fillna(0)
-
-    # 2) Conversion DATES (texte + numéro Excel)
-    d = pd.to_datetime(df['EntryDate'], dayfirst=True, errors='coerce')
-
-    as_num = pd.to_numeric(df['EntryDate'], errors='coerce')
-    mask_excel_serial = d.isna() & as_num.notna()
-    # Convertir les "séries Excel" en dates (origine Excel)
-    d.loc[mask_excel_serial] = pd.to_datetime(as_num.loc[mask_excel_serial], unit='D', origin='1899-12-30')
-
-    # Filtrer dates aberrantes
-    d = d.where((d.dt.year >= 2000) & (d.dt.year <= 2100))
-
-    df_dates = df.copy()
-    df_dates['EntryDate'] = d
-    df_dates = df_dates.dropna(subset=['EntryDate'])
-
-    if not df_dates.empty:
-        # 3) Agrégation mensuelle
-        df_dates['YearMonth'] = df_dates['EntryDate'].dt.to_period('M').dt.to_timestamp()
-        monthly_stats = (df_dates.groupby('YearMonth', as_index=False)
-                                .agg(Nombre_transactions=('EntryDate', 'count'),
-                                     Total_DR=('Entry Amount', 'sum'),
-                                     Total_CR=('Entry Amount SAC', 'sum')))
-        monthly_stats['Solde_Net'] = monthly_stats['Total_DR'] - monthly_stats['Total_CR']
-        monthly_stats['YearMonthStr'] = monthly_stats['YearMonth'].dt.strftime('%m-%Y')
-        monthly_stats = monthly_stats.sort_values('YearMonth')
-
-        # 4) Graphiques
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
-
-        # Barres DR / CR (CR en négatif pour la lisibilité)
-        ax1.bar(monthly_stats['YearMonthStr'], monthly_stats['Total_DR'],
-                width=0.4, label='Débits (DR)', color='darkgreen', edgecolor='black')
-        ax1.bar(monthly_stats['YearMonthStr'], -monthly_stats['Total_CR'],
-                width=0.4, label='Crédits (CR)', color='darkblue', alpha=0.8, edgecolor='black')
-
-        ax1.set_title("Évolution mensuelle des montants")
-        ax1.set_ylabel("Montant (Dt)")
-        ax1.legend(loc='upper left')
-        ax1.grid(axis='y', linestyle='--', alpha=0.5)
-        ax1.tick_params(axis='x', rotation=45)
-        ax1.axhline(0, color='black', linewidth=1)
-
-        # Courbe du nombre de transactions
-        ax2.plot(monthly_stats['YearMonthStr'], monthly_stats['Nombre_transactions'],
-                 marker='o', linewidth=2, color='orange', label='Nombre de transactions')
-        ax2.set_title("Évolution du nombre de transactions")
-        ax2.set_ylabel("Nombre de transactions")
-        ax2.set_xlabel("Mois")
-        ax2.legend(loc='upper left')
-        ax2.grid(True, linestyle='--', alpha=0.5)
-        ax2.tick_params(axis='x', rotation=45)
-
-        # Format Y avec séparateur de milliers
-        from matplotlib.ticker import FuncFormatter
-        ax1.yaxis.set_major_formatter(FuncFormatter(lambda x, _: f"{int(x):,}".replace(",", " ")))
-
-        plt.tight_layout()
-        st.pyplot(fig)
-
-        # 5) Tableau mensuel formaté
-        monthly_display = monthly_stats[['YearMonthStr', 'Nombre_transactions', 'Total_DR', 'Total_CR', 'Solde_Net']].copy()
-        monthly_display.rename(columns={'YearMonthStr': 'Mois'}, inplace=True)
-        for col in ['Total_DR', 'Total_CR', 'Solde_Net']:
-            monthly_display[col] = (monthly_display[col]
-                                    .round(0).astype(int)
-                                    .apply(lambda v: f"{v:,}".replace(",", " ")))
-        st.subheader("Détail mensuel")
-        st.dataframe(monthly_display, use_container_width=True, hide_index=True)
-    else:
-        st.warning("Aucune date valide après conversion (format texte/Excel).")
-else:
-    st.warning("Colonne 'EntryDate' non trouvée pour l'analyse temporelle.")
+elif section == "Analyse temporelle":
+    st.header("Analyse Temporelle")
 
+    def monthly_section():
+        if offline is not None:
+            # Agrégation mensuelle faite en SQL ou cumulée pendant la lecture (dates aberrantes exclues)
+            stats = offline.monthly_totals(2000, 2100)
+        else:
+            # Montants et dates (texte + numéro Excel) déjà convertis au chargement, dates aberrantes exclues
+            stats = monthly_totals(df, 2000, 2100)
+        if not stats.empty:
+            stats['Solde_Net'] = stats['Total_DR'] - stats['Total_CR']
+            stats['YearMonthStr'] = stats['YearMonth'].dt.strftime('%m-%Y')
+            stats = stats.sort_values('YearMonth')
+        return stats
+
+    if 'EntryDate' in df.columns:
+        profiler.lap("Temporel : calcul")
+        monthly_stats = section_memo('mensuel', monthly_section)
+
+        if not monthly_stats.empty:
+            # 4) Graphiques
+            profiler.lap("Temporel : graphiques")
+            show_figure(monthly_totals_figure, monthly_stats, 'mensuel')
+
+            # 5) Tableau mensuel formaté par show_table
+            monthly_display = monthly_stats[['YearMonthStr', 'Nombre_transactions', 'Total_DR', 'Total_CR', 'Solde_Net']] \
+                .rename(columns={'YearMonthStr': 'Mois'})
+            st.subheader("Détail mensuel")
+            profiler.lap("Temporel : affichage")
+            show_table(monthly_display, numbers=['Nombre_transactions', 'Total_DR', 'Total_CR', 'Solde_Net'])
+        else:
+            st.warning("Aucune date valide après conversion (format texte/Excel).")
+    else:
+        st.warning("Colonne 'EntryDate' non trouvée pour l'analyse temporelle.")
+    profiler.finish()
 
 # --- SECTION 3: TOP CLIENTS ---
-st.markdown("---")
-st.header("Top adhérents")
-top_clients = df.groupby(['Client Number', 'Legal Client Name']).agg(
-    Nombre_transactions=('Client Number', 'size'),
-    Total_DR=('Entry Amount', 'sum'),
-    Total_CR=('Entry Amount SAC', 'sum')
-).reset_index()
-
-top_clients['Solde_Net'] = top_clients['Total_DR'] - top_clients['Total_CR']
-top_clients['Total_Volume'] = top_clients['Total_DR'] + top_clients['Total_CR']
-top_clients = top_clients.sort_values(by='Total_Volume', ascending=False).head(15)
-
-top_clients_display = top_clients.copy()
-for col in ['Total_DR', 'Total_CR', 'Solde_Net', 'Total_Volume']:
-    top_clients_display[col] = top_clients_display[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-
-st.subheader("Top 15 adhérents par Volume Total")
-st.dataframe(top_clients_display, use_container_width=True, hide_index=True)
-
-# Graphique top clients
-if len(top_clients) > 0:
-    fig, ax = plt.subplots(figsize=(12, 6))
-    x = range(len(top_clients))
-    width = 0.35
-    bars1 = ax.bar([i - width/2 for i in x], top_clients['Total_DR'], width, label='Débits (DR)', color='darkgreen', edgecolor='black')
-    bars2 = ax.bar([i + width/2 for i in x], top_clients['Total_CR'], width, label='Crédits (CR)', color='darkblue', alpha=0.8, edgecolor='black')
-    ax.set_xticks(x)
-    ax.set_xticklabels([f"{name[:20]}..." if len(name) > 20 else name for name in top_clients['Legal Client Name']], rotation=45, ha='right')
-    ax.set_xlabel("Clients")
-    ax.set_ylabel("Montant (Dt)")
-    ax.set_title("Top 15 Clients - Débits vs Crédits")
-    ax.legend()
-    ax.grid(axis='y', linestyle='--', alpha=0.5)
-    ax.yaxis.set_major_formatter(mticker.FuncFormatter(lambda x, _: f"{int(x):,}".replace(",", " ")))
-    plt.tight_layout()
-    st.pyplot(fig)
-
-
-
+elif section == "Top adhérents":
+    st.header("Top adhérents")
+    profiler.lap("Top adhérents : calcul")
+    top_clients = section_memo('top_adherents', lambda: top_clients_table(
+        offline.totals() if offline is not None else ledger_totals(df), 15))
+
+    st.subheader("Top 15 adhérents par Volume Total")
+    profiler.lap("Top adhérents : affichage")
+    show_table(top_clients, numbers=['Nombre_transactions', 'Total_DR', 'Total_CR', 'Solde_Net', 'Total_Volume'])
+
+    # Graphique top clients
+    if len(top_clients) > 0:
+        profiler.lap("Top adhérents : graphique")
+        show_figure(top_clients_figure, top_clients, 'top_adherents')
+    profiler.finish()
 
 # --- SECTION 5: RECHERCHE CLIENT ---
-st.markdown("---")
-st.header("Recherche Adhérent")
-client_input = st.text_input("Entrer le numéro de l'adhérent")
-
-if st.button("Rechercher"):
-    if client_input.strip():
-        client_series = df['Client Number'].astype(str).str.strip().str.replace(r'\.0$', '', regex=True)
-        client_data = df[client_series == client_input.strip()]
+elif section == "Recherche adhérent":
+    st.header("Recherche Adhérent")
+    if aggregates is not None:
+        st.info("Recherche indisponible en mode agrégats : les lignes du grand livre ne sont pas conservées.")
+        profiling_panel(profiler)
+        st.stop()
+    client_input = st.text_input("Entrer le numéro de l'adhérent")
+
+    # Adhérent recherché gardé dans la session : les contrôles du tableau paginé relancent la page sans le bouton
+    if st.button("Rechercher"):
+        st.session_state.general_search = client_input.strip()
+        if not st.session_state.general_search:
+            st.warning("Veuillez entrer un numéro de l'adhérent.")
+    searched = st.session_state.get("general_search", "")
+    if searched:
+        profiler.lap("Recherche : lignes")
+        if store is not None:
+            client_data = store.rows('Client Number', searched)
+        else:
+            client_data = key_index(df, 'Client Number').take(df, searched)
         if not client_data.empty:
             client_name = client_data['Legal Client Name'].iloc[0]
-            st.success(f"Adhérent trouvé : **{client_name}** (#{client_input.strip()})")
+            st.success(f"Adhérent trouvé : **{client_name}** (#{searched})")
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Transactions", len(client_data))
             col2.metric("Total DR", f"{client_data['Entry Amount'].sum():,.0f}".replace(",", " "))
@@ -357,12 +251,14 @@ if st.button("Rechercher"):
             col4.metric("Solde Net", f"{(client_data['Entry Amount'].sum() - client_data['Entry Amount SAC'].sum()):,.0f}".replace(",", " "))
 
             st.subheader("Détail des transactions")
-            st.dataframe(client_data, use_container_width=True, hide_index=True)
+            profiler.lap("Recherche : affichage des lignes")
+            paged_dataframe(client_data, "search_rows")
 
             # --- Analyse par Transaction ---
             st.markdown("---")
             st.subheader("Analyse par Type de Transaction")
-            transaction_stats = client_data.groupby('TRANSACTION').agg(
+            profiler.lap("Recherche : transactions")
+            transaction_stats = client_data.groupby('TRANSACTION', observed=True).agg(
                 Total_DR=('Entry Amount', 'sum'),
                 Total_CR=('Entry Amount SAC', 'sum')
             ).reset_index()
@@ -371,44 +267,17 @@ if st.button("Rechercher"):
 
             # Tableau résumé avec Solde Net
             st.write("Résumé par Transaction")
-            transaction_display = transaction_stats.copy()
-            for col in ['Total_DR', 'Total_CR', 'Solde_Net']:
-                transaction_display[col] = transaction_display[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-            st.dataframe(transaction_display, use_container_width=True, hide_index=True)
-
-            # Graphique log pour équilibrer les valeurs
-            transaction_stats['Total_DR_log'] = transaction_stats['Total_DR'].apply(lambda x: x if x>0 else 1)
-            transaction_stats['Total_CR_log'] = transaction_stats['Total_CR'].apply(lambda x: x if x>0 else 1)
-
-            fig, ax = plt.subplots(figsize=(12, max(4, len(transaction_stats)*0.5)))
-            y = range(len(transaction_stats))
-            height = 0.35
-            bars_dr = ax.barh([i + height/2 for i in y], transaction_stats['Total_DR_log'], height=height, color='darkgreen', label='Débits (DR)', edgecolor='black')
-            bars_cr = ax.barh([i - height/2 for i in y], transaction_stats['Total_CR_log'], height=height, color='darkblue', alpha=0.8, label='Crédits (CR)', edgecolor='black')
-
-            for bar in bars_dr:
-                width = bar.get_width()
-                ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}", va='center', fontsize=10)
-            for bar in bars_cr:
-                width = bar.get_width()
-                ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}", va='center', fontsize=10)
-
-            ax.set_yticks(y)
-            ax.set_yticklabels(transaction_stats['TRANSACTION'])
-            ax.set_xlabel("Montant (Dt, échelle log)")
-            ax.set_title("Montants Débits et Crédits par Type de Transaction")
-            ax.set_xscale('log')
-            ax.legend()
-            ax.grid(axis='x', linestyle='--', alpha=0.5)
-            plt.tight_layout()
-            st.pyplot(fig)
+            show_table(transaction_stats, numbers=['Total_DR', 'Total_CR', 'Solde_Net'])
+
+            # Graphique log pour équilibrer les valeurs (même graphique que le portefeuille)
+            show_figure(transaction_figure, transaction_stats, 'transactions', searched)
 
 
             # --- Analyse par Rubrique ---
             st.markdown("---")
             st.subheader("Analyse par Rubrique")
-            client_data['Rubrique'] = client_data['Rubrique'].astype(str).str.strip().fillna("Non définie")
-            rubrique_stats = client_data.groupby('Rubrique').agg(
+            profiler.lap("Recherche : rubriques")
+            rubrique_stats = client_data.groupby('Rubrique', observed=True).agg(
                 Total_DR=('Entry Amount', 'sum'),
                 Total_CR=('Entry Amount SAC', 'sum')
             ).reset_index()
@@ -417,36 +286,12 @@ if st.button("Rechercher"):
 
             # Tableau résumé avec Solde Net
             st.write("Résumé par Rubrique")
-            rubrique_display = rubrique_stats.copy()
-            for col in ['Total_DR', 'Total_CR', 'Solde_Net']:
-                rubrique_display[col] = rubrique_display[col].apply(lambda x: f"{int(x):,}".replace(",", " "))
-            st.dataframe(rubrique_display, use_container_width=True, hide_index=True)
-
-            fig, ax = plt.subplots(figsize=(12, max(4, len(rubrique_stats)*0.5)))
-            y = range(len(rubrique_stats))
-            height = 0.35
-            bars_dr = ax.barh([i + height/2 for i in y], rubrique_stats['Total_DR'], height=height, color='darkgreen', label='Débits (DR)', edgecolor='black')
-            bars_cr = ax.barh([i - height/2 for i in y], rubrique_stats['Total_CR'], height=height, color='darkblue', alpha=0.8, label='Crédits (CR)', edgecolor='black')
-
-            for bar in bars_dr:
-                width = bar.get_width()
-                ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}", va='center', fontsize=10)
-            for bar in bars_cr:
-                width = bar.get_width()
-                ax.text(width*1.05, bar.get_y() + bar.get_height()/2, f"{int(width):,}", va='center', fontsize=10)
-
-            ax.set_yticks(y)
-            ax.set_yticklabels(rubrique_stats['Rubrique'])
-            ax.set_xlabel("Montant (Dt)")
-            ax.set_title("Montants Débits et Crédits par Rubrique")
-            ax.legend()
-            ax.grid(axis='x', linestyle='--', alpha=0.5)
-            plt.tight_layout()
-            st.pyplot(fig)
+            show_table(rubrique_stats, numbers=['Total_DR', 'Total_CR', 'Solde_Net'])
+
+            show_figure(client_rubrique_figure, rubrique_stats, 'rubriques', searched)
 
 
         else:
             st.error("Aucun Adhérent trouvé avec ce numéro.")
-    else:
-        st.warning("Veuillez entrer un numéro de l'adhérent.")
 
+profiling_panel(profiler)